@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 import os
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +48,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.routers.ReplicaRoutingMiddleware',
+    'core.sharding.ShardRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -75,6 +78,11 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'app.wsgi.application'
 
+# Serve hot reads with the async views of core.asyncviews. app.asgi turns
+# this on; under WSGI each async view would need an event loop of its own
+# per request, so the plain sync views are kept there.
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
@@ -90,6 +98,54 @@ DATABASES = {
     }
 }
 
+# Extra databases for recipe data, e.g. DATABASE_SHARD_HOSTS=db-s1,db-s2.
+# Users are placed on a shard by consistent hashing of their id and keep
+# it until moved with the move_user_shard command; users, tokens and the
+# shard directory stay on default.
+for index, host in enumerate(
+    filter(None, os.environ.get('DATABASE_SHARD_HOSTS', '').split(','))
+):
+    DATABASES[f'shard{index + 1}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+    }
+
+DATABASE_SHARDING = {
+    'SHARDS': [
+        alias for alias in DATABASES
+        if alias == 'default' or alias.startswith('shard')
+    ],
+    'VNODES': 64,
+    'ID_BLOCK_SIZE': 100,
+    'CACHE_TIMEOUT': 60,
+}
+
+# Read replicas of default, e.g. DATABASE_REPLICA_HOSTS=db-r1,db-r2. Reads
+# of safe requests go to a healthy replica unless the client wrote within
+# STICKY_SECONDS, tracked by a cookie or, with STICKY_BACKEND 'cache', a
+# marker keyed by the client's credentials.
+for index, host in enumerate(
+    filter(None, os.environ.get('DATABASE_REPLICA_HOSTS', '').split(','))
+):
+    DATABASES[f'replica{index + 1}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = [
+    'core.sharding.ShardRouter',
+    'core.routers.ReplicaRouter',
+]
+
+DATABASE_ROUTING = {
+    'REPLICAS': [alias for alias in DATABASES if alias.startswith('replica')],
+    'STICKY_SECONDS': 10,
+    'STICKY_BACKEND': 'cookie',
+    'CHECK_INTERVAL': 5,
+    'MAX_LAG': 30,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -126,11 +182,27 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.1/howto/static-files/
 
 STATIC_URL = 'static/'
-# MEDIA_URL = '/static/media/'
+# Media is served by recipe.media.RecipeMediaView after an ownership check.
+MEDIA_URL = '/media/'
 
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# Hand protected media transfers to the front-end server: 'nginx' sends
+# X-Accel-Redirect to INTERNAL_PREFIX (an `internal` location aliased to
+# MEDIA_ROOT), 'sendfile' sends X-Sendfile for Apache or lighttpd. None
+# streams the file from Django with range support.
+MEDIA_SENDFILE = {
+    'BACKEND': None,
+    'INTERNAL_PREFIX': '/protected-media/',
+}
+
+# Hash uploads while they stream in so images can be stored by content.
+FILE_UPLOAD_HANDLERS = [
+    'core.storage.HashingMemoryFileUploadHandler',
+    'core.storage.HashingTemporaryFileUploadHandler',
+]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -138,10 +210,66 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL ='core.User'
 
+MSGPACK_INSTALLED = find_spec('msgpack') is not None
+
+# orjson backs the json renderer and parser when installed; MessagePack
+# is offered to clients only when msgpack is installed.
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        *(['core.renderers.MessagePackRenderer'] if MSGPACK_INSTALLED else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        *(['core.parsers.MessagePackParser'] if MSGPACK_INSTALLED else []),
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Use a shared backend such as redis or memcached in production so every
+# worker sees the same response cache and data versions.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+RECIPE_RESPONSE_CACHE = {
+    'BACKEND': 'default',
+    'TIMEOUT': 300,
+}
+
+# 'index' uses the portable inverted index, 'mysql' uses FULLTEXT on MySQL.
+RECIPE_SEARCH_BACKEND = 'index'
+
+# Resized copies generated in the background for every uploaded image.
+RECIPE_THUMBNAILS = {
+    'SIZES': [128, 512, 1024],
+    'FORMATS': ['JPEG', 'WEBP'],
+    'QUALITY': 85,
+    'WORKERS': 2,
+}
+
+# Tokens are cached per worker and, with BACKEND, in a shared cache too.
+# Revocations are versioned in BACKEND, or the default cache, which has to
+# be shared by all workers for them to stop accepting a revoked token.
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 300,
+    'BACKEND': None,
 }
 
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
-}
\ No newline at end of file
+}
+
+# Passwords are hashed and checked on a pool of WORKERS threads with up to
+# BACKLOG more waiting; beyond that sign-ins get 503 with Retry-After.
+PASSWORD_HASHING = {
+    'WORKERS': os.cpu_count() or 1,
+    'BACKLOG': 32,
+    'RETRY_AFTER': 1,
+}
@@ -21,9 +21,10 @@ from drf_spectacular.views import (
 
 from django.contrib import admin
 from django.urls import path,include
-from django.conf.urls.static import static
 from django.conf import settings
 
+from recipe.media import RecipeMediaView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/schema/',SpectacularAPIView.as_view(),name='api-schema'),
@@ -33,11 +34,10 @@ urlpatterns = [
     ),
     path('user/', include('user.urls')),
     path('recipe/', include('recipe.urls')),
+    path(
+        f"{settings.MEDIA_URL.lstrip('/')}<path:path>",
+        RecipeMediaView.as_view(),
+        name='media',
+    ),
 
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL,
-        document_root=settings.MEDIA_ROOT,
-    )
@@ -0,0 +1,193 @@
+"""
+benchmark concurrent reads from slow clients under WSGI and ASGI
+
+Every simulated client spends a fixed latency sending its request and
+reading the response. The WSGI run serves them from a fixed pool of
+worker threads, the way a threaded WSGI server does, so a worker is held
+for the whole exchange. The ASGI run serves them from one event loop,
+where the async read views only hand the ORM queries to a thread.
+ASGI costs more CPU per request (sync middleware hops to a thread), so
+it only pulls ahead once clients are slow enough to idle WSGI workers.
+"""
+import asyncio
+import importlib
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import (
+    create_library,
+    setup_django,
+    test_database,
+)
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.core.asgi import get_asgi_application  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from django.urls import (  # noqa: E402
+    clear_url_caches,
+    reverse,
+)
+from rest_framework.authtoken.models import Token  # noqa: E402
+
+from core.models import Recipe  # noqa: E402
+
+CLIENTS = 200
+WORKERS = 16
+LATENCIES = (0.0, 0.25, 1.0)
+HOST = 'testserver'
+
+
+def request_paths(user):
+    """return the mix of read endpoints the clients ask for"""
+    recipe = Recipe.objects.filter(user=user).first()
+    paths = [
+        reverse('recipe:recipe-list'),
+        reverse('recipe:recipe-detail', args=[recipe.id]),
+        reverse('recipe:tag-list'),
+        reverse('recipe:ingredient-list'),
+        reverse('user:me'),
+    ]
+    return [paths[i % len(paths)] for i in range(CLIENTS)]
+
+
+def wsgi_get(application, path, token, latency):
+    """make one slow client request on the calling worker thread"""
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': HOST,
+        'HTTP_AUTHORIZATION': f'Token {token}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    statuses = []
+    # the worker blocks while the client sends its request...
+    time.sleep(latency / 2)
+    body = application(
+        environ, lambda status, headers, exc_info=None: statuses.append(status)
+    )
+    try:
+        for _ in body:
+            pass
+        # ...and while it reads the response
+        time.sleep(latency / 2)
+    finally:
+        body.close()
+    return int(statuses[0].split()[0])
+
+
+async def asgi_get(application, path, token, latency):
+    """make one slow client request on the running event loop"""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'query_string': b'',
+        'headers': [
+            (b'host', HOST.encode()),
+            (b'authorization', f'Token {token}'.encode()),
+        ],
+        'server': (HOST, 80),
+        'client': ('127.0.0.1', 0),
+    }
+    statuses = []
+    received = False
+
+    async def receive():
+        nonlocal received
+        if received:
+            # the client stays connected until the response is sent
+            await asyncio.Event().wait()
+        await asyncio.sleep(latency / 2)
+        received = True
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+        elif not message.get('more_body'):
+            await asyncio.sleep(latency / 2)
+
+    await application(scope, receive, send)
+    return statuses[0]
+
+
+def serve_async(async_views):
+    """rebuild the urls the way app.wsgi or app.asgi serves them"""
+    import app.urls
+    import recipe.urls
+    import user.urls
+    settings.ASYNC_VIEWS = async_views
+    for module in (recipe.urls, user.urls, app.urls):
+        importlib.reload(module)
+    clear_url_caches()
+
+
+def run_wsgi(paths, token, latency):
+    """serve every path from the worker pool and return the statuses"""
+    serve_async(False)
+    application = get_wsgi_application()
+    with ThreadPoolExecutor(WORKERS) as pool:
+        return list(pool.map(
+            lambda path: wsgi_get(application, path, token, latency), paths,
+        ))
+
+
+def run_asgi(paths, token, latency):
+    """serve every path from one event loop and return the statuses"""
+    serve_async(True)
+    application = get_asgi_application()
+
+    async def clients():
+        return await asyncio.gather(*[
+            asgi_get(application, path, token, latency) for path in paths
+        ])
+
+    return asyncio.run(clients())
+
+
+def report(label, run, paths, token, latency):
+    """time one run and print its throughput"""
+    start = time.perf_counter()
+    statuses = run(paths, token, latency)
+    elapsed = time.perf_counter() - start
+    assert set(statuses) == {200}, statuses
+    print(f'{label:<40} {elapsed:7.2f} s   {len(paths) / elapsed:8.1f} req/s')
+
+
+def main():
+    with test_database():
+        user = create_library('user@example.com', 200)
+        token = Token.objects.create(user=user).key
+        paths = request_paths(user)
+        # warm caches and lazy imports on both stacks first
+        run_wsgi(paths[:10], token, 0)
+        run_asgi(paths[:10], token, 0)
+        for latency in LATENCIES:
+            print(f'\n{CLIENTS} clients, {latency * 1000:.0f} ms latency')
+            report(f'WSGI, {WORKERS} worker threads',
+                   run_wsgi, paths, token, latency)
+            report('ASGI, async read views', run_asgi, paths, token, latency)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+benchmark import_recipes throughput by batch size
+
+Writes a JSONL file of synthetic recipes, each with three tags and three
+ingredients out of small shared vocabularies, and imports it for one
+user with import_file(), the single process path of the command. Batch
+size 1 stands for writing row by row. Reported: recipes per second and
+per hour on the configured backend.
+"""
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.common import (
+    setup_django,
+    test_database,
+)
+
+setup_django()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+
+from recipe.management.commands.import_recipes import (  # noqa: E402
+    import_file,
+)
+
+ROWS = 20000
+BATCH_SIZES = [1, 100, 1000]
+
+
+def write_rows(path, rows):
+    """write rows synthetic recipes to a JSONL file"""
+    with open(path, 'w', encoding='utf-8') as handle:
+        for i in range(rows):
+            handle.write(json.dumps({
+                'title': f'recipe {i}',
+                'description': f'sample description {i}',
+                'time_minute': 5 + i % 90,
+                'price': f'{1 + i % 40}.50',
+                'link': 'https://example.com/recipe',
+                'tags': [{'name': f'tag {(i + k) % 20}'} for k in range(3)],
+                'ingredients': [
+                    {'name': f'ingredient {(i * 7 + k) % 50}'}
+                    for k in range(3)
+                ],
+            }) + '\n')
+
+
+def main():
+    with test_database(), tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'recipes.jsonl')
+        write_rows(path, ROWS)
+        print(f'{ROWS} recipes')
+        for batch_size in BATCH_SIZES:
+            email = f'batch{batch_size}@example.com'
+            get_user_model().objects.create_user(email=email, password='x')
+            start = time.perf_counter()
+            imported, errors = import_file(path, 'jsonl', email, batch_size)
+            elapsed = time.perf_counter() - start
+            assert imported == ROWS and not errors, errors
+            rate = imported / elapsed
+            print(f'batch size {batch_size:<6} {elapsed:8.2f} s   '
+                  f'{rate:10,.0f} recipes/s   {rate * 3600:14,.0f} recipes/h')
+
+
+if __name__ == '__main__':
+    main()
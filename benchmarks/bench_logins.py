@@ -0,0 +1,158 @@
+"""
+benchmark a login burst with hashing inline and on the password pool
+
+A threaded WSGI server gets LOGINS token requests and READS /user/me/
+requests at once. Hashing inline lets every login thread run PBKDF2 at
+the same time; the pool caps hashing at PASSWORD_HASHING WORKERS and
+turns logins beyond its backlog away with 503, which keeps CPU for the
+other requests. Reported: logins served per second and read latency.
+"""
+import io
+import logging
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from urllib.parse import urlencode
+
+from benchmarks.common import (
+    setup_django,
+    test_database,
+)
+
+setup_django()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+
+from core import passwords  # noqa: E402
+
+USERS = 32
+LOGINS = 32
+READS = 256
+THREADS = 32
+PASSWORD = 'benchmark-pass'
+HOST = 'testserver'
+
+
+def wsgi_call(application, method, path, body=b'', headers=None):
+    """run one request through the wsgi app and return its status"""
+    environ = {
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': HOST,
+        'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        **(headers or {}),
+    }
+    statuses = []
+    response = application(
+        environ, lambda status, headers, exc_info=None: statuses.append(status)
+    )
+    try:
+        for _ in response:
+            pass
+    finally:
+        response.close()
+    return int(statuses[0].split()[0])
+
+
+def burst(application, emails, token):
+    """send logins and reads together, return their timings"""
+    token_url = reverse('user:token')
+    me_url = reverse('user:me')
+
+    def login(email):
+        start = time.perf_counter()
+        status = wsgi_call(application, 'POST', token_url, urlencode({
+            'email': email,
+            'password': PASSWORD,
+        }).encode())
+        return 'login', status, time.perf_counter() - start
+
+    def read(_):
+        start = time.perf_counter()
+        status = wsgi_call(application, 'GET', me_url, headers={
+            'HTTP_AUTHORIZATION': f'Token {token}',
+        })
+        return 'read', status, time.perf_counter() - start
+
+    # interleave so reads arrive while logins are hashing
+    step = max(READS // len(emails), 1)
+    jobs = [(read, i) for i in range(READS)]
+    for i, email in enumerate(emails):
+        jobs.insert(i * (step + 1), (login, email))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(THREADS) as pool:
+        results = list(pool.map(lambda job: job[0](job[1]), jobs))
+    return results, time.perf_counter() - start
+
+
+def report(label, results, elapsed):
+    """print login throughput and read latency of one burst"""
+    logins = [status for kind, status, _ in results if kind == 'login']
+    reads = sorted(
+        seconds * 1000 for kind, status, seconds in results
+        if kind == 'read' and status == 200
+    )
+    served = logins.count(200)
+    print(f'\n{label}')
+    print(f'  logins   {served} served, {logins.count(503)} turned away '
+          f'(503), {served / elapsed:.1f} logins/s over {elapsed:.2f} s')
+    print(f'  reads    p50 {statistics.median(reads):8.1f} ms   '
+          f'p95 {reads[int(len(reads) * 0.95) - 1]:8.1f} ms   '
+          f'max {reads[-1]:8.1f} ms')
+
+
+def main():
+    # the 503s of turned away logins are expected here
+    logging.getLogger('django.request').disabled = True
+    with test_database():
+        encoded = make_password(PASSWORD)
+        emails = [f'user{i}@example.com' for i in range(USERS)]
+        get_user_model().objects.bulk_create([
+            get_user_model()(email=email, password=encoded)
+            for email in emails
+        ])
+        reader = get_user_model().objects.get(email=emails[0])
+        token = Token.objects.create(user=reader).key
+        application = get_wsgi_application()
+        emails = [emails[i % USERS] for i in range(LOGINS)]
+        wsgi_call(application, 'GET', reverse('user:me'), headers={
+            'HTTP_AUTHORIZATION': f'Token {token}',
+        })
+        print(f'{LOGINS} logins and {READS} reads on {THREADS} threads')
+
+        with mock.patch.object(
+            passwords, 'run', lambda func, *args: func(*args),
+        ):
+            report('hashing inline on request threads',
+                   *burst(application, emails, token))
+
+        options = passwords._options()
+        with override_settings(PASSWORD_HASHING={**options, 'BACKLOG': 4}):
+            passwords.shutdown()
+            report(f'hashing on the pool, {options["WORKERS"]} workers, '
+                   f'backlog 4', *burst(application, emails, token))
+            passwords.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+benchmark the recipe tag filter: join + DISTINCT against semi-joins
+"""
+from benchmarks.common import (
+    create_library,
+    report,
+    setup_django,
+    test_database,
+)
+
+setup_django()
+
+from core.models import (  # noqa: E402
+    Recipe,
+    Tag,
+)
+from recipe import filters  # noqa: E402
+
+SIZES = [1000, 10000, 50000]
+PAGE = 50
+
+
+def join_distinct(user, ids):
+    """the original plan: join the through table then deduplicate"""
+    return list(
+        Recipe.objects.filter(user=user, tags__id__in=ids)
+        .order_by('-id').distinct()[:PAGE]
+    )
+
+
+def semi_join(user, ids, match):
+    """the current plan used by RecipeViewSet.get_queryset"""
+    queryset = filters.filter_by_related(
+        Recipe.objects.filter(user=user), 'tags', ids, match,
+    )
+    return list(queryset.order_by('-id')[:PAGE])
+
+
+def main():
+    with test_database():
+        for size in SIZES:
+            user = create_library(f'user{size}@example.com', size)
+            ids = list(
+                Tag.objects.filter(user=user).values_list('id', flat=True)[:5]
+            )
+            print(f'\n{size} recipes, filtering on {len(ids)} tags')
+            report('join + DISTINCT', lambda: join_distinct(user, ids))
+            report('EXISTS (match=any)', lambda: semi_join(user, ids, 'any'))
+            report(
+                'grouped count (match=all)',
+                lambda: semi_join(user, ids[:2], 'all'),
+            )
+
+
+if __name__ == '__main__':
+    main()
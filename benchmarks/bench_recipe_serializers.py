@@ -0,0 +1,59 @@
+"""
+benchmark the recipe list: RecipeSerializer against FastListSerializer
+"""
+from benchmarks.common import (
+    create_library,
+    report,
+    setup_django,
+    test_database,
+)
+
+setup_django()
+
+from django.db.models import Prefetch  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from core.models import (  # noqa: E402
+    Ingredient,
+    Recipe,
+    Tag,
+)
+from recipe.fastpath import FastListSerializer  # noqa: E402
+from recipe.serializers import RecipeSerializer  # noqa: E402
+
+SIZES = [1000, 10000]
+
+
+def regular(user):
+    """the original path: model instances, prefetches, nested serializers"""
+    queryset = Recipe.objects.filter(user=user).order_by('-id')
+    queryset = queryset.defer('description', 'image').prefetch_related(
+        Prefetch('tags', queryset=Tag.objects.only('id', 'name')
+                 .order_by('id')),
+        Prefetch('ingredients', queryset=Ingredient.objects.only('id', 'name')
+                 .order_by('id')),
+    )
+    return RecipeSerializer(queryset, many=True).data
+
+
+def fast(user):
+    """the current list path used by RecipeViewSet"""
+    serializer = FastListSerializer(RecipeSerializer)
+    queryset = Recipe.objects.filter(user=user).order_by('-id')
+    return serializer.render(list(serializer.get_queryset(queryset)))
+
+
+def main():
+    renderer = JSONRenderer()
+    with test_database():
+        for size in SIZES:
+            user = create_library(f'user{size}@example.com', size)
+            assert renderer.render(regular(user)) == renderer.render(fast(user))
+            print(f'\n{size} recipes, 3 tags and 3 ingredients each')
+            slow = report('RecipeSerializer(many=True)', lambda: regular(user))
+            quick = report('FastListSerializer', lambda: fast(user))
+            print(f'speedup {slow / quick:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
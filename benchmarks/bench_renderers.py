@@ -0,0 +1,71 @@
+"""
+benchmark encoding 1k recipes: stdlib json, orjson and MessagePack
+"""
+import io
+
+from benchmarks.common import (
+    create_library,
+    report,
+    setup_django,
+    test_database,
+)
+
+setup_django()
+
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from core.models import Recipe  # noqa: E402
+from core.parsers import (  # noqa: E402
+    FastJSONParser,
+    MessagePackParser,
+)
+from core.renderers import (  # noqa: E402
+    FastJSONRenderer,
+    MessagePackRenderer,
+)
+from recipe.fastpath import FastListSerializer  # noqa: E402
+from recipe.serializers import RecipeSerializer  # noqa: E402
+
+SIZE = 1000
+
+
+def stream(data):
+    """return a fresh readable stream of bytes"""
+    return io.BytesIO(data)
+
+
+def main():
+    with test_database():
+        user = create_library('user@example.com', SIZE)
+        serializer = FastListSerializer(RecipeSerializer)
+        data = {
+            'next': None,
+            'previous': None,
+            'results': serializer.render(list(serializer.get_queryset(
+                Recipe.objects.filter(user=user).order_by('-id')
+            ))),
+        }
+        body = JSONRenderer().render(data)
+        assert FastJSONRenderer().render(data) == body
+        packed = MessagePackRenderer().render(data)
+        print(f'\n{SIZE} recipes: json {len(body)} bytes, '
+              f'msgpack {len(packed)} bytes')
+        print('encode')
+        report('JSONRenderer (stdlib json)',
+               lambda: JSONRenderer().render(data), repeat=21)
+        report('FastJSONRenderer (orjson)',
+               lambda: FastJSONRenderer().render(data), repeat=21)
+        report('MessagePackRenderer',
+               lambda: MessagePackRenderer().render(data), repeat=21)
+        print('decode')
+        report('JSONParser (stdlib json)',
+               lambda: JSONParser().parse(stream(body)), repeat=21)
+        report('FastJSONParser (orjson)',
+               lambda: FastJSONParser().parse(stream(body)), repeat=21)
+        report('MessagePackParser',
+               lambda: MessagePackParser().parse(stream(packed)), repeat=21)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+helpers shared by the benchmarks
+
+Run a benchmark from the repository root, e.g.
+
+    python -m benchmarks.bench_recipe_filters
+
+Each run creates and drops a throwaway test database on the configured
+DATABASES backend, so it never touches real data. Point
+DJANGO_SETTINGS_MODULE at other settings to benchmark another backend.
+"""
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup_django():
+    """configure django for a standalone benchmark script"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """create a throwaway test database for the duration of the block"""
+    from django.db import connection
+    from django.test.utils import (
+        setup_test_environment,
+        teardown_test_environment,
+    )
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def timed(func, repeat=7):
+    """run func repeat times and return (median, best) in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), min(samples)
+
+
+def report(label, func, repeat=7):
+    """time func and print one aligned result line"""
+    median, best = timed(func, repeat)
+    print(f'{label:<48} median {median:9.2f} ms   best {best:9.2f} ms')
+    return median
+
+
+def create_library(email, recipes, tags=20, ingredients=50, per_recipe=3):
+    """create a user owning a synthetic recipe library and return it"""
+    from django.contrib.auth import get_user_model
+
+    from recipe import bulk
+
+    user = get_user_model().objects.create_user(email=email, password='x')
+    items = [
+        {
+            'title': f'recipe {i}',
+            'description': f'sample description {i}',
+            'time_minute': 5 + i % 90,
+            'price': f'{1 + i % 40}.50',
+            'link': 'https://example.com/recipe',
+            'tags': [
+                {'name': f'tag {(i + k) % tags}'} for k in range(per_recipe)
+            ],
+            'ingredients': [
+                {'name': f'ingredient {(i * 7 + k) % ingredients}'}
+                for k in range(per_recipe)
+            ],
+        }
+        for i in range(recipes)
+    ]
+    bulk.create_recipes(user, items, batch_size=1000)
+    return user
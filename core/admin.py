@@ -4,7 +4,11 @@ Django admin customization.
 """
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from core import models
+from django.core.exceptions import ValidationError
+from core import (
+    models,
+    sharding,
+)
 from django.utils.translation import gettext_lazy as _
 
 
@@ -45,7 +49,103 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class ShardListFilter(admin.SimpleListFilter):
+    """pick the shard a changelist shows"""
+    title = _('shard')
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in sharding.shards()]
+
+    def value(self):
+        value = super().value()
+        return value if value in sharding.shards() else sharding.shards()[0]
+
+    def choices(self, changelist):
+        # there is no "All": a changelist reads one database
+        for lookup, title in self.lookup_choices:
+            yield {
+                'selected': self.value() == lookup,
+                'query_string': changelist.get_query_string(
+                    {self.parameter_name: lookup},
+                ),
+                'display': title,
+            }
+
+    def queryset(self, request, queryset):
+        # ShardedAdmin binds the shard for every query of the request
+        return queryset
+
+
+class ShardedAdmin(admin.ModelAdmin):
+    """admin pages for data kept on the shard of its user
+
+    Changelists show one shard at a time, picked with the shard filter.
+    Ids are unique across shards, so object pages find their shard by id.
+    The page is rendered while the shard is bound, as its templates
+    still run queries.
+    """
+    def get_list_filter(self, request):
+        if sharding.enabled():
+            return [ShardListFilter, *super().get_list_filter(request)]
+        return super().get_list_filter(request)
+
+    def _shard(self, request, object_id=None):
+        """return the shard the request is about"""
+        aliases = sharding.shards()
+        if object_id is not None and sharding.enabled():
+            for alias in aliases:
+                manager = self.model._base_manager.using(alias)
+                try:
+                    if manager.filter(pk=object_id).exists():
+                        return alias
+                except (ValidationError, ValueError):
+                    # left to get_object(), which answers with a redirect
+                    break
+        alias = request.GET.get(ShardListFilter.parameter_name)
+        return alias if alias in aliases else aliases[0]
+
+    def _bound(self, alias, view, *args, **kwargs):
+        """run view with alias bound and render its response there"""
+        with sharding.use_shard(alias):
+            response = view(*args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+        return response
+
+    def changelist_view(self, request, extra_context=None):
+        return self._bound(
+            self._shard(request), super().changelist_view,
+            request, extra_context,
+        )
+
+    def add_view(self, request, form_url='', extra_context=None):
+        return self._bound(
+            self._shard(request), super().add_view,
+            request, form_url, extra_context,
+        )
+
+    def change_view(self, request, object_id, form_url='',
+                    extra_context=None):
+        return self._bound(
+            self._shard(request, object_id), super().change_view,
+            request, object_id, form_url, extra_context,
+        )
+
+    def delete_view(self, request, object_id, extra_context=None):
+        return self._bound(
+            self._shard(request, object_id), super().delete_view,
+            request, object_id, extra_context,
+        )
+
+    def history_view(self, request, object_id, extra_context=None):
+        return self._bound(
+            self._shard(request, object_id), super().history_view,
+            request, object_id, extra_context,
+        )
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Recipe)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
\ No newline at end of file
+admin.site.register(models.Recipe, ShardedAdmin)
+admin.site.register(models.Tag, ShardedAdmin)
+admin.site.register(models.Ingredient, ShardedAdmin)
\ No newline at end of file
@@ -0,0 +1,176 @@
+"""
+native async request path for hot read endpoints
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.urls import URLPattern
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+from rest_framework.routers import DefaultRouter
+
+# formats rendered without touching the database; the browsable api
+# renders forms that may query, so it stays on the sync path
+ASYNC_FORMATS = ('json', 'msgpack')
+
+
+def enabled():
+    """return whether async views are served, i.e. running under ASGI"""
+    return getattr(settings, 'ASYNC_VIEWS', False)
+
+
+class AsyncReadMixin:
+    """serve selected read actions with coroutines
+
+    Views name the actions in async_actions and implement each as a
+    coroutine called a<action>, e.g. alist. async_view() sends those
+    requests through adispatch(); the generic alist, aretrieve and
+    aget_object here mirror DRF's sync mixins on the async ORM.
+    """
+    async_actions = ()
+
+    async def aperform_authentication(self, request):
+        """authenticate with aauthenticate() where an authenticator has it"""
+        for authenticator in request.authenticators:
+            aauthenticate = getattr(authenticator, 'aauthenticate', None)
+            if aauthenticate is not None:
+                user_auth = await aauthenticate(request)
+            else:
+                user_auth = await sync_to_async(authenticator.authenticate)(
+                    request,
+                )
+            if user_auth is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth
+                return
+        request._not_authenticated()
+
+    async def adispatch(self, request, action, *args, **kwargs):
+        """async version of APIView.dispatch() for one async action"""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.aperform_authentication(request)
+            self.initial(request, *args, **kwargs)
+            handler = getattr(self, f'a{action}')
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs
+        )
+        return self.response.render()
+
+    async def aget_object(self):
+        """async version of GenericAPIView.get_object()"""
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        filter_kwargs = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        try:
+            obj = await queryset.aget(**filter_kwargs)
+        except (queryset.model.DoesNotExist, TypeError, ValueError,
+                ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def apaginate_queryset(self, queryset):
+        """return a page of results, or None when pagination is off
+
+        The paginator's queries run in the ORM's sync thread, the same way
+        Django's own async queryset methods run.
+        """
+        if self.paginator is None:
+            return None
+        return await sync_to_async(self.paginate_queryset)(queryset)
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        rows = [obj async for obj in queryset]
+        return Response(self.get_serializer(rows, many=True).data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        return Response(self.get_serializer(instance).data)
+
+
+def async_view(view):
+    """return an async view answering view's async_actions natively
+
+    view is what as_view() returned for an APIView or viewset using
+    AsyncReadMixin. GET and HEAD requests for one of its async_actions
+    that negotiate json or msgpack go through adispatch(); everything
+    else, writes included, runs the sync view via sync_to_async in the
+    request's thread. Without ASYNC_VIEWS, i.e. under WSGI, view is
+    returned as is.
+    """
+    if not enabled():
+        return view
+    cls = view.cls
+    initkwargs = view.initkwargs
+    actions = getattr(view, 'actions', None)
+    sync_view = sync_to_async(view)
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        method = request.method.lower()
+        if method == 'head':
+            method = 'get'
+        action = actions.get(method) if actions is not None else method
+        if method != 'get' or action not in cls.async_actions:
+            return await sync_view(request, *args, **kwargs)
+
+        self = cls(**initkwargs)
+        if actions is not None:
+            self.action_map = {**actions, 'head': action}
+            for name, handler in self.action_map.items():
+                setattr(self, name, getattr(self, handler))
+        self.setup(request, *args, **kwargs)
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        try:
+            renderer, _ = self.perform_content_negotiation(
+                self.initialize_request(request, *args, **kwargs)
+            )
+        except APIException:
+            renderer = None
+        if renderer is None or renderer.format not in ASYNC_FORMATS:
+            return await sync_view(request, *args, **kwargs)
+        return await self.adispatch(request, action, *args, **kwargs)
+
+    return wrapper
+
+
+class AsyncReadRouter(DefaultRouter):
+    """DefaultRouter serving async_actions of its viewsets natively
+
+    Without ASYNC_VIEWS its urls are DefaultRouter's.
+    """
+
+    def get_urls(self):
+        if not enabled():
+            return super().get_urls()
+        urls = []
+        for pattern in super().get_urls():
+            cls = getattr(pattern.callback, 'cls', None)
+            actions = getattr(pattern.callback, 'actions', None) or {}
+            if set(actions.values()) & set(getattr(cls, 'async_actions', ())):
+                pattern = URLPattern(
+                    pattern.pattern,
+                    async_view(pattern.callback),
+                    pattern.default_args,
+                    pattern.name,
+                )
+            urls.append(pattern)
+        return urls
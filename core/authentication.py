@@ -0,0 +1,248 @@
+"""
+token authentication with an in-process cache
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import (
+    TokenAuthentication,
+    get_authorization_header,
+)
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.routers import (
+    reads_from_replica,
+    use_primary,
+)
+
+
+def _cache_settings():
+    """return the token cache settings with defaults filled in"""
+    options = {
+        'MAX_SIZE': 10000,
+        'TTL': 300,
+        'BACKEND': None,
+        'KEY_PREFIX': 'auth-token',
+    }
+    options.update(getattr(settings, 'TOKEN_AUTH_CACHE', {}))
+    return options
+
+
+class TokenCache:
+    """LRU + TTL cache of token key -> token with its user
+
+    Entries live in a local ordered dict guarded by a lock. When a Django
+    cache alias is configured as BACKEND, misses fall through to it so
+    workers share hits, and invalidations are written to it as well.
+
+    Every entry records the revocation version of its key at the time the
+    token was read. invalidate() bumps the version in BACKEND, or the
+    default cache, which must be shared by all workers like the response
+    cache; a hit whose version is no longer current is a miss, so other
+    workers stop accepting a revoked token on their next request.
+    """
+
+    def __init__(self, max_size=None, ttl=None, backend=None, prefix=None):
+        options = _cache_settings()
+        self.max_size = options['MAX_SIZE'] if max_size is None else max_size
+        self.ttl = options['TTL'] if ttl is None else ttl
+        self.backend = options['BACKEND'] if backend is None else backend
+        self.prefix = options['KEY_PREFIX'] if prefix is None else prefix
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _shared(self):
+        """return the shared django cache or None"""
+        return caches[self.backend] if self.backend else None
+
+    def _shared_key(self, key):
+        """return the key used in the shared cache"""
+        return f'{self.prefix}:{key}'
+
+    def _version_key(self, key):
+        """return the key of the revocation version of key"""
+        return f'{self.prefix}-version:{key}'
+
+    def _versions(self):
+        """return the django cache holding revocation versions"""
+        return caches[self.backend or 'default']
+
+    def version(self, key):
+        """return the revocation version of key
+
+        Read it before looking the token up and pass it to set(), so a
+        token read before an invalidation is never cached as current.
+        """
+        return self._versions().get(self._version_key(key))
+
+    async def aversion(self, key):
+        """async version of version()"""
+        return await self._versions().aget(self._version_key(key))
+
+    def _local(self, key, version):
+        """return the local token for key if it is current, else None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            token, expires, entry_version = entry
+            if expires > now and entry_version == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return token
+            del self._entries[key]
+        return None
+
+    def _adopt(self, key, version, entry):
+        """return the token of a current shared entry, keeping it locally"""
+        token, entry_version = entry if entry is not None else (None, None)
+        with self._lock:
+            if token is None or entry_version != version:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._store(key, token, version)
+        return token
+
+    def get(self, key):
+        """return the cached token for key or None"""
+        version = self.version(key)
+        token = self._local(key, version)
+        if token is None:
+            shared = self._shared()
+            token = self._adopt(key, version, (
+                shared.get(self._shared_key(key)) if shared else None
+            ))
+        return token
+
+    async def aget(self, key):
+        """async version of get()"""
+        version = await self.aversion(key)
+        token = self._local(key, version)
+        if token is None:
+            shared = self._shared()
+            token = self._adopt(key, version, (
+                await shared.aget(self._shared_key(key)) if shared else None
+            ))
+        return token
+
+    def set(self, key, token, version=None):
+        """cache token under key, as read at revocation version"""
+        self._store(key, token, version)
+        shared = self._shared()
+        if shared:
+            shared.set(self._shared_key(key), (token, version), self.ttl)
+
+    def _store(self, key, token, version):
+        """put token in the local lru, evicting the oldest entries"""
+        with self._lock:
+            self._entries[key] = (token, time.monotonic() + self.ttl, version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+        """revoke keys in every worker's cache"""
+        if not keys:
+            return
+        # entries stored before now are gone within ttl, so the version
+        # only has to outlive them
+        caches[self.backend or 'default'].set_many({
+            self._version_key(key): time.time_ns() for key in keys
+        }, self.ttl)
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        shared = self._shared()
+        if shared:
+            shared.delete_many([self._shared_key(key) for key in keys])
+
+    def clear(self):
+        """drop every local entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """return hit/miss counters and the current size"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+            }
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that caches the token and user lookup"""
+
+    def _cached_credentials(self, token):
+        """return (user, token) for a token from the cache, or None"""
+        if token is not None and token.user.is_active:
+            token = copy.copy(token)
+            token.user = copy.copy(token.user)
+            return (token.user, token)
+        return None
+
+    def authenticate_credentials(self, key):
+        cached = self._cached_credentials(token_cache.get(key))
+        if cached is not None:
+            return cached
+
+        version = token_cache.version(key)
+        try:
+            user, token = super().authenticate_credentials(key)
+        except AuthenticationFailed:
+            if not reads_from_replica():
+                raise
+            # a token created moments ago may not have reached the replica
+            with use_primary():
+                user, token = super().authenticate_credentials(key)
+        token_cache.set(key, token, version)
+        return (user, token)
+
+    async def aauthenticate(self, request):
+        """async version of authenticate(), misses use the async ORM"""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            return self.authenticate(request)
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            return self.authenticate(request)
+
+        cached = self._cached_credentials(await token_cache.aget(key))
+        if cached is not None:
+            return cached
+        version = await token_cache.aversion(key)
+        model = self.get_model()
+        queryset = model.objects.select_related('user')
+        try:
+            token = await queryset.aget(key=key)
+        except model.DoesNotExist:
+            if not reads_from_replica():
+                raise AuthenticationFailed(_('Invalid token.'))
+            try:
+                token = await queryset.using(DEFAULT_DB_ALIAS).aget(key=key)
+            except model.DoesNotExist:
+                raise AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        await sync_to_async(token_cache.set)(key, token, version)
+        return (token.user, token)
@@ -0,0 +1,69 @@
+import unicodedata
+
+from django.db import migrations, models
+
+
+def fold_name(name):
+    """return name as MySQL's case and accent insensitive collations see it"""
+    decomposed = unicodedata.normalize('NFKD', name.casefold())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """point recipes at one row per (user, name) and drop the duplicates"""
+    Recipe = apps.get_model('core', 'Recipe')
+    db_alias = schema_editor.connection.alias
+    # the unique constraints compare names by collation on MySQL
+    if schema_editor.connection.vendor == 'mysql':
+        name_key = fold_name
+    else:
+        name_key = str
+    for model_name, field in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field).through
+        target = f'{model_name.lower()}_id'
+        keep = {}
+        duplicates = {}
+        objs = model.objects.using(db_alias).order_by('id')
+        for obj_id, user_id, name in objs.values_list(
+            'id', 'user_id', 'name',
+        ):
+            key = (user_id, name_key(name))
+            if key in keep:
+                duplicates[obj_id] = keep[key]
+            else:
+                keep[key] = obj_id
+        if not duplicates:
+            continue
+        linked = set(through.objects.using(db_alias).exclude(
+            **{f'{target}__in': duplicates},
+        ).values_list('recipe_id', target))
+        rows = []
+        for recipe_id, obj_id in through.objects.using(db_alias).filter(
+            **{f'{target}__in': duplicates},
+        ).values_list('recipe_id', target):
+            pair = (recipe_id, duplicates[obj_id])
+            if pair not in linked:
+                linked.add(pair)
+                rows.append(through(recipe_id=recipe_id, **{target: pair[1]}))
+        through.objects.using(db_alias).bulk_create(rows)
+        model.objects.using(db_alias).filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_ingredient_name_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_tag_name_per_user'),
+        ),
+    ]
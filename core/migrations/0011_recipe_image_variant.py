@@ -0,0 +1,27 @@
+import core.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_per_user_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeImageVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255)),
+                ('size', models.PositiveIntegerField()),
+                ('format', models.CharField(max_length=10)),
+                ('image', models.ImageField(upload_to=core.models.recipe_image_variant_path)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_variants', to='core.recipe')),
+            ],
+            options={
+                'ordering': ['size', 'format'],
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def pin_existing_users(apps, schema_editor):
+    """keep users who already have recipe data on default"""
+    if schema_editor.connection.alias != 'default':
+        return
+    ShardAssignment = apps.get_model('core', 'ShardAssignment')
+    user_ids = set()
+    for model_name in ('Recipe', 'Tag', 'Ingredient'):
+        model = apps.get_model('core', model_name)
+        owners = model.objects.using('default').values_list(
+            'user_id', flat=True,
+        )
+        user_ids.update(owners.distinct())
+    ShardAssignment.objects.using('default').bulk_create([
+        ShardAssignment(user_id=user_id, shard='default')
+        for user_id in user_ids
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_image_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShardAssignment',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('shard', models.CharField(max_length=64)),
+                ('moving_to', models.CharField(blank=True, max_length=64)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ShardIdBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, unique=True)),
+                ('next_id', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='recipesearchterm',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(pin_existing_users, migrations.RunPython.noop),
+    ]
@@ -11,12 +11,35 @@ from django.contrib.auth.models import (
     PermissionsMixin,
 )
 
+from core import sharding
+from core.passwords import (
+    hash_password,
+    verify_password,
+)
+from core.storage import (
+    content_path,
+    get_image_storage,
+    hash_file,
+)
+
 def recipe_image_file_path(instance, filename):
-    """generate file path for new recipe image"""
+    """generate file path for new recipe image
+
+    Uploaded bytes are addressed by their digest so identical images share
+    one file; without content at hand a random name is used.
+    """
     ext =os.path.splitext(filename)[1]
+    content = getattr(getattr(instance, 'image', None), '_file', None)
+    if content is not None:
+        return content_path(hash_file(content), ext)
     filename = f'{uuid.uuid4()}{ext}'
     return os.path.join('upload','recipe', filename)
 
+
+def recipe_image_variant_path(instance, filename):
+    """generate file path for a resized recipe image"""
+    return os.path.join('upload', 'recipe', 'variants', filename)
+
 class UserManager(BaseUserManager):
     """manager for user"""
 
@@ -52,10 +75,44 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     USERNAME_FIELD = 'email'
 
+    def set_password(self, raw_password):
+        """hash the password on the password hashing pool"""
+        self.password = hash_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """verify the password on the pool, upgrading an outdated hash"""
+        return verify_password(self, raw_password)
+
+
+class SharedIdModel(models.Model):
+    """model of a user's data whose ids are unique across shards
+
+    Ids always come from sharding.next_ids(), never from the database, so
+    single saves and bulk inserts draw from the same blocks.
+    """
 
-class Recipe(models.Model):
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self.pk is None:
+            self.pk = sharding.next_ids(type(self))[0]
+            kwargs['force_insert'] = True
+        # signal handlers query the owner's shard too
+        with sharding.for_user(self.user_id, replace=False):
+            super().save(*args, **kwargs)
+
+
+class Recipe(SharedIdModel):
     """Recipe objects"""
-    user = models.ForeignKey(settings.AUTH_USER_MODEL,on_delete=models.CASCADE)
+    # users stay on default, so there is no constraint across databases
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False,
+        db_constraint=False,
+    )
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     time_minute = models.IntegerField()
@@ -63,27 +120,150 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255,blank=False)
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        storage=get_image_storage,
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # serves the user FK as well as "WHERE user_id = ? ORDER BY id"
+            models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
 
-class Tag(models.Model):
+class Tag(SharedIdModel):
     """tag for filtering recipes."""
     name = models.CharField(max_length=255)
-    user = models.ForeignKey(settings.AUTH_USER_MODEL,on_delete=models.CASCADE)
+    # the (user, name) constraint below also indexes the user FK
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False,
+        db_constraint=False,
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_tag_name_per_user',
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(SharedIdModel):
     """ingredient for recipe"""
     name = models.CharField(max_length=255)
-    user = models.ForeignKey(settings.AUTH_USER_MODEL,on_delete=models.CASCADE)
+    # the (user, name) constraint below also indexes the user FK
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False,
+        db_constraint=False,
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_ingredient_name_per_user',
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class RecipeSearchTerm(models.Model):
+    """inverted index entry for recipe search"""
+    # both FKs are indexed by the composite index and constraint below
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False,
+        db_constraint=False,
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+        db_index=False,
+    )
+    term = models.CharField(max_length=64)
+    weight = models.PositiveIntegerField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'term'], name='search_user_term_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'term'],
+                name='unique_search_term_per_recipe',
+            ),
+        ]
+
+    def __str__(self):
+        return self.term
+
+
+class RecipeImageVariant(models.Model):
+    """resized copy of a recipe image"""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='image_variants',
+    )
+    source = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()
+    format = models.CharField(max_length=10)
+    image = models.ImageField(upload_to=recipe_image_variant_path)
+
+    class Meta:
+        ordering = ['size', 'format']
+
+    def __str__(self):
+        return f'{self.source} {self.size} {self.format}'
+
+
+class ImageBlob(models.Model):
+    """reference count of a content addressed image file"""
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
+
+class ShardAssignment(models.Model):
+    """the shard holding a user's recipe data"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    shard = models.CharField(max_length=64)
+    moving_to = models.CharField(max_length=64, blank=True)
+
+    def __str__(self):
+        return self.shard
+
+
+class ShardIdBlock(models.Model):
+    """next free id of a model whose ids are shared by every shard"""
+    model = models.CharField(max_length=100, unique=True)
+    next_id = models.BigIntegerField()
+
+    def __str__(self):
+        return f'{self.model} {self.next_id}'
@@ -0,0 +1,59 @@
+"""
+fast json and messagepack parsers
+"""
+import io
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import (
+    BaseParser,
+    JSONParser,
+)
+
+from core.renderers import (
+    MSGPACK_MEDIA_TYPE,
+    FastJSONRenderer,
+    MessagePackRenderer,
+    msgpack,
+    orjson,
+)
+
+
+def _is_utf8(parser_context):
+    """return whether the request body is declared as utf-8"""
+    encoding = (parser_context or {}).get('encoding') or 'utf-8'
+    return encoding.replace('_', '-').lower() in ('utf-8', 'utf8')
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser decoding with orjson when it is installed
+
+    Bodies orjson rejects are parsed again by the stdlib parser, so
+    errors read exactly as before.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None or not self.strict or not _is_utf8(parser_context):
+            return super().parse(stream, media_type, parser_context)
+        data = stream.read()
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(data), media_type, parser_context)
+
+
+class MessagePackParser(BaseParser):
+    """parse MessagePack request bodies"""
+    media_type = MSGPACK_MEDIA_TYPE
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if msgpack is None:
+            raise ImproperlyConfigured(
+                'MessagePackParser requires the msgpack package.'
+            )
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError('MessagePack parse error - %s' % str(exc))
@@ -0,0 +1,133 @@
+"""
+password hashing on a bounded worker pool
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    get_hasher,
+    identify_hasher,
+    is_password_usable,
+    make_password,
+)
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+_executor = None
+_slots = None
+_executor_lock = threading.Lock()
+
+
+def _options():
+    """return the password hashing settings with defaults filled in"""
+    options = {
+        'WORKERS': os.cpu_count() or 1,
+        'BACKLOG': 32,
+        'RETRY_AFTER': 1,
+    }
+    options.update(getattr(settings, 'PASSWORD_HASHING', {}))
+    return options
+
+
+class PasswordHashingBusy(APIException):
+    """every hashing worker and backlog slot is taken"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many sign-ins in progress, try again shortly.')
+    default_code = 'password_hashing_busy'
+
+    def __init__(self, detail=None, code=None, wait=None):
+        super().__init__(detail, code)
+        # DRF's exception handler turns wait into a Retry-After header
+        self.wait = _options()['RETRY_AFTER'] if wait is None else wait
+
+
+def _get_executor():
+    """return the shared pool and its slot semaphore, creating them once"""
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is None:
+            options = _options()
+            _executor = ThreadPoolExecutor(
+                max_workers=options['WORKERS'],
+                thread_name_prefix='password-hashing',
+            )
+            _slots = threading.BoundedSemaphore(
+                options['WORKERS'] + options['BACKLOG'],
+            )
+        return _executor, _slots
+
+
+def shutdown():
+    """stop the pool; the next hash starts a new one with fresh settings"""
+    global _executor, _slots
+    with _executor_lock:
+        executor, _executor, _slots = _executor, None, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def run(func, *args):
+    """run func on the hashing pool and return its result
+
+    Hashers spend their time in C code that releases the GIL (hashlib's
+    pbkdf2_hmac, bcrypt, argon2), so threads hash in parallel while the
+    request thread waits. When WORKERS hashes are running and BACKLOG
+    more are queued, PasswordHashingBusy is raised instead of queueing.
+    """
+    executor, slots = _get_executor()
+    if not slots.acquire(blocking=False):
+        raise PasswordHashingBusy()
+    try:
+        future = executor.submit(func, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future.result()
+
+
+def _verify(password, encoded):
+    """return (is_correct, must_update), like django's check_password"""
+    if password is None or not is_password_usable(encoded):
+        return False, False
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False, False
+    preferred = get_hasher('default')
+    hasher_changed = hasher.algorithm != preferred.algorithm
+    must_update = hasher_changed or preferred.must_update(encoded)
+    is_correct = hasher.verify(password, encoded)
+    # keep the runtime of wrong passwords equal to the preferred hasher's
+    if not is_correct and not hasher_changed and must_update:
+        hasher.harden_runtime(password, encoded)
+    return is_correct, must_update
+
+
+def hash_password(password):
+    """return the encoded hash of password, computed on the pool"""
+    if password is None:
+        return make_password(None)
+    return run(make_password, password)
+
+
+def verify_password(user, password):
+    """check password against user's hash on the pool
+
+    When the hash was made with another hasher or older parameters it is
+    replaced with one from the preferred hasher, as check_password does.
+    The new hash is computed on the pool and saved from this thread; if
+    the pool is busy the upgrade waits for a later login.
+    """
+    is_correct, must_update = run(_verify, password, user.password)
+    if is_correct and must_update:
+        try:
+            user.password = run(make_password, password)
+        except PasswordHashingBusy:
+            return is_correct
+        user.save(update_fields=['password'])
+    return is_correct
+
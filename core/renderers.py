@@ -0,0 +1,79 @@
+"""
+fast json and messagepack renderers
+"""
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.renderers import (
+    BaseRenderer,
+    JSONRenderer,
+)
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is optional
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+
+# DRF's encoder decides how non-native values look, e.g. Decimal -> float
+# and aware datetimes ending in Z, so every format renders them alike.
+default = encoders.JSONEncoder().default
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer encoding with orjson when it is installed
+
+    Compact output decodes to the same value JSONRenderer writes, and is
+    byte for byte the same except for floats: orjson spells exponents
+    without padding, 1e16 rather than 1e+16, and writes NaN and
+    infinities as null where JSONRenderer's strict mode rejects them.
+    Indented output, non-default JSON settings and values orjson rejects,
+    such as integers wider than 64 bits, go through the stdlib encoder
+    instead.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+            is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # escaped like JSONRenderer so the output stays a javascript subset
+        return ret.replace(
+            b'\xe2\x80\xa8', b'\\u2028',
+        ).replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """render MessagePack, with non-native values converted as in JSON"""
+    media_type = MSGPACK_MEDIA_TYPE
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if msgpack is None:
+            raise ImproperlyConfigured(
+                'MessagePackRenderer requires the msgpack package.'
+            )
+        if data is None:
+            return b''
+        return msgpack.packb(
+            data, default=default, use_bin_type=True, datetime=False,
+        )
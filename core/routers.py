@@ -0,0 +1,284 @@
+"""
+read replica routing with read-your-writes stickiness
+"""
+import asyncio
+import contextvars
+import hashlib
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    DatabaseError,
+    connections,
+)
+from django.utils.deprecation import MiddlewareMixin
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# the RoutingState of the request being served; None outside requests,
+# where every read goes to the primary
+_state = contextvars.ContextVar('replica_routing_state', default=None)
+_pinned = contextvars.ContextVar('replica_routing_pinned', default=False)
+
+
+def _options():
+    """return the replica routing settings with defaults filled in"""
+    options = {
+        'REPLICAS': [],
+        'STICKY_SECONDS': 10,
+        'STICKY_BACKEND': 'cookie',
+        'COOKIE_NAME': 'db_primary_until',
+        'CACHE_ALIAS': 'default',
+        'CACHE_PREFIX': 'db-primary',
+        'CHECK_INTERVAL': 5,
+        'MAX_LAG': 30,
+    }
+    options.update(getattr(settings, 'DATABASE_ROUTING', {}))
+    return options
+
+
+def _replica_lag(connection):
+    """return replication lag in seconds, or None if it is not reported"""
+    if connection.vendor != 'mysql':
+        return None
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute('SHOW REPLICA STATUS')
+        except DatabaseError:
+            # servers older than 8.0.22
+            cursor.execute('SHOW SLAVE STATUS')
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        columns = [column[0] for column in cursor.description]
+    status = dict(zip(columns, row))
+    lag = status.get('Seconds_Behind_Source',
+                     status.get('Seconds_Behind_Master'))
+    # NULL means replication is stopped
+    return float('inf') if lag is None else lag
+
+
+def probe(alias):
+    """return whether a replica answers and is not lagging too far"""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        lag = _replica_lag(connection)
+    except DatabaseError:
+        logger.warning('replica %s failed its health check', alias,
+                       exc_info=True)
+        return False
+    if lag is not None and lag > _options()['MAX_LAG']:
+        logger.warning('replica %s is %s seconds behind', alias, lag)
+        return False
+    return True
+
+
+class ReplicaHealth:
+    """process wide health of each replica, probed at most every interval
+
+    Probes run on the thread asking for a replica. From inside an event
+    loop, where the ORM cannot run, the last known state is used.
+    """
+
+    def __init__(self):
+        self._checked = {}
+        self._healthy = {}
+        self._lock = threading.Lock()
+
+    def is_healthy(self, alias):
+        """return the health of alias, probing it when the result is stale"""
+        now = time.monotonic()
+        with self._lock:
+            stale = now - self._checked.get(alias, float('-inf')) >= (
+                _options()['CHECK_INTERVAL']
+            )
+            if stale and not _in_event_loop():
+                # claim the probe so concurrent requests don't repeat it
+                self._checked[alias] = now
+            else:
+                stale = False
+        if stale:
+            healthy = probe(alias)
+            with self._lock:
+                self._healthy[alias] = healthy
+        with self._lock:
+            return self._healthy.get(alias, True)
+
+    def healthy(self, aliases):
+        """return the healthy aliases among aliases"""
+        return [alias for alias in aliases if self.is_healthy(alias)]
+
+    def reset(self):
+        """forget every probe result"""
+        with self._lock:
+            self._checked.clear()
+            self._healthy.clear()
+
+
+replica_health = ReplicaHealth()
+
+
+def _in_event_loop():
+    """return whether this thread is running an event loop"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _credential_key(request):
+    """return the cache key of the client's sticky marker, or None"""
+    credential = request.META.get('HTTP_AUTHORIZATION') or (
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not credential:
+        return None
+    digest = hashlib.sha256(credential.encode()).hexdigest()
+    return f'{_options()["CACHE_PREFIX"]}:{digest}'
+
+
+class RoutingState:
+    """where one request reads from
+
+    Unsafe methods read from the primary, and so does a client that wrote
+    within STICKY_SECONDS, going by its cookie or cache marker. Otherwise
+    one healthy replica is chosen, on first read, for the whole request.
+    """
+
+    def __init__(self, request):
+        options = _options()
+        self.request = request
+        self.replicas = list(options['REPLICAS'])
+        self.writes = request.method not in SAFE_METHODS
+        self.sticky = self.writes or self._sticky(options)
+        self._replica = None
+
+    def _sticky(self, options):
+        """return whether the client wrote within the sticky window"""
+        if options['STICKY_BACKEND'] == 'cache':
+            key = _credential_key(self.request)
+            until = caches[options['CACHE_ALIAS']].get(key) if key else None
+        else:
+            until = self.request.COOKIES.get(options['COOKIE_NAME'])
+        try:
+            return float(until) > time.time()
+        except (TypeError, ValueError):
+            return False
+
+    def db_for_read(self):
+        """return the alias reads of this request go to"""
+        if self.sticky or not self.replicas:
+            return DEFAULT_DB_ALIAS
+        if self._replica is None or not replica_health.is_healthy(
+            self._replica,
+        ):
+            healthy = replica_health.healthy(self.replicas)
+            self._replica = random.choice(healthy) if healthy else None
+        return self._replica or DEFAULT_DB_ALIAS
+
+    def remember_write(self, response):
+        """keep the client on the primary for the sticky window"""
+        options = _options()
+        seconds = options['STICKY_SECONDS']
+        until = time.time() + seconds
+        if options['STICKY_BACKEND'] == 'cache':
+            key = _credential_key(self.request)
+            if key:
+                caches[options['CACHE_ALIAS']].set(key, until, seconds)
+        else:
+            response.set_cookie(
+                options['COOKIE_NAME'], f'{until:.3f}', max_age=seconds,
+                httponly=True, samesite='Lax',
+            )
+
+
+def in_transaction(using=DEFAULT_DB_ALIAS):
+    """return whether code is running inside atomic() on using"""
+    return any(
+        # TestCase wraps every test in atomic blocks of its own
+        not getattr(block, '_from_testcase', False)
+        for block in connections[using].atomic_blocks
+    )
+
+
+@contextmanager
+def use_primary():
+    """read from the primary inside the block"""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def replica_staleness():
+    """return the seconds a replica in use may be behind the primary
+
+    A replica is used while its last probe saw at most MAX_LAG, and the
+    probe is trusted for CHECK_INTERVAL.
+    """
+    options = _options()
+    return options['MAX_LAG'] + options['CHECK_INTERVAL']
+
+
+def reads_from_replica():
+    """return whether reads here would go to a replica"""
+    return ReplicaRouter().db_for_read(None) != DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """send request reads to replicas and everything else to the primary
+
+    Reads outside a request, inside a transaction on the primary or
+    under use_primary() stay on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or _pinned.get():
+            return DEFAULT_DB_ALIAS
+        if in_transaction():
+            return DEFAULT_DB_ALIAS
+        return state.db_for_read()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *_options()['REPLICAS']}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in _options()['REPLICAS']:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """track the routing state of each request for ReplicaRouter"""
+
+    def process_request(self, request):
+        request.db_routing = RoutingState(request)
+        # set, not reset, at the end: under ASGI process_request and
+        # process_response run in different contexts
+        _state.set(request.db_routing)
+
+    def process_response(self, request, response):
+        state = getattr(request, 'db_routing', None)
+        if state is not None and state.writes and response.status_code < 500:
+            state.remember_write(response)
+        _state.set(None)
+        return response
@@ -0,0 +1,469 @@
+"""
+user id sharding of recipe data across databases
+"""
+import bisect
+import contextvars
+import hashlib
+import threading
+import time
+from collections import (
+    defaultdict,
+    namedtuple,
+)
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    transaction,
+)
+from django.db.models import (
+    Max,
+    Q,
+)
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core.routers import in_transaction
+
+# models whose rows live on the shard of their user; auto created m2m
+# through models go with the model declaring the relation
+SHARDED_MODELS = frozenset([
+    'core.recipe',
+    'core.tag',
+    'core.ingredient',
+    'core.recipesearchterm',
+    'core.recipeimagevariant',
+])
+
+# the Binding of the request or block being served; None where nothing
+# tells which user's data a query is about
+_current = contextvars.ContextVar('shard_binding', default=None)
+
+_blocks = {}
+_blocks_lock = threading.Lock()
+
+Placement = namedtuple('Placement', ['shard', 'moving_to'])
+
+
+def _options():
+    """return the sharding settings with defaults filled in"""
+    options = {
+        'SHARDS': [DEFAULT_DB_ALIAS],
+        'VNODES': 64,
+        'ID_BLOCK_SIZE': 100,
+        'CACHE_ALIAS': 'default',
+        'CACHE_TIMEOUT': 60,
+    }
+    options.update(getattr(settings, 'DATABASE_SHARDING', {}))
+    return options
+
+
+def shards():
+    """return the database aliases holding recipe data"""
+    return list(_options()['SHARDS'])
+
+
+def enabled():
+    """return whether recipe data is spread over more than default"""
+    return shards() != [DEFAULT_DB_ALIAS]
+
+
+def is_sharded(model):
+    """return whether rows of model live on their user's shard"""
+    owner = model._meta.auto_created or model
+    return owner._meta.label_lower in SHARDED_MODELS
+
+
+def _hash(value):
+    """return a stable 64 bit hash of a string"""
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """consistent hash ring of shard aliases
+
+    Every alias owns vnodes points of the ring and a key belongs to the
+    first point at or after its hash. Adding an alias takes about 1/n of
+    the keys, all of them from the other aliases to the new one.
+    """
+
+    def __init__(self, nodes, vnodes=64):
+        points = sorted(
+            (_hash(f'{node}#{index}'), node)
+            for node in nodes for index in range(vnodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node(self, key):
+        """return the alias key belongs to"""
+        index = bisect.bisect_left(self._hashes, _hash(str(key)))
+        return self._nodes[index % len(self._nodes)]
+
+
+@lru_cache(maxsize=8)
+def _ring(nodes, vnodes):
+    return HashRing(nodes, vnodes)
+
+
+def ring():
+    """return the hash ring of the configured shards"""
+    options = _options()
+    return _ring(tuple(options['SHARDS']), options['VNODES'])
+
+
+def _placement_key(user_id):
+    return f'shard-placement:{user_id}'
+
+
+def placement(user_id):
+    """return the Placement of a user's data
+
+    The ring picks the shard the first time a user is placed and the
+    choice is kept in ShardAssignment, so adding a shard never strands
+    data; users move with move_user(). Lookups are cached.
+    """
+    from core.models import ShardAssignment
+    options = _options()
+    cache = caches[options['CACHE_ALIAS']]
+    cached = cache.get(_placement_key(user_id))
+    if cached is not None:
+        return Placement(*cached)
+    assignment, _ = ShardAssignment.objects.using(
+        DEFAULT_DB_ALIAS,
+    ).get_or_create(user_id=user_id, defaults={
+        'shard': ring().node(user_id),
+    })
+    result = Placement(assignment.shard, assignment.moving_to or None)
+    cache.set(
+        _placement_key(user_id), tuple(result), options['CACHE_TIMEOUT'],
+    )
+    return result
+
+
+def forget_placement(user_id):
+    """drop the cached placement of a user"""
+    caches[_options()['CACHE_ALIAS']].delete(_placement_key(user_id))
+
+
+def user_shards(user_id):
+    """return the aliases holding rows of a user, without placing them"""
+    from core.models import ShardAssignment
+    if not enabled():
+        return []
+    assignment = ShardAssignment.objects.using(DEFAULT_DB_ALIAS).filter(
+        user_id=user_id,
+    ).first()
+    if assignment is None:
+        return []
+    return list(filter(None, dict.fromkeys([
+        assignment.shard, assignment.moving_to,
+    ])))
+
+
+class Binding:
+    """the user, or the shard, that queries without other hints are for"""
+
+    def __init__(self, user_id=None, shard=None):
+        self.user_id = user_id
+        self._placement = Placement(shard, None) if shard else None
+
+    @property
+    def placement(self):
+        # looked up on first use, from the thread running the query
+        if self._placement is None:
+            self._placement = placement(self.user_id)
+        return self._placement
+
+
+@contextmanager
+def _bind(binding):
+    token = _current.set(binding)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def for_user(user_id, replace=True):
+    """route queries in the block to a user's shard
+
+    With replace False an existing binding is kept.
+    """
+    if not replace and _current.get() is not None:
+        return _bind(_current.get())
+    return _bind(Binding(user_id=user_id))
+
+
+def use_shard(alias):
+    """route queries in the block to one shard, e.g. in commands"""
+    return _bind(Binding(shard=alias))
+
+
+class ShardMoving(APIException):
+    """the user's data is being moved to another shard"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Your data is being moved, try again shortly.')
+    default_code = 'shard_moving'
+
+    def __init__(self, detail=None, code=None, wait=None):
+        super().__init__(detail, code)
+        self.wait = 1 if wait is None else wait
+
+
+class ShardUnknown(RuntimeError):
+    """a query on sharded data came without a user to route it by"""
+
+
+def _placement_for(instance):
+    """return the placement for a query with an optional instance hint"""
+    if isinstance(instance, get_user_model()):
+        user_id = instance.pk
+    else:
+        user_id = getattr(instance, 'user_id', None)
+    binding = _current.get()
+    if user_id is not None and (
+        binding is None or binding.user_id != user_id
+    ):
+        return placement(user_id)
+    if binding is None:
+        raise ShardUnknown(
+            'Sharded data was queried outside for_user() or use_shard().'
+        )
+    return binding.placement
+
+
+class ShardRouter:
+    """send recipe data to the shard of the user it belongs to
+
+    The user comes from the instance hint, e.g. a recipe's related
+    managers or a recipe being saved, or else from the binding set by
+    ShardRoutingMixin, for_user() or use_shard(). Writes of a user being
+    moved raise ShardMoving. Other models are left to the next router.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not enabled() or not is_sharded(model):
+            return None
+        instance = hints.get('instance')
+        if (instance is not None and is_sharded(type(instance))
+                and instance._state.db):
+            return instance._state.db
+        return _placement_for(instance).shard
+
+    def db_for_write(self, model, **hints):
+        if not enabled() or not is_sharded(model):
+            return None
+        placement = _placement_for(hints.get('instance'))
+        if placement.moving_to:
+            raise ShardMoving()
+        return placement.shard
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not enabled():
+            return None
+        sharded1, sharded2 = is_sharded(type(obj1)), is_sharded(type(obj2))
+        if sharded1 and sharded2:
+            return obj1._state.db == obj2._state.db
+        # sharded rows refer to their user, which stays on default
+        if sharded1 or sharded2:
+            return True
+        return None
+
+
+class ShardRoutingMixin:
+    """route a view's queries on sharded data to the user's shard"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            # cleared by ShardRoutingMiddleware when the request ends
+            _current.set(Binding(user_id=request.user.id))
+
+
+class ShardRoutingMiddleware(MiddlewareMixin):
+    """start and finish every request without a shard binding"""
+
+    def process_request(self, request):
+        # set, not reset: under ASGI the hooks run in different contexts
+        _current.set(None)
+
+    def process_response(self, request, response):
+        _current.set(None)
+        return response
+
+
+def _next_free_id(model):
+    """return one past the highest id of model on any database"""
+    return 1 + max(
+        model._base_manager.using(alias).aggregate(top=Max('pk'))['top'] or 0
+        for alias in dict.fromkeys([DEFAULT_DB_ALIAS, *shards()])
+    )
+
+
+def _reserve_block(model, size, floor=0):
+    """reserve size ids of model on default and return (start, end)
+
+    The block starts at floor or later, floor being past the ids this
+    process handed out already, in case their reservation was undone.
+    """
+    from core.models import ShardIdBlock
+    blocks = ShardIdBlock.objects.using(DEFAULT_DB_ALIAS)
+    label = model._meta.label_lower
+    blocks.get_or_create(model=label, defaults={
+        'next_id': lambda: max(_next_free_id(model), floor),
+    })
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        block = blocks.select_for_update().get(model=label)
+        start = max(block.next_id, floor)
+        block.next_id = start + size
+        block.save(update_fields=['next_id'])
+    return start, start + size
+
+
+def next_ids(model, count=1):
+    """return count ids for new rows of model, unique across shards
+
+    Ids are reserved on default in blocks of ID_BLOCK_SIZE and handed out
+    from memory, so moving a user keeps the ids of their rows and bulk
+    inserts know their ids on backends that can't return them.
+    """
+    label = model._meta.label_lower
+    ids = []
+    with _blocks_lock:
+        start, end = _blocks.get(label, (0, 0))
+        keep = True
+        while len(ids) < count:
+            if start == end:
+                start, end = _reserve_block(model, max(
+                    _options()['ID_BLOCK_SIZE'], count - len(ids),
+                ), floor=end)
+                # a reservation rolled back with its transaction may be
+                # handed out again elsewhere, so don't reuse the rest
+                keep = not in_transaction()
+            taken = min(end - start, count - len(ids))
+            ids.extend(range(start, start + taken))
+            start += taken
+        _blocks[label] = (start, end) if keep else (0, 0)
+    return ids
+
+
+def forget_id_blocks():
+    """drop the ids reserved by this process, e.g. once tests rolled back
+    the reservations"""
+    with _blocks_lock:
+        _blocks.clear()
+
+
+def assign_ids(objs):
+    """give unsaved objects their ids before a bulk_create"""
+    by_model = defaultdict(list)
+    for obj in objs:
+        if obj.pk is None:
+            by_model[type(obj)].append(obj)
+    for model, group in by_model.items():
+        for obj, pk in zip(group, next_ids(model, len(group))):
+            obj.pk = pk
+    return objs
+
+
+def _batches(iterable, size):
+    """yield lists of at most size items of iterable"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _user_rows(user_id):
+    """return (model, condition, keep ids) for a user's rows, parents first"""
+    from core.models import (
+        Ingredient,
+        Recipe,
+        RecipeImageVariant,
+        RecipeSearchTerm,
+        Tag,
+    )
+    return [
+        (Tag, Q(user_id=user_id), True),
+        (Ingredient, Q(user_id=user_id), True),
+        (Recipe, Q(user_id=user_id), True),
+        (Recipe.tags.through, Q(recipe__user_id=user_id), False),
+        (Recipe.ingredients.through, Q(recipe__user_id=user_id), False),
+        (RecipeSearchTerm, Q(user_id=user_id), False),
+        (RecipeImageVariant, Q(recipe__user_id=user_id), False),
+    ]
+
+
+def _copy_rows(user_id, source, target, batch_size):
+    """copy a user's rows from source to target, return the row count"""
+    copied = 0
+    for model, condition, keep_ids in _user_rows(user_id):
+        rows = model._base_manager.using(source).filter(condition).order_by(
+            'pk',
+        ).iterator(chunk_size=batch_size)
+        for batch in _batches(rows, batch_size):
+            if not keep_ids:
+                for obj in batch:
+                    obj.pk = None
+            model._base_manager.using(target).bulk_create(batch)
+            copied += len(batch)
+    return copied
+
+
+def _purge_rows(user_id, alias):
+    """delete a user's rows from alias, children first
+
+    Rows are deleted without signals: they still exist on the other
+    shard, along with the images they refer to.
+    """
+    for model, condition, _ in reversed(_user_rows(user_id)):
+        queryset = model._base_manager.using(alias).filter(condition)
+        queryset._raw_delete(alias)
+
+
+def move_user(user_id, target, grace=None, batch_size=1000):
+    """move a user's rows to the target shard while the site stays up
+
+    The user's writes answer 503 from the time the move starts; reads
+    are served from the old shard until the copy is complete and the
+    assignment points at the target. grace, CACHE_TIMEOUT by default, is
+    waited before copying and before purging the old shard so requests
+    using an earlier placement can finish. Ids are kept. Returns the
+    number of rows copied.
+    """
+    from core.models import ShardAssignment
+    if target not in shards():
+        raise ValueError(f'{target} is not one of the shards.')
+    if grace is None:
+        grace = _options()['CACHE_TIMEOUT']
+    source = placement(user_id).shard
+    if source == target:
+        return 0
+    assignment = ShardAssignment.objects.using(DEFAULT_DB_ALIAS).filter(
+        user_id=user_id,
+    )
+    assignment.update(moving_to=target)
+    forget_placement(user_id)
+    try:
+        time.sleep(grace)
+        with transaction.atomic(using=target):
+            # leftovers of an earlier move that failed half way
+            _purge_rows(user_id, target)
+            copied = _copy_rows(user_id, source, target, batch_size)
+    except BaseException:
+        assignment.update(moving_to='')
+        forget_placement(user_id)
+        raise
+    assignment.update(shard=target, moving_to='')
+    forget_placement(user_id)
+    time.sleep(grace)
+    with transaction.atomic(using=source):
+        _purge_rows(user_id, source)
+    return copied
@@ -0,0 +1,147 @@
+"""
+signal handlers for core models
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core.authentication import token_cache
+from core.models import (
+    ImageBlob,
+    Ingredient,
+    Recipe,
+    RecipeImageVariant,
+    Tag,
+)
+from core.sharding import (
+    use_shard,
+    user_shards,
+)
+from core.storage import is_content_addressed
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """drop a deleted token from the token cache"""
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """drop cached tokens when a user changes, e.g. password or is_active"""
+    if created:
+        return
+    keys = Token.objects.filter(user=instance).values_list('key', flat=True)
+    token_cache.invalidate(*keys)
+
+
+@receiver(pre_delete, sender=get_user_model())
+def delete_sharded_rows(sender, instance, using, **kwargs):
+    """delete the recipe data a user has on other databases"""
+    for alias in user_shards(instance.pk):
+        if alias == using:
+            continue
+        with use_shard(alias):
+            for model in (Recipe, Tag, Ingredient):
+                model.objects.using(alias).filter(user_id=instance.pk).delete()
+
+
+def acquire_blob(name):
+    """add a reference to a content addressed image"""
+    if not is_content_addressed(name):
+        return
+    with transaction.atomic():
+        # the lock keeps a concurrent release from deleting the blob
+        # between finding and counting it
+        blob, created = ImageBlob.objects.select_for_update().get_or_create(
+            name=name, defaults={'refcount': 1},
+        )
+        if not created:
+            ImageBlob.objects.filter(id=blob.id).update(
+                refcount=F('refcount') + 1,
+            )
+
+
+def release_blob(name, storage):
+    """drop a reference, deleting the file with its last reference"""
+    if not is_content_addressed(name):
+        return
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(name=name).first()
+        if blob is None:
+            return
+        if blob.refcount > 1:
+            ImageBlob.objects.filter(id=blob.id).update(
+                refcount=F('refcount') - 1,
+            )
+            return
+        blob.delete()
+
+    def delete_file():
+        # a concurrent upload may have re-acquired the blob meanwhile
+        if not ImageBlob.objects.filter(name=name).exists():
+            storage.delete(name)
+
+    transaction.on_commit(delete_file)
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_recipe_image(sender, instance, update_fields=None, **kwargs):
+    """note the stored image name before a recipe is saved"""
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    instance._previous_image = (
+        Recipe.objects.filter(id=instance.id)
+        .values_list('image', flat=True)
+        .first()
+        if instance.id else None
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def count_recipe_image(sender, instance, **kwargs):
+    """move the image reference when a recipe's image changes"""
+    if not hasattr(instance, '_previous_image'):
+        return
+    previous = instance._previous_image or ''
+    del instance._previous_image
+    current = instance.image.name or ''
+    if previous == current:
+        return
+    acquire_blob(current)
+    release_blob(previous, instance.image.storage)
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_image(sender, instance, **kwargs):
+    """drop the image reference of a deleted recipe"""
+    release_blob(instance.image.name or '', instance.image.storage)
+
+
+@receiver(post_delete, sender=RecipeImageVariant)
+def delete_variant_file(sender, instance, using, **kwargs):
+    """delete a variant's file once no variant row points at it
+
+    Variants of a shared image are shared by every recipe using it, and
+    replaced variant rows may be written again with the same names, so
+    the check runs when the deletion commits.
+    """
+    name = instance.image.name
+    if not name:
+        return
+    storage = instance.image.storage
+
+    def delete_file():
+        variants = RecipeImageVariant.objects.using(using)
+        if not variants.filter(image=name).exists():
+            storage.delete(name)
+
+    transaction.on_commit(delete_file, using=using)
@@ -0,0 +1,118 @@
+"""
+content addressed storage for uploaded images
+"""
+import hashlib
+import os
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler,
+    TemporaryFileUploadHandler,
+)
+
+HASH_NAME = 'sha256'
+CONTENT_PATH_RE = re.compile(
+    r'(^|/)upload/recipe/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$'
+)
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
+
+def hash_file(content):
+    """return the hex digest of a file, reading it in chunks"""
+    digest = getattr(content, 'content_hash', None)
+    if digest:
+        return digest
+    hasher = hashlib.new(HASH_NAME)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        hasher.update(chunk)
+    content.seek(0)
+    return hasher.hexdigest()
+
+
+def content_path(digest, ext=''):
+    """return the storage path of a blob with the given digest"""
+    return os.path.join(
+        'upload', 'recipe', digest[:2], digest[2:4], f'{digest}{ext.lower()}',
+    )
+
+
+def is_content_addressed(name):
+    """return whether a storage name points at a content addressed blob"""
+    return bool(name and CONTENT_PATH_RE.search(name.replace(os.sep, '/')))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """file system storage that stores identical blobs only once
+
+    Names produced by content_path() are never renamed: saving a blob
+    that already exists keeps the existing file instead of writing a
+    suffixed copy.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        if is_content_addressed(name):
+            return name
+        return super().get_available_name(name, max_length=max_length)
+
+    def _save(self, name, content):
+        if not is_content_addressed(name):
+            return super()._save(name, content)
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            return name
+        # write aside and link into place so concurrent uploads of the same
+        # bytes never see a partial file or overwrite each other
+        temp_name = f'{name}.{uuid.uuid4().hex}.part'
+        temp_name = super()._save(temp_name, content)
+        temp_path = self.path(temp_name)
+        try:
+            os.link(temp_path, full_path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temp_path)
+        return name
+
+
+def get_image_storage():
+    """return the storage used for recipe images"""
+    return ContentAddressedStorage()
+
+
+class HashingUploadMixin:
+    """hash upload chunks as they stream through the handler"""
+
+    def new_file(self, *args, **kwargs):
+        self.hasher = hashlib.new(HASH_NAME)
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        remaining = super().receive_data_chunk(raw_data, start)
+        if remaining is None:
+            self.hasher.update(raw_data)
+        return remaining
+
+    def file_complete(self, file_size):
+        upload = super().file_complete(file_size)
+        if upload is not None:
+            upload.content_hash = self.hasher.hexdigest()
+        return upload
+
+
+class HashingMemoryFileUploadHandler(
+    HashingUploadMixin,
+    MemoryFileUploadHandler,
+):
+    """keep small uploads in memory and record their digest"""
+
+
+class HashingTemporaryFileUploadHandler(
+    HashingUploadMixin,
+    TemporaryFileUploadHandler,
+):
+    """stream large uploads to disk and record their digest"""
+
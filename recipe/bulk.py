@@ -0,0 +1,158 @@
+"""
+batched writers for recipe api
+"""
+import unicodedata
+
+from django.db import (
+    connections,
+    router,
+    transaction,
+)
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from core import sharding
+from recipe.cache import bump_data_version
+from recipe.search import index_recipes
+
+BATCH_SIZE = 500
+
+
+def _chunks(items, size):
+    """yield successive slices of items with at most size elements"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _folded(name):
+    """return name without case and accents"""
+    return ''.join(
+        char for char in unicodedata.normalize('NFKD', name.casefold())
+        if not unicodedata.combining(char)
+    )
+
+
+def name_key(model):
+    """return the function mapping a name to what the database compares
+
+    MySQL's default collations ignore case and accents, so 'Dinner' and
+    'dinner' are the same tag there.
+    """
+    if connections[router.db_for_write(model)].vendor == 'mysql':
+        return _folded
+    return str
+
+
+def resolve_names(model, user, names, batch_size=BATCH_SIZE):
+    """return a name -> object map, creating the names the user lacks
+
+    The map is keyed by name_key(), one entry per name the database
+    considers distinct.
+    """
+    key = name_key(model)
+    unique = {}
+    for name in names:
+        unique.setdefault(key(name), name)
+    names = list(unique.values())
+    found = {}
+    for chunk in _chunks(names, batch_size):
+        for obj in model.objects.filter(user=user, name__in=chunk):
+            found.setdefault(key(obj.name), obj)
+
+    missing = [name for name in names if key(name) not in found]
+    if missing:
+        model.objects.bulk_create(
+            sharding.assign_ids(
+                [model(user=user, name=name) for name in missing],
+            ),
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+        for chunk in _chunks(missing, batch_size):
+            for obj in model.objects.filter(user=user, name__in=chunk):
+                found.setdefault(key(obj.name), obj)
+    return found
+
+
+def _link(through, recipe_field, target_field, pairs, batch_size):
+    """bulk insert the m2m through rows for (recipe_id, target_id) pairs"""
+    through.objects.bulk_create(
+        [
+            through(**{recipe_field: recipe_id, target_field: target_id})
+            for recipe_id, target_id in dict.fromkeys(pairs)
+        ],
+        batch_size=batch_size,
+    )
+
+
+def _insert_recipes(recipes, batch_size):
+    """insert and index recipes, making sure each has its primary key set"""
+    # ids are given out up front, so no backend has to return them
+    Recipe.objects.bulk_create(
+        sharding.assign_ids(recipes), batch_size=batch_size,
+    )
+    # bulk_create sends no post_save, so index_saved_recipe doesn't run
+    index_recipes(recipes, batch_size)
+    return recipes
+
+
+def create_recipes(user, items, batch_size=BATCH_SIZE):
+    """create recipes with their tags and ingredients in one transaction
+
+    items are validated RecipeSerializer payloads. Tags and ingredients are
+    resolved with a fixed number of queries per batch and the m2m rows are
+    written with bulk_create.
+    """
+    items = [dict(item) for item in items]
+    tag_names = [
+        tag['name'] for item in items for tag in item.get('tags', [])
+    ]
+    ingredient_names = [
+        ingredient['name']
+        for item in items for ingredient in item.get('ingredients', [])
+    ]
+
+    with sharding.for_user(user.id), transaction.atomic(
+        using=router.db_for_write(Recipe),
+    ):
+        tags = resolve_names(Tag, user, tag_names, batch_size)
+        ingredients = resolve_names(
+            Ingredient, user, ingredient_names, batch_size,
+        )
+        recipes = _insert_recipes(
+            [
+                Recipe(
+                    user=user,
+                    **{
+                        k: v for k, v in item.items()
+                        if k not in ('tags', 'ingredients')
+                    },
+                )
+                for item in items
+            ],
+            batch_size,
+        )
+
+        tag_key = name_key(Tag)
+        ingredient_key = name_key(Ingredient)
+        tag_pairs = []
+        ingredient_pairs = []
+        for recipe, item in zip(recipes, items):
+            tag_pairs.extend(
+                (recipe.id, tags[tag_key(tag['name'])].id)
+                for tag in item.get('tags', [])
+            )
+            ingredient_pairs.extend(
+                (recipe.id, ingredients[ingredient_key(ingredient['name'])].id)
+                for ingredient in item.get('ingredients', [])
+            )
+        _link(Recipe.tags.through, 'recipe_id', 'tag_id', tag_pairs,
+              batch_size)
+        _link(Recipe.ingredients.through, 'recipe_id', 'ingredient_id',
+              ingredient_pairs, batch_size)
+
+    bump_data_version(user.id)
+    return recipes
@@ -0,0 +1,217 @@
+"""
+per user versioned response cache for recipe api
+"""
+import hashlib
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import (
+    connections,
+    transaction,
+)
+from rest_framework.response import Response
+
+from core.routers import (
+    reads_from_replica,
+    replica_staleness,
+)
+
+LIST_PARAMS = ('tags', 'ingredients', 'fields', 'omit')
+FLAG_PARAMS = ('assigned_only', 'with_counts')
+
+
+def _options():
+    """return the response cache settings with defaults filled in"""
+    options = {
+        'BACKEND': 'default',
+        'TIMEOUT': 300,
+        'KEY_PREFIX': 'recipe-api',
+    }
+    options.update(getattr(settings, 'RECIPE_RESPONSE_CACHE', {}))
+    return options
+
+
+def _cache():
+    """return the django cache used for responses"""
+    return caches[_options()['BACKEND']]
+
+
+def _version_key(user_id):
+    """return the cache key holding the data version of a user"""
+    return f"{_options()['KEY_PREFIX']}:version:{user_id}"
+
+
+def _bumped_key(user_id):
+    """return the cache key marking a user's data as recently changed"""
+    return f"{_options()['KEY_PREFIX']}:bumped:{user_id}"
+
+
+def get_data_version(user_id):
+    """return the current data version of a user
+
+    A missing version is seeded from the clock rather than zero so an
+    evicted counter can never bring back responses cached under it.
+    """
+    cache = _cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key)
+    return version
+
+
+async def aget_data_version(user_id):
+    """async version of get_data_version()"""
+    cache = _cache()
+    key = _version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(key, version, None):
+            version = await cache.aget(key)
+    return version
+
+
+def bump_data_version(user_id):
+    """invalidate every cached response of a user
+
+    Inside a transaction the version is bumped again once it commits, as
+    responses cached in between were read without the change. Replicas
+    may not have it yet either, so responses read from them are not
+    cached until replica_staleness() has passed.
+    """
+    _bump(user_id)
+    for connection in connections.all(initialized_only=True):
+        if connection.in_atomic_block:
+            transaction.on_commit(
+                partial(_bump, user_id), using=connection.alias,
+            )
+
+
+def _bump(user_id):
+    cache = _cache()
+    key = _version_key(user_id)
+    cache.set(_bumped_key(user_id), True, replica_staleness())
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def normalize_params(query_params):
+    """return a canonical string for the query params of a request"""
+    items = []
+    for name in sorted(query_params):
+        values = query_params.getlist(name)
+        if name in LIST_PARAMS:
+            ids = {
+                part.strip() for value in values for part in value.split(',')
+            }
+            values = sorted(ids - {''}, key=lambda x: (len(x), x))
+        elif name in FLAG_PARAMS:
+            values = ['1' if any(v not in ('', '0') for v in values) else '0']
+        items.append(f"{name}={','.join(values)}")
+    return '&'.join(items)
+
+
+def _response_key(request, version, view_name, action):
+    """return the cache key of a request under a data version
+
+    Responses read from a replica are kept apart from primary ones, so a
+    client pinned to the primary after a write never gets a body built
+    from a replica that had not caught up.
+    """
+    digest = hashlib.sha1(
+        f'{request.get_host()}?{normalize_params(request.query_params)}'
+        .encode()
+    ).hexdigest()
+    source = 'replica' if reads_from_replica() else 'primary'
+    return (
+        f"{_options()['KEY_PREFIX']}:response:{request.user.id}:"
+        f'{version}:{source}:{view_name}:{action}:{digest}'
+    )
+
+
+def response_key(request, view_name, action):
+    """return the cache key for a request against a view action
+
+    None means the response must not be cached: it is read from a replica
+    that may still miss the user's latest change.
+    """
+    user_id = request.user.id
+    if reads_from_replica() and _cache().get(_bumped_key(user_id)):
+        return None
+    version = get_data_version(user_id)
+    return _response_key(request, version, view_name, action)
+
+
+async def aresponse_key(request, view_name, action):
+    """async version of response_key()"""
+    user_id = request.user.id
+    if reads_from_replica() and await _cache().aget(_bumped_key(user_id)):
+        return None
+    version = await aget_data_version(user_id)
+    return _response_key(request, version, view_name, action)
+
+
+def remember(key, compute):
+    """return the cached value for key, computing and storing it on a miss
+
+    With key None the value is computed and not stored.
+    """
+    if key is None:
+        return compute()
+    cache = _cache()
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, _options()['TIMEOUT'])
+    return value
+
+
+async def aremember(key, compute):
+    """async version of remember(), compute returns an awaitable"""
+    if key is None:
+        return await compute()
+    cache = _cache()
+    value = await cache.aget(key)
+    if value is None:
+        value = await compute()
+        await cache.aset(key, value, _options()['TIMEOUT'])
+    return value
+
+
+class CachedListMixin:
+    """serve list responses from the per user versioned cache"""
+
+    def list(self, request, *args, **kwargs):
+        key = response_key(request, self.basename, 'list')
+        if key is None:
+            return super().list(request, *args, **kwargs)
+        cache = _cache()
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, _options()['TIMEOUT'])
+        return response
+
+    async def alist(self, request, *args, **kwargs):
+        key = await aresponse_key(request, self.basename, 'list')
+        if key is None:
+            return await super().alist(request, *args, **kwargs)
+        cache = _cache()
+        data = await cache.aget(key)
+        if data is not None:
+            return Response(data)
+
+        response = await super().alist(request, *args, **kwargs)
+        if response.status_code == 200:
+            await cache.aset(key, response.data, _options()['TIMEOUT'])
+        return response
@@ -0,0 +1,160 @@
+"""
+conditional GET support for recipe api
+"""
+import hashlib
+
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from recipe.cache import (
+    aremember,
+    aresponse_key,
+    normalize_params,
+    remember,
+    response_key,
+)
+
+
+def make_etag(*parts):
+    """return a strong etag for the given state"""
+    return '"%s"' % hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def etag_matches(etag, header):
+    """return True if an If-None-Match header names etag
+
+    '*' is not matched here, it stands for any current representation and
+    only rendering tells whether one exists, see matches_any().
+    """
+    if not header:
+        return False
+    candidates = parse_etags(header)
+    return etag in {
+        candidate[2:] if candidate.startswith('W/') else candidate
+        for candidate in candidates
+    }
+
+
+def matches_any(header):
+    """return True if an If-None-Match header is '*'"""
+    return bool(header) and '*' in parse_etags(header)
+
+
+class ConditionalGetMixin:
+    """answer GET requests with ETags and 304 Not Modified
+
+    Views implement get_etag_queries() returning (queryset, aggregates)
+    pairs whose results are cheap row state, such as counts and
+    max(updated_at), for the current action. The computed etag is
+    remembered under the user's data version so repeat requests do not
+    touch the database. Each negotiated format has an etag of its own, as
+    the bodies differ, and responses vary on Accept.
+    """
+
+    def get_etag_queries(self):
+        raise NotImplementedError
+
+    def get_etag_state(self):
+        """return the row state of the current request"""
+        return [
+            queryset.aggregate(**aggregates)
+            for queryset, aggregates in self.get_etag_queries()
+        ]
+
+    async def aget_etag_state(self):
+        """async version of get_etag_state()"""
+        return [
+            await queryset.aaggregate(**aggregates)
+            for queryset, aggregates in self.get_etag_queries()
+        ]
+
+    def _etag_name(self):
+        """return the action and lookup the etag is cached under"""
+        name = self.action
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if lookup is not None:
+            name = f'{name}:{lookup}'
+        renderer = getattr(self.request, 'accepted_renderer', None)
+        if renderer is not None:
+            name = f'{name}:{renderer.format}'
+        return name
+
+    def _make_etag(self, name, state):
+        return make_etag(
+            self.basename,
+            name,
+            normalize_params(self.request.query_params),
+            state,
+        )
+
+    def get_etag(self):
+        """return the etag of the current request"""
+        name = self._etag_name()
+        return remember(
+            response_key(self.request, self.basename, f'etag:{name}'),
+            lambda: self._make_etag(name, self.get_etag_state()),
+        )
+
+    async def aget_etag(self):
+        """async version of get_etag()"""
+        name = self._etag_name()
+
+        async def compute():
+            return self._make_etag(name, await self.aget_etag_state())
+
+        return await aremember(
+            await aresponse_key(self.request, self.basename, f'etag:{name}'),
+            compute,
+        )
+
+    def _not_modified(self, etag):
+        """return a 304 response for etag"""
+        response = Response(
+            status=status.HTTP_304_NOT_MODIFIED,
+            headers={'ETag': etag},
+        )
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def _rendered(self, request, etag, response):
+        """tag a rendered response, or answer 304 to If-None-Match: *"""
+        if response.status_code != status.HTTP_200_OK:
+            # e.g. a 404, '*' only matches what exists
+            return response
+        if matches_any(request.headers.get('If-None-Match')):
+            return self._not_modified(etag)
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def conditional_response(self, request, render):
+        """return 304 when the client copy is current, else render()"""
+        etag = self.get_etag()
+        if etag_matches(etag, request.headers.get('If-None-Match')):
+            return self._not_modified(etag)
+        return self._rendered(request, etag, render())
+
+    async def aconditional_response(self, request, render):
+        """async version of conditional_response(), render is awaited"""
+        etag = await self.aget_etag()
+        if etag_matches(etag, request.headers.get('If-None-Match')):
+            return self._not_modified(etag)
+        return self._rendered(request, etag, await render())
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request,
+            lambda: super(ConditionalGetMixin, self).list(
+                request, *args, **kwargs
+            ),
+        )
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.aconditional_response(
+            request,
+            lambda: super(ConditionalGetMixin, self).alist(
+                request, *args, **kwargs
+            ),
+        )
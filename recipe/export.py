@@ -0,0 +1,67 @@
+"""
+streaming export of recipe api data
+"""
+import json
+from collections import defaultdict
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core.models import Recipe
+from core.sharding import for_user
+
+EXPORT_FIELDS = ['id', 'title', 'description', 'time_minute', 'price', 'link']
+CHUNK_SIZE = 500
+
+
+def _names_by_recipe(through, target, recipe_ids):
+    """return recipe id -> list of related names for one m2m relation"""
+    names = defaultdict(list)
+    rows = through.objects.filter(recipe_id__in=recipe_ids).order_by(
+        f'{target}__name',
+    ).values_list('recipe_id', f'{target}__name')
+    for recipe_id, name in rows:
+        names[recipe_id].append({'name': name})
+    return names
+
+
+def _attach_relations(rows):
+    """add tags and ingredients to a batch of recipe rows"""
+    ids = [row['id'] for row in rows]
+    tags = _names_by_recipe(Recipe.tags.through, 'tag', ids)
+    ingredients = _names_by_recipe(
+        Recipe.ingredients.through, 'ingredient', ids,
+    )
+    for row in rows:
+        row['tags'] = tags.get(row['id'], [])
+        row['ingredients'] = ingredients.get(row['id'], [])
+    return rows
+
+
+def iter_recipes(user, chunk_size=CHUNK_SIZE):
+    """yield every recipe of a user as a dict, one chunk in memory at a time
+
+    Recipes are read in id order, one keyset query per chunk, as drivers
+    like mysqlclient buffer a whole result set even for iterator(). Tags
+    and ingredients are loaded with two queries per chunk. The rows are
+    read after the view has returned, so the user's shard is bound here.
+    """
+    recipes = Recipe.objects.filter(user=user).order_by('id').values(
+        *EXPORT_FIELDS,
+    )
+    last_id = 0
+    while True:
+        with for_user(user.id):
+            batch = list(recipes.filter(id__gt=last_id)[:chunk_size])
+            if not batch:
+                return
+            _attach_relations(batch)
+        yield from batch
+        if len(batch) < chunk_size:
+            return
+        last_id = batch[-1]['id']
+
+
+def iter_ndjson(user, chunk_size=CHUNK_SIZE):
+    """yield the recipes of a user as newline delimited json"""
+    for recipe in iter_recipes(user, chunk_size):
+        yield json.dumps(recipe, cls=DjangoJSONEncoder) + '\n'
@@ -0,0 +1,134 @@
+"""
+read-only fast path for list responses
+"""
+from collections import defaultdict
+
+from rest_framework.response import Response
+from rest_framework.serializers import ListSerializer
+
+
+class FastListSerializer:
+    """render list rows from values() and one query per m2m relation
+
+    Produces the same data as serializer_class(many=True) for read-only
+    lists without building model instances or nested serializers per row.
+    Scalar fields reuse the serializer's own to_representation, nested
+    many=True fields are rendered from their child serializer's fields.
+    """
+
+    def __init__(self, serializer_class, fields=None):
+        serializer = serializer_class(fields=fields)
+        self.model = serializer.Meta.model
+        self.columns = ['id']
+        self.plan = []
+        for name, field in serializer.fields.items():
+            if isinstance(field, ListSerializer):
+                names = list(field.child.fields)
+                self.plan.append((name, field.source, names))
+            else:
+                self.plan.append((name, field.source, field.to_representation))
+                if field.source not in self.columns:
+                    self.columns.append(field.source)
+
+    def get_queryset(self, queryset):
+        """return the values() rows this serializer reads"""
+        annotations = list(queryset.query.annotations)
+        return queryset.prefetch_related(None).values(
+            *self.columns, *annotations,
+        )
+
+    def _related_queries(self, ids):
+        """yield (field name, child names, through rows) per m2m field"""
+        for name, source, step in self.plan:
+            if not isinstance(step, list) or not ids:
+                continue
+            field = self.model._meta.get_field(source)
+            through = field.remote_field.through
+            owner = field.m2m_field_name()
+            target = field.m2m_reverse_field_name()
+            yield name, step, through.objects.filter(
+                **{f'{owner}_id__in': ids}
+            ).order_by(f'{target}_id').values_list(
+                f'{owner}_id', *[f'{target}__{child}' for child in step],
+            )
+
+    def _group(self, names, rows):
+        """return {row id: [nested dicts]} for the rows of a relation"""
+        related = defaultdict(list)
+        for owner_id, *values in rows:
+            related[owner_id].append(dict(zip(names, values)))
+        return related
+
+    def render(self, rows):
+        """return the representation of a page of values() rows"""
+        ids = [row['id'] for row in rows]
+        related = {
+            name: self._group(names, queryset)
+            for name, names, queryset in self._related_queries(ids)
+        }
+        return self._build(rows, related)
+
+    async def arender(self, rows):
+        """async version of render()"""
+        ids = [row['id'] for row in rows]
+        related = {
+            name: self._group(names, [row async for row in queryset])
+            for name, names, queryset in self._related_queries(ids)
+        }
+        return self._build(rows, related)
+
+    def _build(self, rows, related):
+        """return the list items of rows given their related rows"""
+        data = []
+        for row in rows:
+            item = {}
+            for name, source, step in self.plan:
+                if isinstance(step, list):
+                    item[name] = related[name].get(row['id'], [])
+                else:
+                    value = row[source]
+                    item[name] = None if value is None else step(value)
+            data.append(item)
+        return data
+
+
+class FastListMixin:
+    """serve list responses through FastListSerializer
+
+    Set fast_list = False on a view to fall back to the regular
+    serializer. The view's sparse fieldset, if any, is honoured.
+    """
+    fast_list = True
+
+    def get_fast_list_serializer(self):
+        """return the FastListSerializer for the current request"""
+        get_fieldset = getattr(self, 'get_fieldset', None)
+        return FastListSerializer(
+            self.get_serializer_class(),
+            fields=get_fieldset() if get_fieldset else None,
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_list:
+            return super().list(request, *args, **kwargs)
+        serializer = self.get_fast_list_serializer()
+        queryset = serializer.get_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.render(page))
+        return Response(serializer.render(list(queryset)))
+
+    async def alist(self, request, *args, **kwargs):
+        if not self.fast_list:
+            return await super().alist(request, *args, **kwargs)
+        serializer = self.get_fast_list_serializer()
+        queryset = serializer.get_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(await serializer.arender(page))
+        rows = [row async for row in queryset]
+        return Response(await serializer.arender(rows))
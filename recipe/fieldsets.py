@@ -0,0 +1,68 @@
+"""
+sparse fieldsets (?fields= / ?omit=) for recipe api
+"""
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def _names(query_params, param):
+    """return the comma separated names of a query param"""
+    return {
+        part.strip()
+        for value in query_params.getlist(param)
+        for part in value.split(',')
+    } - {''}
+
+
+def parse_fieldset(query_params, available):
+    """return the field names to render, or None for all of them
+
+    Raises ValidationError naming the param that asks for an unknown field.
+    """
+    fields = _names(query_params, FIELDS_PARAM)
+    omit = _names(query_params, OMIT_PARAM)
+    if not fields and not omit:
+        return None
+    for param, names in ((FIELDS_PARAM, fields), (OMIT_PARAM, omit)):
+        unknown = names - set(available)
+        if unknown:
+            raise ValidationError({param: (
+                f'Unknown fields: {", ".join(sorted(unknown))}. '
+                f'Must be among {", ".join(available)}.'
+            )})
+    keep = fields or set(available)
+    return keep - omit
+
+
+class SparseFieldsetMixin:
+    """render only the fields asked for with ?fields= or ?omit=
+
+    The serializer class must accept fields= (see
+    serializers.SparseFieldsMixin). Views use wants() to leave out
+    prefetches and columns nobody renders.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def get_fieldset(self):
+        """return the fields to render for this request, or None for all"""
+        if not hasattr(self, '_fieldset'):
+            self._fieldset = None
+            if self.action in self.sparse_actions:
+                self._fieldset = parse_fieldset(
+                    self.request.query_params,
+                    self.get_serializer_class().Meta.fields,
+                )
+        return self._fieldset
+
+    def wants(self, name):
+        """return True if the response renders the named field"""
+        fieldset = self.get_fieldset()
+        return fieldset is None or name in fieldset
+
+    def get_serializer(self, *args, **kwargs):
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            kwargs.setdefault('fields', fieldset)
+        return super().get_serializer(*args, **kwargs)
@@ -0,0 +1,39 @@
+"""
+relation filters for recipe api
+"""
+from django.db.models import (
+    Count,
+    Exists,
+    OuterRef,
+)
+
+from core.models import Recipe
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+
+
+def _through(relation):
+    """return the through model and target column of a recipe m2m"""
+    field = Recipe._meta.get_field(relation)
+    through = field.remote_field.through
+    return through, field.m2m_reverse_name()
+
+
+def filter_by_related(queryset, relation, ids, match=MATCH_ANY):
+    """keep recipes linked to any or all of ids through relation
+
+    Both modes run as a semi-join on the through table, so the recipe rows
+    are never multiplied and no DISTINCT is needed. match=all keeps the
+    recipes whose count of distinct matching links equals the number of
+    requested ids.
+    """
+    through, target = _through(relation)
+    ids = set(ids)
+    links = through.objects.filter(**{f'{target}__in': ids})
+    if match == MATCH_ALL:
+        complete = links.values('recipe_id').annotate(
+            matched=Count(target, distinct=True),
+        ).filter(matched=len(ids)).values('recipe_id')
+        return queryset.filter(id__in=complete)
+    return queryset.filter(Exists(links.filter(recipe_id=OuterRef('pk'))))
@@ -0,0 +1,50 @@
+"""
+image resizing used by the thumbnail workers
+
+This module only depends on Pillow so it can be imported by freshly
+spawned worker processes without setting up Django.
+"""
+import os
+
+from PIL import (
+    Image,
+    ImageOps,
+)
+
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp', 'PNG': 'png'}
+
+
+def render_variants(source_path, output_dir, stem, sizes, formats, quality):
+    """write resized copies of an image and return their descriptions
+
+    The orientation from the EXIF data is applied to the pixels and no
+    metadata is copied to the variants.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+
+        variants = []
+        for size in sorted(sizes, reverse=True):
+            if max(image.size) > size:
+                image = image.copy()
+                image.thumbnail((size, size), Image.LANCZOS)
+            for fmt in formats:
+                frame = image
+                if fmt == 'JPEG' and frame.mode != 'RGB':
+                    frame = frame.convert('RGB')
+                filename = f'{stem}-{size}.{EXTENSIONS[fmt]}'
+                frame.save(
+                    os.path.join(output_dir, filename),
+                    format=fmt,
+                    quality=quality,
+                    optimize=True,
+                )
+                variants.append({
+                    'size': size,
+                    'format': fmt,
+                    'filename': filename,
+                })
+    return variants
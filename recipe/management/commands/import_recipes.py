@@ -0,0 +1,220 @@
+"""
+Django command to bulk import recipes from JSONL or CSV.
+"""
+import csv
+import json
+import os
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.db import connections
+from rest_framework.exceptions import ValidationError
+
+from recipe import bulk
+from recipe.serializers import RecipeDetailSerializer
+
+
+def _read_jsonl(handle):
+    """yield (line number, row, error) for each json line"""
+    for number, line in enumerate(handle, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield number, None, {
+                'non_field_errors': [
+                    f'Invalid JSON: {exc.msg} at column {exc.colno}.',
+                ],
+            }
+            continue
+        if not isinstance(row, dict):
+            yield number, None, {
+                'non_field_errors': ['Expected a JSON object.'],
+            }
+            continue
+        yield number, row, None
+
+
+def _read_csv(handle, list_sep):
+    """yield (line number, row, error) for each csv record"""
+    for number, row in enumerate(csv.DictReader(handle), 2):
+        for field in ('tags', 'ingredients'):
+            names = (row.get(field) or '').split(list_sep)
+            row[field] = [{'name': n.strip()} for n in names if n.strip()]
+        yield number, row, None
+
+
+def read_rows(path, fmt, list_sep='|'):
+    """yield (line number, row, error) from a JSONL or CSV file
+
+    Lines that cannot be read give a None row and the error detail, in
+    the shape of a validation error, so one bad line skips only itself.
+    """
+    with open(path, newline='', encoding='utf-8') as handle:
+        if fmt == 'csv':
+            yield from _read_csv(handle, list_sep)
+        else:
+            yield from _read_jsonl(handle)
+
+
+def _init_worker():
+    """prepare django in a worker process"""
+    django.setup()
+    connections.close_all()
+
+
+def import_file(path, fmt, default_user, batch_size, list_sep='|'):
+    """import one file and return (imported, errors)"""
+    users = {}
+    batches = {}
+    imported = 0
+    errors = []
+    # one serializer validates every row so its fields are built only once
+    serializer = RecipeDetailSerializer()
+
+    def flush(user):
+        nonlocal imported
+        items = batches.pop(user.id, [])
+        if items:
+            bulk.create_recipes(user, items, batch_size)
+            imported += len(items)
+
+    for number, row, error in read_rows(path, fmt, list_sep):
+        if error is not None:
+            errors.append((number, error))
+            continue
+        number = row.pop('_line', number)
+        email = row.pop('user', None) or default_user
+        if not email:
+            errors.append((number, {'user': ['No user given.']}))
+            continue
+        if email not in users:
+            users[email] = get_user_model().objects.filter(
+                email=email,
+            ).first()
+        user = users[email]
+        if user is None:
+            errors.append((number, {'user': [f'Unknown user {email}.']}))
+            continue
+
+        try:
+            validated_data = serializer.run_validation(row)
+        except ValidationError as exc:
+            errors.append((number, exc.detail))
+            continue
+        batch = batches.setdefault(user.id, [])
+        batch.append(validated_data)
+        if len(batch) >= batch_size:
+            flush(user)
+
+    for user in users.values():
+        if user is not None:
+            flush(user)
+    return imported, errors
+
+
+class Command(BaseCommand):
+    """Import recipes for one or more users with bulk inserts."""
+    help = 'Import recipes from a JSONL or CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--user',
+            help='email of the owner for rows without a "user" field',
+        )
+        parser.add_argument('--format', choices=['jsonl', 'csv'])
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--list-sep', default='|',
+            help='separator of tag and ingredient names in CSV cells',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='shard rows by user across this many processes; '
+                 'SQLite allows one writer, so use 1 there',
+        )
+
+    def _partition(self, path, fmt, workers, options):
+        """split the input by user into one JSONL file per worker
+
+        Returns the paths and the errors of lines that could not be read.
+        """
+        directory = tempfile.mkdtemp(prefix='import-recipes-')
+        paths = [os.path.join(directory, f'{i}.jsonl') for i in range(workers)]
+        handles = [open(p, 'w', encoding='utf-8') for p in paths]
+        errors = []
+        try:
+            for number, row, error in read_rows(
+                path, fmt, options['list_sep'],
+            ):
+                if error is not None:
+                    errors.append((number, error))
+                    continue
+                row['_line'] = number
+                email = row.get('user') or options['user'] or ''
+                shard = zlib.crc32(email.encode()) % workers
+                handles[shard].write(json.dumps(row) + '\n')
+        finally:
+            for handle in handles:
+                handle.close()
+        return paths, errors
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} does not exist.')
+        fmt = options['format'] or (
+            'csv' if path.lower().endswith('.csv') else 'jsonl'
+        )
+        batch_size = options['batch_size']
+        workers = options['workers']
+        started = time.perf_counter()
+
+        if workers > 1:
+            partitions, unreadable = self._partition(
+                path, fmt, workers, options,
+            )
+            connections.close_all()
+            with ProcessPoolExecutor(workers, initializer=_init_worker) as pool:
+                results = list(pool.map(
+                    import_file,
+                    partitions,
+                    ['jsonl'] * workers,
+                    [options['user']] * workers,
+                    [batch_size] * workers,
+                ))
+            for partition in partitions:
+                os.remove(partition)
+            os.rmdir(os.path.dirname(partitions[0]))
+            results.append((0, unreadable))
+        else:
+            results = [import_file(
+                path, fmt, options['user'], batch_size, options['list_sep'],
+            )]
+
+        imported = sum(count for count, _ in results)
+        errors = sorted(
+            (error for _, errs in results for error in errs),
+            key=lambda error: error[0],
+        )
+        for number, error in errors:
+            self.stderr.write(f'line {number}: {json.dumps(error)}')
+
+        elapsed = time.perf_counter() - started
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} recipes in {elapsed:.2f}s '
+            f'({rate:,.0f} recipes/s, {rate * 3600:,.0f} recipes/h), '
+            f'{len(errors)} rows skipped.'
+        ))
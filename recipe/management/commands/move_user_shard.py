@@ -0,0 +1,48 @@
+"""
+Django command to move a user's recipe data to another shard.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from core import sharding
+from recipe.cache import bump_data_version
+
+
+class Command(BaseCommand):
+    """Move the recipes, tags and ingredients of one user between shards."""
+    help = "Move a user's recipe data to another shard while the site runs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('email')
+        parser.add_argument(
+            'shard', nargs='?',
+            help="target shard, the user's place on the hash ring by default",
+        )
+        parser.add_argument(
+            '--grace', type=float,
+            help='seconds to let requests using the old placement finish, '
+                 'the placement cache timeout by default',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not sharding.enabled():
+            raise CommandError('Sharding is not configured.')
+        user = get_user_model().objects.filter(email=options['email']).first()
+        if user is None:
+            raise CommandError(f'Unknown user {options["email"]}.')
+        target = options['shard'] or sharding.ring().node(user.id)
+        if target not in sharding.shards():
+            raise CommandError(f'{target} is not one of the shards.')
+
+        source = sharding.placement(user.id).shard
+        copied = sharding.move_user(
+            user.id, target, options['grace'], options['batch_size'],
+        )
+        bump_data_version(user.id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {copied} rows of {user.email} from {source} to {target}.'
+        ))
@@ -0,0 +1,38 @@
+"""
+Django command to rebuild the recipe search index.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from core import sharding
+from core.models import Recipe
+from recipe.search import rebuild_index
+
+
+class Command(BaseCommand):
+    """Rebuild the inverted index used by recipe search."""
+    help = 'Rebuild the recipe search index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='only rebuild this email')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = get_user_model().objects.filter(
+                email=options['user'],
+            ).first()
+            if user is None:
+                raise CommandError(f'Unknown user {options["user"]}.')
+            with sharding.for_user(user.id):
+                rebuild_index(
+                    Recipe.objects.filter(user=user), options['batch_size'],
+                )
+        else:
+            for alias in sharding.shards():
+                with sharding.use_shard(alias):
+                    rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
@@ -0,0 +1,204 @@
+"""
+protected delivery of recipe images
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    StreamingHttpResponse,
+)
+from django.utils.cache import get_conditional_response
+from django.utils.http import (
+    http_date,
+    parse_etags,
+)
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from core.authentication import CachedTokenAuthentication
+from core.models import (
+    Recipe,
+    RecipeImageVariant,
+)
+from core.storage import (
+    IMMUTABLE_CACHE_CONTROL,
+    is_content_addressed,
+)
+from core.sharding import ShardRoutingMixin
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def _options():
+    """return the media delivery settings with defaults filled in"""
+    options = {
+        'BACKEND': None,
+        'INTERNAL_PREFIX': '/protected-media/',
+    }
+    options.update(getattr(settings, 'MEDIA_SENDFILE', {}))
+    return options
+
+
+def file_etag(name, stat):
+    """return the etag of a stored file"""
+    if is_content_addressed(name):
+        digest = os.path.splitext(os.path.basename(name))[0]
+        return f'"{digest}"'
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """return the (start, end) of a single byte range, both inclusive
+
+    Returns None when there is no usable range and the whole file should
+    be sent, and raises ValueError when the range cannot be satisfied.
+    Multiple ranges are answered with the whole file.
+    """
+    match = RANGE_RE.match(header.replace(' ', '')) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _read_range(path, start, length):
+    """yield length bytes of a file from start"""
+    with open(path, 'rb') as source:
+        source.seek(start)
+        while length > 0:
+            data = source.read(min(CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def _if_range_matches(request, etag, last_modified):
+    """return whether a range request may be answered partially"""
+    header = request.headers.get('If-Range')
+    if not header:
+        return True
+    if header.startswith('"') or header.startswith('W/'):
+        return etag in parse_etags(header)
+    return header == http_date(last_modified)
+
+
+def serve_file(request, name, storage):
+    """return a response delivering a stored file
+
+    With a sendfile backend configured the body is left to the front-end
+    server; otherwise the file is streamed with support for ranges and
+    conditional requests.
+    """
+    try:
+        full_path = storage.path(name)
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404('File not found.')
+    etag = file_etag(name, stat)
+    last_modified = int(stat.st_mtime)
+    content_type = mimetypes.guess_type(full_path)[0]
+    content_type = content_type or 'application/octet-stream'
+
+    def finish(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Accept-Ranges'] = 'bytes'
+        response['Cache-Control'] = (
+            IMMUTABLE_CACHE_CONTROL if is_content_addressed(name)
+            else 'private, no-cache'
+        )
+        return response
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified,
+    )
+    if response is not None:
+        return finish(response)
+
+    options = _options()
+    if options['BACKEND'] == 'nginx':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = (
+            options['INTERNAL_PREFIX'].rstrip('/') + '/' + quote(name)
+        )
+        return finish(response)
+    if options['BACKEND'] == 'sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+        return finish(response)
+
+    size = stat.st_size
+    byte_range = None
+    if request.method == 'GET' and _if_range_matches(
+        request, etag, last_modified,
+    ):
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return finish(response)
+    if byte_range is None:
+        # FileResponse hands the open file to wsgi.file_wrapper when the
+        # server offers one, which can use sendfile(2)
+        return finish(FileResponse(
+            open(full_path, 'rb'), content_type=content_type,
+        ))
+    start, end = byte_range
+    response = StreamingHttpResponse(
+        _read_range(full_path, start, end - start + 1),
+        status=206,
+        content_type=content_type,
+    )
+    response['Content-Length'] = str(end - start + 1)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return finish(response)
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """skip Accept checks, the media view answers with file bytes"""
+
+    def select_parser(self, request, parsers):
+        return parsers[0] if parsers else None
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+class RecipeMediaView(ShardRoutingMixin, APIView):
+    """serve recipe images and variants to the recipe owner"""
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def get(self, request, path):
+        recipes = Recipe.objects.filter(user=request.user)
+        owned = recipes.filter(image=path).exists() or (
+            RecipeImageVariant.objects
+            .filter(recipe__in=recipes, image=path)
+            .exists()
+        )
+        if not owned:
+            raise Http404('File not found.')
+        storage = Recipe._meta.get_field('image').storage
+        return serve_file(request, path, storage)
@@ -0,0 +1,116 @@
+"""
+pagination for recipe api
+"""
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    """keyset pagination over the recipe list ordered by newest first
+
+    DRF keys cursors on the first ordering field only and steps over ties
+    with an OFFSET. Orderings of several fields, e.g. search rank then id,
+    are keyed on all of them instead, so a position is unique and pages
+    never need an offset.
+    """
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_ordering(self, request, queryset, view):
+        """let the view order differently, e.g. by search rank"""
+        get_ordering = getattr(view, 'get_pagination_ordering', None)
+        ordering = get_ordering() if get_ordering else None
+        if ordering:
+            return tuple(ordering)
+        return super().get_ordering(request, queryset, view)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if len(self.get_ordering(request, queryset, view)) == 1:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is not None:
+            # positions are unique, there is no tie to skip with an offset
+            self.cursor = self.cursor._replace(offset=0)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor else None
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(position, reverse))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = None
+        if len(results) > len(self.page):
+            following = self._get_position_from_instance(
+                results[-1], self.ordering,
+            )
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = following is not None
+            self.next_position = position
+            self.previous_position = following
+        else:
+            self.has_next = following is not None
+            self.has_previous = position is not None
+            self.next_position = following
+            self.previous_position = position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _after(self, position, reverse):
+        """return the filter for rows past position in the page direction"""
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        after = Q()
+        tied = Q()
+        for order, value in zip(self.ordering, values):
+            field = order.lstrip('-')
+            lookup = 'lt' if order.startswith('-') != reverse else 'gt'
+            after |= tied & Q(**{f'{field}__{lookup}': value})
+            tied &= Q(**{field: value})
+        return after
+
+    def _get_position_from_instance(self, instance, ordering):
+        if len(ordering) == 1:
+            return super()._get_position_from_instance(instance, ordering)
+        values = []
+        for order in ordering:
+            field = order.lstrip('-')
+            if isinstance(instance, dict):
+                values.append(str(instance[field]))
+            else:
+                values.append(str(getattr(instance, field)))
+        return json.dumps(values)
+
+
+def _reverse(ordering):
+    """return ordering with every direction flipped"""
+    return tuple(
+        order[1:] if order.startswith('-') else f'-{order}'
+        for order in ordering
+    )
@@ -0,0 +1,138 @@
+"""
+full text search for recipe api
+"""
+import re
+
+from django.conf import settings
+from django.db import (
+    connections,
+    router,
+)
+from django.db.models import (
+    FloatField,
+    OuterRef,
+    Subquery,
+    Sum,
+)
+from django.db.models.expressions import RawSQL
+
+from core.models import (
+    Recipe,
+    RecipeSearchTerm,
+)
+
+TITLE_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+MAX_TERM_LENGTH = 64
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from in is it of on or the to with'.split()
+)
+
+
+def tokenize(text):
+    """return the normalized search terms of text"""
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall((text or '').lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def term_weights(title, description):
+    """return term -> weight for a recipe's searchable text"""
+    weights = {}
+    for text, weight in ((title, TITLE_WEIGHT), (description, DESCRIPTION_WEIGHT)):
+        for term in tokenize(text):
+            weights[term] = weights.get(term, 0) + weight
+    return weights
+
+
+def _entries(recipe, weights):
+    """return unsaved index entries for one recipe"""
+    return [
+        RecipeSearchTerm(
+            user_id=recipe.user_id, recipe_id=recipe.id, term=term, weight=w,
+        )
+        for term, w in weights.items()
+    ]
+
+
+def index_recipe(recipe):
+    """bring the index entries of one recipe up to date"""
+    weights = term_weights(recipe.title, recipe.description)
+    current = dict(
+        RecipeSearchTerm.objects.filter(recipe_id=recipe.id)
+        .values_list('term', 'weight')
+    )
+    if current == weights:
+        return
+    RecipeSearchTerm.objects.filter(recipe_id=recipe.id).delete()
+    RecipeSearchTerm.objects.bulk_create(_entries(recipe, weights))
+
+
+def index_recipes(recipes, batch_size=1000):
+    """index freshly created recipes in bulk"""
+    entries = [
+        entry
+        for recipe in recipes
+        for entry in _entries(
+            recipe, term_weights(recipe.title, recipe.description),
+        )
+    ]
+    RecipeSearchTerm.objects.bulk_create(entries, batch_size=batch_size)
+
+
+def rebuild_index(queryset=None, batch_size=1000):
+    """rebuild the index for the given recipes, all of them by default"""
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    RecipeSearchTerm.objects.filter(recipe__in=queryset).delete()
+    batch = []
+    for recipe in queryset.only(
+        'id', 'user_id', 'title', 'description',
+    ).iterator(chunk_size=batch_size):
+        batch.append(recipe)
+        if len(batch) == batch_size:
+            index_recipes(batch, batch_size)
+            batch = []
+    index_recipes(batch, batch_size)
+
+
+def _use_mysql_fulltext():
+    """return True if MySQL FULLTEXT should serve searches"""
+    return (
+        getattr(settings, 'RECIPE_SEARCH_BACKEND', 'index') == 'mysql'
+        and connections[router.db_for_read(Recipe)].vendor == 'mysql'
+    )
+
+
+def search(queryset, user, query):
+    """filter queryset to recipes matching query, annotated with search_rank
+
+    The portable backend looks the query terms up in RecipeSearchTerm
+    through its (user, term) index and sums the weights of the matching
+    postings, so the work depends on the matches rather than on the size
+    of the user's collection.
+    """
+    if _use_mysql_fulltext():
+        rank = RawSQL(
+            'MATCH (core_recipe.title, core_recipe.description) '
+            'AGAINST (%s IN NATURAL LANGUAGE MODE)',
+            [query],
+            output_field=FloatField(),
+        )
+        return queryset.annotate(search_rank=rank).filter(search_rank__gt=0)
+
+    terms = set(tokenize(query))
+    if not terms:
+        return queryset.none()
+    scores = RecipeSearchTerm.objects.filter(
+        user=user, term__in=terms, recipe_id=OuterRef('pk'),
+    ).values('recipe_id').annotate(score=Sum('weight')).values('score')
+    matches = RecipeSearchTerm.objects.filter(
+        user=user, term__in=terms,
+    ).values('recipe_id')
+    return queryset.filter(id__in=matches).annotate(
+        search_rank=Subquery(scores, output_field=FloatField()),
+    )
@@ -4,23 +4,74 @@ from core.models import(
     Tag,
     Ingredient,
 )
+from recipe import bulk
+
+class SparseFieldsMixin:
+    """drop every field not named in the fields= argument"""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class UniqueNameMixin:
+    """reject renaming to a name another object of the user has
+
+    Nested in a recipe the name picks or creates the object, so only
+    updates of the object itself are checked.
+    """
+
+    def validate_name(self, value):
+        instance = self.instance
+        if instance is None:
+            return value
+        others = self.Meta.model.objects.filter(
+            user_id=instance.user_id, name=value,
+        ).exclude(pk=instance.pk)
+        if others.exists():
+            raise serializers.ValidationError(
+                f'You already have a {instance._meta.verbose_name} '
+                f'named {value}.'
+            )
+        return value
+
 
-class IngredientSerilizer(serializers.ModelSerializer):
+class IngredientSerilizer(
+    UniqueNameMixin, SparseFieldsMixin, serializers.ModelSerializer,
+):
     """serializer for ingredient"""
     class Meta:
         model = Ingredient
         fields = ['id','name']
         read_only_fields = ['id']
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(
+    UniqueNameMixin, SparseFieldsMixin, serializers.ModelSerializer,
+):
     """serializer for tag"""
     class Meta:
         model = Tag
         fields = ['id','name']
         read_only_fields = ['id']
 
+class IngredientUsageSerializer(IngredientSerilizer):
+    """serializer for ingredient with the number of recipes using it"""
+    usage = serializers.IntegerField(read_only=True)
+
+    class Meta(IngredientSerilizer.Meta):
+        fields = IngredientSerilizer.Meta.fields + ['usage']
+
+
+class TagUsageSerializer(TagSerializer):
+    """serializer for tag with the number of recipes using it"""
+    usage = serializers.IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ['usage']
 
-class RecipeSerializer(serializers.ModelSerializer):
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """serializer for recipe"""
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerilizer(many=True, required=False)
@@ -30,32 +81,39 @@ class RecipeSerializer(serializers.ModelSerializer):
         fields = ['id','title','time_minute','price','link','tags','ingredients']
         read_only_fields = ['id']
 
-    def _get_or_create_tags(self, tags, recipe):
+    def _get_or_create_tags(self, tags):
         """Handle getting or creating tags as needed."""
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            recipe.tags.add(tag_obj)
-    def _get_or_create_ingredients(self, ingredients, recipe):
+        return bulk.resolve_names(
+            Tag, auth_user, [tag['name'] for tag in tags],
+        ).values()
+
+    def _get_or_create_ingredients(self, ingredients):
         """handle getting or creating ingredients as needed"""
         auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user = auth_user,
-                **ingredient,
-            )
-            recipe.ingredients.add(ingredient_obj)
+        return bulk.resolve_names(
+            Ingredient, auth_user,
+            [ingredient['name'] for ingredient in ingredients],
+        ).values()
+
+    def _apply_delta(self, manager, objs):
+        """add and remove only the relations that changed"""
+        wanted = {obj.id: obj for obj in objs}
+        current = set(manager.values_list('id', flat=True))
+        removed = current - wanted.keys()
+        added = [obj for obj_id, obj in wanted.items() if obj_id not in current]
+        if removed:
+            manager.remove(*removed)
+        if added:
+            manager.add(*added)
 
     def create(self, validated_data):
         """Create a recipe."""
         tags = validated_data.pop('tags', [])
         ingredients = validated_data.pop('ingredients', [])
         recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tags(tags, recipe)
-        self._get_or_create_ingredients(ingredients, recipe)
+        recipe.tags.add(*self._get_or_create_tags(tags))
+        recipe.ingredients.add(*self._get_or_create_ingredients(ingredients))
 
         return recipe
 
@@ -64,11 +122,12 @@ class RecipeSerializer(serializers.ModelSerializer):
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients',None)
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            self._apply_delta(instance.tags, self._get_or_create_tags(tags))
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_tags(ingredients, instance)
+            self._apply_delta(
+                instance.ingredients,
+                self._get_or_create_ingredients(ingredients),
+            )
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -78,8 +137,29 @@ class RecipeSerializer(serializers.ModelSerializer):
 
 class RecipeDetailSerializer(RecipeSerializer):
     """serializer for recipe detail view"""
+    image_variants = serializers.SerializerMethodField()
+
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description','image']
+        fields = RecipeSerializer.Meta.fields + [
+            'description', 'image', 'image_variants',
+        ]
+
+    def get_image_variants(self, obj):
+        """return the resized copies of the current image that are ready"""
+        if not obj.image:
+            return []
+        request = self.context.get('request')
+        variants = []
+        for variant in obj.image_variants.all():
+            if variant.source != obj.image.name:
+                continue
+            url = variant.image.url
+            variants.append({
+                'size': variant.size,
+                'format': variant.format,
+                'url': request.build_absolute_uri(url) if request else url,
+            })
+        return variants
 
 
 class RecipeImageSerializer(serializers.ModelSerializer):
@@ -0,0 +1,60 @@
+"""
+signal handlers keeping the recipe response cache fresh
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe.cache import bump_data_version
+from recipe.search import index_recipe
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def bump_on_change(sender, instance, **kwargs):
+    """bump the owner's data version when one of their rows changes"""
+    bump_data_version(instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def index_saved_recipe(sender, instance, update_fields, **kwargs):
+    """keep the search index of a recipe in step with its text"""
+    if update_fields is None or {'title', 'description'} & set(update_fields):
+        index_recipe(instance)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_on_relation_change(sender, instance, action, reverse, **kwargs):
+    """touch the affected recipes and bump the owner's data version"""
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        recipes = Recipe.objects.filter(pk=instance.pk)
+    elif action == 'post_clear':
+        recipes = Recipe.objects.filter(user_id=instance.user_id)
+    else:
+        recipes = Recipe.objects.filter(pk__in=kwargs['pk_set'] or ())
+    recipes.update(updated_at=timezone.now())
+    bump_data_version(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+def bump_on_user_created(sender, instance, created, **kwargs):
+    """start new users on a fresh version in case the id was reused"""
+    if created:
+        bump_data_version(instance.id)
@@ -0,0 +1,168 @@
+"""
+aggregate statistics for recipe api
+"""
+from django.db.models import (
+    Avg,
+    Case,
+    Count,
+    IntegerField,
+    Max,
+    Min,
+    Sum,
+    When,
+)
+
+from core.models import Recipe
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - numpy is optional
+    numpy = None
+
+PERCENTILES = (25, 50, 75, 90, 99)
+TIME_BUCKETS = (15, 30, 45, 60, 90, 120)
+CHUNK_SIZE = 2000
+
+
+def _round(value):
+    """return value as a float rounded for display, keeping None"""
+    return None if value is None else round(float(value), 2)
+
+
+def _percentiles(values):
+    """return {pNN: value} using linear interpolation between ranks"""
+    if not len(values):
+        return {f'p{p}': None for p in PERCENTILES}
+    if numpy is not None:
+        points = numpy.percentile(values, PERCENTILES)
+    else:
+        ordered = sorted(values)
+        last = len(ordered) - 1
+        points = []
+        for p in PERCENTILES:
+            rank = last * p / 100
+            low = int(rank)
+            high = min(low + 1, last)
+            points.append(
+                ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+            )
+    return {f'p{p}': _round(v) for p, v in zip(PERCENTILES, points)}
+
+
+def _bucket_bounds():
+    """return (min, max) pairs for the cooking time histogram"""
+    lows = (0,) + TIME_BUCKETS
+    highs = TIME_BUCKETS + (None,)
+    return list(zip(lows, highs))
+
+
+def _bucket_expression(field):
+    """return a CASE expression numbering the time bucket of field"""
+    return Case(
+        *[
+            When(**{f'{field}__lt': high}, then=index)
+            for index, high in enumerate(TIME_BUCKETS)
+        ],
+        default=len(TIME_BUCKETS),
+        output_field=IntegerField(),
+    )
+
+
+def _stream_values(queryset):
+    """read price and time columns into two arrays, chunk by chunk"""
+    rows = queryset.values_list('price', 'time_minute').iterator(
+        chunk_size=CHUNK_SIZE,
+    )
+    if numpy is None:
+        prices, times = [], []
+        for price, time_minute in rows:
+            prices.append(float(price))
+            times.append(time_minute)
+        return prices, times
+    prices = numpy.fromiter(
+        (value for row in rows for value in (float(row[0]), row[1])),
+        dtype=float,
+    ).reshape(-1, 2)
+    return prices[:, 0], prices[:, 1]
+
+
+def _time_histogram(times):
+    """count cooking times per bucket"""
+    counts = [0] * (len(TIME_BUCKETS) + 1)
+    if numpy is not None and len(times):
+        indexes = numpy.searchsorted(TIME_BUCKETS, times, side='right')
+        for index, count in zip(*numpy.unique(indexes, return_counts=True)):
+            counts[int(index)] = int(count)
+    else:
+        for time_minute in times:
+            counts[sum(time_minute >= b for b in TIME_BUCKETS)] += 1
+    return [
+        {'min': low, 'max': high, 'count': count}
+        for (low, high), count in zip(_bucket_bounds(), counts)
+    ]
+
+
+def _tag_stats(queryset):
+    """return spend and time histogram per tag with grouped queries"""
+    links = Recipe.tags.through.objects.filter(
+        recipe__in=queryset.order_by().values('id'),
+    )
+    tags = {}
+    for row in links.values('tag_id', 'tag__name').annotate(
+        count=Count('recipe_id'),
+        spend=Sum('recipe__price'),
+        mean_price=Avg('recipe__price'),
+    ).order_by('tag__name'):
+        tags[row['tag_id']] = {
+            'id': row['tag_id'],
+            'name': row['tag__name'],
+            'count': row['count'],
+            'spend': _round(row['spend']),
+            'mean_price': _round(row['mean_price']),
+            'time_histogram': [0] * (len(TIME_BUCKETS) + 1),
+        }
+    for row in links.values('tag_id').annotate(
+        bucket=_bucket_expression('recipe__time_minute'),
+    ).values('tag_id', 'bucket').annotate(count=Count('id')).order_by():
+        tags[row['tag_id']]['time_histogram'][row['bucket']] = row['count']
+    return list(tags.values())
+
+
+def recipe_stats(queryset):
+    """return summary statistics for the recipes in queryset
+
+    Counts, min, max and means come from one aggregate query and the per
+    tag figures from two grouped queries. Percentiles and the overall
+    histogram are computed from streamed value arrays.
+    """
+    queryset = queryset.order_by()
+    totals = queryset.aggregate(
+        count=Count('id'),
+        price_min=Min('price'),
+        price_max=Max('price'),
+        price_mean=Avg('price'),
+        time_min=Min('time_minute'),
+        time_max=Max('time_minute'),
+        time_mean=Avg('time_minute'),
+    )
+    prices, times = _stream_values(queryset)
+    return {
+        'count': totals['count'],
+        'price': {
+            'min': _round(totals['price_min']),
+            'max': _round(totals['price_max']),
+            'mean': _round(totals['price_mean']),
+            'percentiles': _percentiles(prices),
+        },
+        'time_minute': {
+            'min': totals['time_min'],
+            'max': totals['time_max'],
+            'mean': _round(totals['time_mean']),
+            'percentiles': _percentiles(times),
+            'histogram': _time_histogram(times),
+        },
+        'tag_buckets': [
+            {'min': low, 'max': high} for low, high in _bucket_bounds()
+        ],
+        'tags': _tag_stats(queryset),
+    }
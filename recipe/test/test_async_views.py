@@ -0,0 +1,192 @@
+"""
+test the native async read path of the recipe and user apis
+"""
+import asyncio
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import (
+    resolve,
+    reverse,
+)
+
+from rest_framework.authtoken.models import Token
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe.serializers import (
+    IngredientSerilizer,
+    RecipeDetailSerializer,
+    RecipeSerializer,
+    TagSerializer,
+)
+from recipe.test.utils import build_urls
+from user.serializers import UserSerializer
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+ME_URL = reverse('user:me')
+
+
+def detail_url(recipe_id):
+    """create and return a recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **params):
+    """create and return a sample recipe"""
+    defaults = {
+        'title': 'sample recipe',
+        'time_minute': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class AsyncViewsTestCase(TestCase):
+    """serve the urls as app.asgi does, with ASYNC_VIEWS on"""
+    async_views = True
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        build_urls(cls.async_views)
+        cls.addClassCleanup(build_urls, settings.ASYNC_VIEWS)
+
+
+class AsyncRoutingTests(AsyncViewsTestCase):
+    """test which urls resolve to async views"""
+
+    def test_read_views_are_async(self):
+        """test hot read endpoints resolve to coroutine functions"""
+        for url in (RECIPE_URL, detail_url(1), TAGS_URL, INGREDIENTS_URL,
+                    ME_URL):
+            with self.subTest(url=url):
+                func = resolve(url).func
+                self.assertTrue(asyncio.iscoroutinefunction(func))
+
+    def test_other_views_stay_sync(self):
+        """test endpoints without async actions keep the sync view"""
+        url = reverse('recipe:recipe-upload-image', args=[1])
+        func = resolve(url).func
+        self.assertFalse(asyncio.iscoroutinefunction(func))
+
+
+class SyncRoutingTests(AsyncViewsTestCase):
+    """test every url keeps its sync view without ASYNC_VIEWS"""
+    async_views = False
+
+    def test_read_views_are_sync(self):
+        """test no event loop is needed per request under WSGI"""
+        for url in (RECIPE_URL, detail_url(1), TAGS_URL, INGREDIENTS_URL,
+                    ME_URL):
+            with self.subTest(url=url):
+                func = resolve(url).func
+                self.assertFalse(asyncio.iscoroutinefunction(func))
+
+
+class AsyncReadTests(AsyncViewsTestCase):
+    """test responses served by the async path"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.token = Token.objects.create(user=self.user)
+        self.auth = {'AUTHORIZATION': f'Token {self.token.key}'}
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='salt')
+        self.recipe = create_recipe(self.user)
+        self.recipe.tags.add(tag)
+        self.recipe.ingredients.add(ingredient)
+        create_recipe(self.user, title='other recipe')
+        recipes = Recipe.objects.order_by('-id').prefetch_related(
+            'tags', 'ingredients',
+        )
+        self.expected = {
+            RECIPE_URL: RecipeSerializer(recipes, many=True).data,
+            detail_url(self.recipe.id): RecipeDetailSerializer(
+                self.recipe,
+            ).data,
+            TAGS_URL: TagSerializer(Tag.objects.all(), many=True).data,
+            INGREDIENTS_URL: IngredientSerilizer(
+                Ingredient.objects.all(), many=True,
+            ).data,
+            ME_URL: UserSerializer(self.user).data,
+        }
+
+    async def _get(self, url, **extra):
+        return await self.async_client.get(url, **self.auth, **extra)
+
+    async def test_reads_match_serializers(self):
+        """test async reads return what the serializers produce"""
+        for url, data in self.expected.items():
+            with self.subTest(url=url):
+                res = await self._get(url)
+                self.assertEqual(res.status_code, 200)
+                body = res.json()
+                if url == RECIPE_URL:
+                    body = body['results']
+                self.assertEqual(body, json.loads(json.dumps(data)))
+
+    async def test_not_modified(self):
+        """test a matching If-None-Match is answered with 304"""
+        for url in (RECIPE_URL, detail_url(self.recipe.id), TAGS_URL):
+            with self.subTest(url=url):
+                res = await self._get(url)
+                res = await self._get(url, IF_NONE_MATCH=res['ETag'])
+                self.assertEqual(res.status_code, 304)
+
+    async def test_token_required(self):
+        """test the async path rejects missing and unknown tokens"""
+        res = await self.async_client.get(RECIPE_URL)
+        self.assertEqual(res.status_code, 401)
+        res = await self.async_client.get(
+            ME_URL, AUTHORIZATION='Token unknown',
+        )
+        self.assertEqual(res.status_code, 401)
+
+    async def test_other_users_recipe_not_found(self):
+        """test retrieving another user's recipe gives 404"""
+        other = await get_user_model().objects.acreate(email='o@example.com')
+        recipe = await Recipe.objects.acreate(
+            user=other, title='theirs', time_minute=1, price=Decimal('1'),
+        )
+        res = await self._get(detail_url(recipe.id))
+        self.assertEqual(res.status_code, 404)
+
+    async def test_writes_use_sync_view(self):
+        """test writes on async urls still run the sync view"""
+        payload = {
+            'title': 'new', 'time_minute': 5, 'price': '2.50',
+            'link': 'https://example.com/new.pdf',
+        }
+        res = await self.async_client.post(
+            RECIPE_URL, payload, content_type='application/json', **self.auth,
+        )
+        self.assertEqual(res.status_code, 201)
+        res = await self.async_client.patch(
+            ME_URL, {'name': 'renamed'},
+            content_type='application/json', **self.auth,
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['name'], 'renamed')
+
+    async def test_browsable_api_falls_back(self):
+        """test html requests are rendered by the sync view"""
+        res = await self._get(RECIPE_URL, ACCEPT='text/html')
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('text/html', res['Content-Type'])
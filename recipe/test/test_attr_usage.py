@@ -0,0 +1,123 @@
+"""
+test assigned_only and usage counts of tag and ingredient api
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENT_URL = reverse('recipe:ingredient-list')
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, title='sample recipe'):
+    """create and return a sample recipe"""
+    return Recipe.objects.create(
+        user=user,
+        title=title,
+        time_minute=10,
+        price=Decimal('5.00'),
+        link='https://example.com/recipe.pdf',
+    )
+
+
+class AttrUsageTests(TestCase):
+    """test filtering and counting tag and ingredient usage"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        self.dinner = Tag.objects.create(user=self.user, name='dinner')
+        self.lunch = Tag.objects.create(user=self.user, name='lunch')
+        self.unused = Tag.objects.create(user=self.user, name='unused')
+        for i in range(3):
+            create_recipe(self.user, f'r{i}').tags.add(self.dinner)
+        create_recipe(self.user).tags.add(self.lunch, self.dinner)
+
+    def _get(self, url, params):
+        """get url and return the data"""
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_assigned_only_returns_each_tag_once(self):
+        """test assigned_only lists used tags without duplicates"""
+        data = self._get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual([t['name'] for t in data], ['lunch', 'dinner'])
+
+    def test_assigned_only_uses_exists(self):
+        """test assigned_only is a semi-join without DISTINCT"""
+        with CaptureQueriesContext(connection) as ctx:
+            self._get(TAGS_URL, {'assigned_only': 1})
+
+        sql = ctx.captured_queries[-1]['sql'].upper()
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+    def test_with_counts(self):
+        """test usage counts are annotated in the same query"""
+        with CaptureQueriesContext(connection) as ctx:
+            data = self._get(TAGS_URL, {'with_counts': 1})
+
+        usage = {t['name']: t['usage'] for t in data}
+        self.assertEqual(usage, {'dinner': 4, 'lunch': 1, 'unused': 0})
+        self.assertEqual(
+            sum('core_tag' in q['sql'] for q in ctx.captured_queries), 2,
+        )
+
+    def test_order_by_usage(self):
+        """test ordering=-usage sorts the most used first"""
+        data = self._get(TAGS_URL, {'with_counts': 1, 'ordering': '-usage'})
+
+        self.assertEqual(
+            [t['name'] for t in data], ['dinner', 'lunch', 'unused'],
+        )
+
+    def test_ingredient_counts(self):
+        """test ingredients support usage counts too"""
+        salt = Ingredient.objects.create(user=self.user, name='salt')
+        create_recipe(self.user).ingredients.add(salt)
+
+        data = self._get(INGREDIENT_URL, {'with_counts': 1})
+
+        self.assertEqual(data, [{'id': salt.id, 'name': 'salt', 'usage': 1}])
+
+    def test_counts_cached_and_refreshed(self):
+        """test counts are cached until a recipe link changes"""
+        self._get(TAGS_URL, {'with_counts': 1})
+        with CaptureQueriesContext(connection) as ctx:
+            self._get(TAGS_URL, {'with_counts': 1})
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        create_recipe(self.user).tags.add(self.unused)
+        data = self._get(TAGS_URL, {'with_counts': 1})
+
+        self.assertEqual(
+            {t['name']: t['usage'] for t in data}['unused'], 1,
+        )
+
+    def test_invalid_params(self):
+        """test bad flags and orderings are rejected"""
+        res = self.client.get(TAGS_URL, {'ordering': 'id'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(TAGS_URL, {'with_counts': 'yes'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,178 @@
+"""
+test content addressed storage of recipe images
+"""
+import hashlib
+import os
+import tempfile
+from decimal import Decimal
+
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    ImageBlob,
+    Recipe,
+    RecipeImageVariant,
+)
+from recipe.test.utils import TempMediaMixin
+
+def image_upload_url(recipe_id):
+    """create and return recipe image url"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    """create and return recipe details url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **params):
+    """create and return a sample recipe"""
+    defaults = {
+        'title': 'sample recipe',
+        'time_minute': 10,
+        'price': Decimal('5.00'),
+        'link': 'https://example.com/recipe.pdf',
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def jpeg_bytes(color):
+    """return the bytes of a small jpeg filled with a color"""
+    with tempfile.TemporaryFile() as image_file:
+        Image.new('RGB', (10, 10), color=color).save(image_file, format='JPEG')
+        image_file.seek(0)
+        return image_file.read()
+
+
+@override_settings(
+    RECIPE_THUMBNAILS={'SIZES': [8], 'FORMATS': ['JPEG'], 'SYNC': True},
+)
+class ContentAddressedImageTests(TempMediaMixin, TestCase):
+    """test identical uploads are stored once"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def _upload(self, recipe, data):
+        """upload image bytes to a recipe"""
+        with tempfile.NamedTemporaryFile(suffix='.JPG') as image_file:
+            image_file.write(data)
+            image_file.seek(0)
+            res = self.client.post(
+                image_upload_url(recipe.id),
+                {'image': image_file},
+                format='multipart',
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        return recipe.image.name
+
+    def test_path_is_content_digest(self):
+        """test the stored name is derived from the uploaded bytes"""
+        data = jpeg_bytes('red')
+        digest = hashlib.sha256(data).hexdigest()
+
+        name = self._upload(create_recipe(self.user), data)
+
+        self.assertEqual(
+            name,
+            os.path.join(
+                'upload', 'recipe', digest[:2], digest[2:4], f'{digest}.jpg',
+            ),
+        )
+
+    def test_identical_uploads_share_one_file(self):
+        """test uploading the same bytes twice stores one counted file"""
+        data = jpeg_bytes('red')
+        first = self._upload(create_recipe(self.user), data)
+        second = self._upload(create_recipe(self.user, title='other'), data)
+
+        self.assertEqual(first, second)
+        self.assertEqual(ImageBlob.objects.get(name=first).refcount, 2)
+        directory = os.path.dirname(os.path.join(settings.MEDIA_ROOT, first))
+        self.assertEqual(os.listdir(directory), [os.path.basename(first)])
+
+    def test_file_deleted_with_last_reference(self):
+        """test the file outlives all but the last referencing recipe"""
+        data = jpeg_bytes('blue')
+        recipe = create_recipe(self.user)
+        other = create_recipe(self.user, title='other')
+        name = self._upload(recipe, data)
+        self._upload(other, data)
+        path = os.path.join(settings.MEDIA_ROOT, name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._upload(recipe, jpeg_bytes('green'))
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(ImageBlob.objects.filter(name=name).exists())
+
+    def test_variant_files_deleted_with_last_recipe(self):
+        """test shared variant files outlive all but the last recipe"""
+        data = jpeg_bytes('red')
+        recipe = create_recipe(self.user)
+        other = create_recipe(self.user, title='other')
+        self._upload(recipe, data)
+        self._upload(other, data)
+        paths = [
+            os.path.join(settings.MEDIA_ROOT, name)
+            for name in RecipeImageVariant.objects.filter(
+                recipe=recipe,
+            ).values_list('image', flat=True)
+        ]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+
+    def test_save_without_image_skips_lookup(self):
+        """test saving other fields does not read the stored image"""
+        recipe = create_recipe(self.user)
+        recipe.time_minute = 20
+
+        with self.assertNumQueries(1):
+            recipe.save(update_fields=['time_minute'])
+
+    def test_shared_image_reuses_variants(self):
+        """test a second upload of the same bytes reuses rendered variants"""
+        data = jpeg_bytes('red')
+        recipe = create_recipe(self.user)
+        other = create_recipe(self.user, title='other')
+        self._upload(recipe, data)
+        self._upload(other, data)
+
+        self.assertEqual(
+            list(RecipeImageVariant.objects.filter(recipe=recipe)
+                 .values_list('image', flat=True)),
+            list(RecipeImageVariant.objects.filter(recipe=other)
+                 .values_list('image', flat=True)),
+        )
+        res = self.client.get(detail_url(other.id))
+        self.assertEqual(len(res.data['image_variants']), 1)
+
@@ -0,0 +1,157 @@
+"""
+test the import_recipes management command
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe.management.commands.import_recipes import Command
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def recipe_row(index, **params):
+    """return a recipe row for the import file"""
+    row = {
+        'title': f'recipe {index}',
+        'time_minute': 10,
+        'price': '4.50',
+        'link': 'https://example.com/recipe.pdf',
+        'tags': [{'name': 'dinner'}],
+        'ingredients': [{'name': f'ingredient {index % 3}'}],
+    }
+    row.update(params)
+    return row
+
+
+class ImportRecipesCommandTests(TestCase):
+    """test importing recipes from files"""
+    def setUp(self):
+        self.user = create_user()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write(self, name, content):
+        """write content to a file in the temp directory and return its path"""
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(content)
+        return path
+
+    def _call(self, *args, **options):
+        """run the command and return stdout and stderr"""
+        out, err = StringIO(), StringIO()
+        call_command('import_recipes', *args, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_jsonl(self):
+        """test recipes are imported in batches and names deduplicated"""
+        Tag.objects.create(user=self.user, name='dinner')
+        path = self._write('recipes.jsonl', '\n'.join(
+            json.dumps(recipe_row(i)) for i in range(10)
+        ))
+
+        out, _ = self._call(path, user=self.user.email, batch_size=4)
+
+        self.assertIn('Imported 10 recipes', out)
+        self.assertIn('recipes/s', out)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 10)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 3)
+
+    def test_import_csv(self):
+        """test a csv file with separated tag names is imported"""
+        path = self._write('recipes.csv', (
+            'title,time_minute,price,link,tags,ingredients\n'
+            'curry,30,5.00,https://example.com,thai|dinner,rice\n'
+        ))
+
+        self._call(path, user=self.user.email)
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(
+            set(recipe.tags.values_list('name', flat=True)), {'thai', 'dinner'},
+        )
+
+    def test_invalid_rows_are_reported(self):
+        """test invalid rows are skipped with their line number"""
+        bad = recipe_row(1)
+        del bad['title']
+        path = self._write('recipes.jsonl', '\n'.join([
+            json.dumps(recipe_row(0)),
+            json.dumps(bad),
+            json.dumps(recipe_row(2, user='missing@example.com')),
+        ]))
+
+        out, err = self._call(path, user=self.user.email)
+
+        self.assertIn('1 recipes', out)
+        self.assertIn('line 2', err)
+        self.assertIn('title', err)
+        self.assertIn('line 3', err)
+
+    def test_malformed_lines_are_reported(self):
+        """test a line that is not a json object skips only itself"""
+        path = self._write('recipes.jsonl', '\n'.join([
+            json.dumps(recipe_row(0)),
+            '{"title": "cut off',
+            '[1, 2]',
+            json.dumps(recipe_row(3)),
+        ]))
+
+        out, err = self._call(path, user=self.user.email)
+
+        self.assertIn('Imported 2 recipes', out)
+        self.assertIn('2 rows skipped', out)
+        self.assertIn('line 2: {"non_field_errors": ["Invalid JSON', err)
+        self.assertIn('line 3: {"non_field_errors": ["Expected', err)
+
+    def test_partition_reports_malformed_lines(self):
+        """test splitting the input for workers keeps the line errors"""
+        path = self._write('recipes.jsonl', '\n'.join([
+            json.dumps(recipe_row(0)),
+            'not json',
+        ]))
+
+        paths, errors = Command()._partition(
+            path, 'jsonl', 2, {'user': self.user.email, 'list_sep': '|'},
+        )
+        self.addCleanup(os.rmdir, os.path.dirname(paths[0]))
+        for partition in paths:
+            self.addCleanup(os.remove, partition)
+
+        self.assertEqual([number for number, _ in errors], [2])
+
+    def test_rows_for_several_users(self):
+        """test the user column assigns rows to their owner"""
+        other = create_user(email='other@example.com')
+        path = self._write('recipes.jsonl', '\n'.join([
+            json.dumps(recipe_row(0)),
+            json.dumps(recipe_row(1, user=other.email)),
+        ]))
+
+        self._call(path, user=self.user.email)
+
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Recipe.objects.filter(user=other).count(), 1)
+
+    def test_missing_file(self):
+        """test a missing file raises a command error"""
+        with self.assertRaises(CommandError):
+            self._call('/does/not/exist.jsonl')
@@ -0,0 +1,86 @@
+"""
+test the viewset querysets are served by indexes
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from recipe.views import (
+    RecipeViewSet,
+    TagViewSet,
+    IngredientViewSet,
+)
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class QueryIndexTests(TestCase):
+    """capture EXPLAIN for each list queryset and check its plan"""
+    def setUp(self):
+        self.user = create_user()
+        self.factory = APIRequestFactory()
+
+    def _queryset(self, viewset, params=None):
+        """return the list queryset a viewset builds for params"""
+        request = Request(self.factory.get('/', params or {}))
+        request.user = self.user
+        view = viewset()
+        view.action = 'list'
+        view.request = request
+        view.kwargs = {}
+        view.format_kwarg = None
+        return view.get_queryset()[:50]
+
+    def assertUsesIndex(self, queryset, ordered=True):
+        """assert every table is read through an index, without sorting"""
+        if connection.vendor == 'sqlite':
+            plan = queryset.explain()
+            reads = [
+                line for line in plan.splitlines()
+                if ' SCAN ' in line or ' SEARCH ' in line
+            ]
+            self.assertTrue(reads, plan)
+            for line in reads:
+                self.assertIn('USING', line, plan)
+            if ordered:
+                self.assertNotIn('TEMP B-TREE FOR ORDER BY', plan)
+        elif connection.vendor == 'mysql':
+            plan = queryset.explain(format='json')
+            self.assertNotIn('"access_type": "ALL"', plan)
+            if ordered:
+                self.assertNotIn('"using_filesort": true', plan)
+        else:
+            self.skipTest(f'no plan check for {connection.vendor}')
+
+    def test_recipe_list(self):
+        """test the recipe list seeks (user_id, id)"""
+        self.assertUsesIndex(self._queryset(RecipeViewSet))
+
+    def test_recipe_list_filtered(self):
+        """test filtered recipe lists keep using the user index"""
+        queryset = self._queryset(
+            RecipeViewSet, {'tags': '1,2', 'ingredients': '3'},
+        )
+        self.assertUsesIndex(queryset)
+
+    def test_recipe_search(self):
+        """test searches read postings through the (user, term) index
+
+        Matches are sorted by rank, so only the index lookups are checked.
+        """
+        queryset = self._queryset(RecipeViewSet, {'q': 'thai curry'})
+        self.assertUsesIndex(queryset, ordered=False)
+
+    def test_tag_list(self):
+        """test the tag list reads (user_id, name) in order"""
+        self.assertUsesIndex(self._queryset(TagViewSet))
+
+    def test_ingredient_list(self):
+        """test the ingredient list reads (user_id, name) in order"""
+        self.assertUsesIndex(self._queryset(IngredientViewSet))
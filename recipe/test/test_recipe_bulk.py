@@ -0,0 +1,138 @@
+"""
+test bulk recipe creation api
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import sharding
+from core.models import (
+    Recipe,
+    RecipeSearchTerm,
+    Tag,
+    Ingredient,
+)
+
+BULK_URL = reverse('recipe:recipe-bulk-create')
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def recipe_payload(index, tags=(), ingredients=()):
+    """return a recipe payload for the bulk endpoint"""
+    return {
+        'title': f'recipe {index}',
+        'time_minute': 10 + index,
+        'price': '4.50',
+        'link': 'https://example.com/recipe.pdf',
+        'tags': [{'name': name} for name in tags],
+        'ingredients': [{'name': name} for name in ingredients],
+    }
+
+
+class BulkRecipeApiTests(TestCase):
+    """test creating many recipes in one request"""
+    def setUp(self):
+        # ids left in memory by other tests would skew the query counts
+        sharding.forget_id_blocks()
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create_recipes(self):
+        """test recipes, tags and ingredients are created and linked"""
+        existing = Tag.objects.create(user=self.user, name='dinner')
+        payload = [
+            recipe_payload(0, tags=['dinner', 'thai'], ingredients=['rice']),
+            recipe_payload(1, tags=['thai'], ingredients=['rice', 'basil']),
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 2)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 2)
+        first = Recipe.objects.get(id=res.data[0]['id'])
+        self.assertIn(existing, first.tags.all())
+        self.assertEqual(
+            sorted(t['name'] for t in res.data[1]['ingredients']),
+            ['basil', 'rice'],
+        )
+
+    def test_bulk_create_query_count_is_constant(self):
+        """test the number of queries does not grow with the payload"""
+        def count_queries(payload):
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(BULK_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            return len(ctx.captured_queries)
+
+        # the first batch also sets up the id blocks
+        count_queries([recipe_payload(0, tags=['z'], ingredients=['z'])])
+        small = count_queries([
+            recipe_payload(i, tags=[f'a{i}'], ingredients=[f'b{i}'])
+            for i in range(2)
+        ])
+        large = count_queries([
+            recipe_payload(i, tags=[f'c{i}', 'x'], ingredients=[f'd{i}', 'y'])
+            for i in range(40)
+        ])
+
+        self.assertEqual(small, large)
+
+    def test_bulk_create_reports_errors_per_item(self):
+        """test an invalid item rejects the batch with per item errors"""
+        bad = recipe_payload(1)
+        del bad['title']
+        payload = [recipe_payload(0), bad]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('title', res.data[1])
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    def test_bulk_create_requires_list(self):
+        """test an empty or non list payload is rejected"""
+        res = self.client.post(BULK_URL, [], format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(BULK_URL, recipe_payload(0), format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_without_returned_rows(self):
+        """test backends that can't return bulk ids still insert in bulk"""
+        def count_queries(payload):
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(BULK_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            return len(ctx.captured_queries), res.data
+
+        with mock.patch.object(
+            type(connection.features), 'can_return_rows_from_bulk_insert',
+            new_callable=mock.PropertyMock, return_value=False,
+        ):
+            small, data = count_queries(
+                [recipe_payload(0, tags=['thai']), recipe_payload(1)],
+            )
+            large, _ = count_queries([recipe_payload(i) for i in range(100)])
+
+        # a few batches at most, never a statement per recipe
+        self.assertLess(large, small + 10)
+        for item in data:
+            terms = RecipeSearchTerm.objects.filter(recipe_id=item['id'])
+            self.assertEqual(
+                list(terms.values_list('term', 'weight')), [('recipe', 3)],
+            )
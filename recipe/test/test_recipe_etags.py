@@ -0,0 +1,141 @@
+"""
+test conditional GET on recipe api
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+)
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def detail_url(recipe_id):
+    """create and return recipe details url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **params):
+    """create and return a sample recipe"""
+    defaults = {
+        'title': 'sample recipe title',
+        'time_minute': 22,
+        'price': Decimal('5.30'),
+        'link': 'https://example.com/recipe.pdf',
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeETagTests(TestCase):
+    """test etags and 304 responses"""
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(self.user)
+
+    def _etag(self, url):
+        """get url and return its etag"""
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['ETag'].startswith('"'))
+        return res['ETag']
+
+    def test_list_not_modified(self):
+        """test a matching If-None-Match on the list returns 304"""
+        etag = self._etag(RECIPE_URL)
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_etag_stable_without_cache(self):
+        """test the etag is derived from row state, not cache contents"""
+        etag = self._etag(RECIPE_URL)
+        cache.clear()
+
+        self.assertEqual(self._etag(RECIPE_URL), etag)
+
+    def test_detail_changes_after_update(self):
+        """test updating a recipe changes its etag"""
+        url = detail_url(self.recipe.id)
+        etag = self._etag(url)
+        self.client.patch(url, {'title': 'new title'})
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(res.data['title'], 'new title')
+
+    def test_detail_changes_when_tag_renamed(self):
+        """test renaming a linked tag changes the recipe etag"""
+        tag = Tag.objects.create(user=self.user, name='dinner')
+        self.recipe.tags.add(tag)
+        url = detail_url(self.recipe.id)
+        etag = self._etag(url)
+        tag.name = 'supper'
+        tag.save()
+        cache.clear()
+
+        self.assertNotEqual(self._etag(url), etag)
+
+    def test_list_changes_when_tag_deleted(self):
+        """test deleting a linked tag changes the list etag"""
+        tag = Tag.objects.create(user=self.user, name='dinner')
+        self.recipe.tags.add(tag)
+        etag = self._etag(RECIPE_URL)
+        tag.delete()
+        cache.clear()
+
+        self.assertNotEqual(self._etag(RECIPE_URL), etag)
+
+    def test_m2m_change_touches_recipe(self):
+        """test linking a tag updates the recipe timestamp"""
+        before = Recipe.objects.get(id=self.recipe.id).updated_at
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='x'))
+
+        after = Recipe.objects.get(id=self.recipe.id).updated_at
+        self.assertGreater(after, before)
+
+    def test_tag_list_etag(self):
+        """test the tag list supports conditional requests"""
+        Tag.objects.create(user=self.user, name='dinner')
+        etag = self._etag(TAGS_URL)
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Tag.objects.create(user=self.user, name='lunch')
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_any_etag_needs_an_existing_recipe(self):
+        """test If-None-Match: * only answers 304 for recipes that exist"""
+        url = detail_url(self.recipe.id)
+        res = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        other = create_recipe(create_user(email='other@example.com'))
+        for recipe_id in (other.id, other.id + 1000):
+            url = detail_url(recipe_id)
+            res = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,106 @@
+"""
+test streaming export of recipe api
+"""
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe import export
+
+EXPORT_URL = reverse('recipe:recipe-export')
+BULK_URL = reverse('recipe:recipe-bulk-create')
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, index):
+    """create and return a recipe with a tag and an ingredient"""
+    recipe = Recipe.objects.create(
+        user=user,
+        title=f'recipe {index}',
+        description=f'description {index}',
+        time_minute=index,
+        price=Decimal('5.50'),
+        link='https://example.com/recipe.pdf',
+    )
+    recipe.tags.add(Tag.objects.create(user=user, name=f'tag {index}'))
+    recipe.ingredients.add(
+        Ingredient.objects.create(user=user, name=f'ingredient {index}')
+    )
+    return recipe
+
+
+class RecipeExportTests(TestCase):
+    """test exporting a user's recipes"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def _export(self):
+        """request the export and return the decoded lines"""
+        res = self.client.get(EXPORT_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        body = b''.join(res.streaming_content).decode()
+        return [json.loads(line) for line in body.splitlines()]
+
+    def test_export_streams_ndjson(self):
+        """test every recipe of the user is exported with relations"""
+        recipes = [create_recipe(self.user, i) for i in range(3)]
+        create_recipe(create_user(email='other@example.com'), 9)
+
+        lines = self._export()
+
+        self.assertEqual([line['id'] for line in lines], [r.id for r in recipes])
+        self.assertEqual(lines[0]['tags'], [{'name': 'tag 0'}])
+        self.assertEqual(lines[0]['ingredients'], [{'name': 'ingredient 0'}])
+        self.assertEqual(lines[0]['price'], '5.50')
+        self.assertEqual(lines[0]['description'], 'description 0')
+
+    def test_queries_per_chunk(self):
+        """test relations are loaded per chunk rather than per recipe"""
+        for i in range(7):
+            create_recipe(self.user, i)
+
+        with CaptureQueriesContext(connection) as ctx:
+            rows = list(export.iter_recipes(self.user, chunk_size=3))
+
+        self.assertEqual(len(rows), 7)
+        # a keyset query and two relation queries per chunk
+        self.assertLessEqual(len(ctx.captured_queries), 3 * 3)
+        self.assertFalse(any(
+            'OFFSET' in query['sql'] for query in ctx.captured_queries
+        ))
+
+    def test_export_can_be_imported(self):
+        """test the exported lines are accepted by the bulk endpoint"""
+        create_recipe(self.user, 0)
+        lines = self._export()
+        other = create_user(email='other@example.com')
+        self.client.force_authenticate(other)
+
+        res = self.client.post(BULK_URL, lines, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        copy = Recipe.objects.get(user=other)
+        self.assertEqual(copy.description, 'description 0')
+        self.assertEqual(
+            list(copy.tags.values_list('name', flat=True)), ['tag 0'],
+        )
@@ -0,0 +1,112 @@
+"""
+test the fast path of the recipe list matches RecipeSerializer
+"""
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe.fastpath import FastListSerializer
+from recipe.serializers import RecipeSerializer
+from recipe.views import RecipeViewSet
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipes(user, count=12):
+    """create recipes with a spread of prices, tags and ingredients"""
+    tags = [Tag.objects.create(user=user, name=f'tag {i}') for i in range(5)]
+    ingredients = [
+        Ingredient.objects.create(user=user, name=f'ingredient {i}')
+        for i in range(5)
+    ]
+    prices = [Decimal('5'), Decimal('5.5'), Decimal('0.99'), Decimal('120.00')]
+    for i in range(count):
+        recipe = Recipe.objects.create(
+            user=user,
+            title=f'pasta {i}' if i % 2 else f'soup "{i}" é',
+            time_minute=i,
+            price=prices[i % len(prices)],
+            description='sample description',
+            link='' if i % 3 else 'https://example.com/recipe.pdf',
+        )
+        recipe.tags.add(*reversed(tags[:i % 4]))
+        recipe.ingredients.add(*ingredients[i % 5:])
+
+
+class FastListEquivalenceTests(TestCase):
+    """test the fast path renders byte identical output"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        create_recipes(self.user)
+
+    def _render(self, data):
+        return JSONRenderer().render(data)
+
+    def test_serializer_equivalence(self):
+        """test FastListSerializer matches RecipeSerializer(many=True)"""
+        queryset = Recipe.objects.filter(user=self.user).order_by('-id')
+        regular = RecipeSerializer(
+            queryset.prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.order_by('id')),
+                Prefetch(
+                    'ingredients', queryset=Ingredient.objects.order_by('id'),
+                ),
+            ),
+            many=True,
+        ).data
+        fast = FastListSerializer(RecipeSerializer)
+        data = fast.render(list(fast.get_queryset(queryset)))
+
+        self.assertEqual(self._render(data), self._render(regular))
+
+    def _compare(self, params, url=RECIPE_URL):
+        """return the list response bodies with and without the fast path"""
+        with mock.patch.object(RecipeViewSet, 'fast_list', False):
+            regular = self.client.get(url, params)
+        cache.clear()
+        fast = self.client.get(url, params)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, regular.content)
+        return fast
+
+    def test_list_equivalence(self):
+        """test the list endpoint body is unchanged by the fast path"""
+        res = self._compare({'page_size': 5})
+
+        self.assertEqual(len(res.data['results']), 5)
+        self.assertIsNotNone(res.data['next'])
+
+    def test_list_equivalence_next_page(self):
+        """test the cursor of the fast path pages like the regular one"""
+        url = self.client.get(RECIPE_URL, {'page_size': 5}).data['next']
+
+        res = self._compare({}, url=url)
+
+        self.assertEqual(len(res.data['results']), 5)
+
+    def test_list_equivalence_with_filters(self):
+        """test filtered, searched and sparse lists are unchanged"""
+        tag = Tag.objects.get(name='tag 1')
+        self._compare({'tags': str(tag.id)})
+        self._compare({'q': 'pasta'})
+        self._compare({'fields': 'id,price,tags'})
@@ -0,0 +1,143 @@
+"""
+test sparse fieldsets of recipe api
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENT_URL = reverse('recipe:ingredient-list')
+
+
+def detail_url(recipe_id):
+    """create and return recipe details url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, index):
+    """create and return a recipe with a tag and an ingredient"""
+    recipe = Recipe.objects.create(
+        user=user,
+        title=f'recipe {index}',
+        time_minute=10,
+        price=Decimal('5.50'),
+        description='sample recipe description',
+        link='https://example.com/recipe.pdf',
+    )
+    recipe.tags.add(Tag.objects.create(user=user, name=f'tag {index}'))
+    recipe.ingredients.add(
+        Ingredient.objects.create(user=user, name=f'ingredient {index}')
+    )
+    return recipe
+
+
+class SparseFieldsetTests(TestCase):
+    """test ?fields= and ?omit= prune responses and queries"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        self.recipes = [create_recipe(self.user, i) for i in range(3)]
+
+    def _get(self, url, params):
+        """request the url and return the response and executed sql"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url, params)
+        return res, [query['sql'] for query in ctx.captured_queries]
+
+    def test_list_fields(self):
+        """test the list renders and prefetches only requested fields"""
+        self.client.get(RECIPE_URL)
+
+        res, queries = self._get(RECIPE_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for item in res.data['results']:
+            self.assertEqual(set(item), {'id', 'title'})
+        self.assertFalse(any('core_recipe_tags' in sql for sql in queries))
+        self.assertFalse(
+            any('core_recipe_ingredients' in sql for sql in queries)
+        )
+        select = next(sql for sql in queries if 'LIMIT' in sql)
+        self.assertNotIn('"link"', select)
+
+    def test_detail_omit(self):
+        """test omitted fields are left out of the detail"""
+        res, queries = self._get(
+            detail_url(self.recipes[0].id), {'omit': 'tags,ingredients'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('tags', res.data)
+        self.assertNotIn('ingredients', res.data)
+        self.assertEqual(res.data['description'], 'sample recipe description')
+        self.assertFalse(any('core_recipe_tags' in sql for sql in queries))
+
+    def test_detail_fields_skip_columns(self):
+        """test unrequested columns are not selected"""
+        res, queries = self._get(
+            detail_url(self.recipes[0].id), {'fields': 'title'},
+        )
+
+        self.assertEqual(res.data, {'title': 'recipe 0'})
+        select = next(sql for sql in queries if 'LIMIT' in sql)
+        self.assertNotIn('"description"', select)
+        self.assertFalse(
+            any('core_recipeimagevariant' in sql for sql in queries)
+        )
+
+    def test_unknown_field_rejected(self):
+        """test asking for a field the endpoint lacks is an error"""
+        res = self.client.get(RECIPE_URL, {'fields': 'title,description'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', res.data)
+
+    def test_tag_fields(self):
+        """test tags can be listed by name only"""
+        res = self.client.get(TAGS_URL, {'fields': 'name'})
+
+        self.assertEqual(
+            res.data, [{'name': f'tag {i}'} for i in (2, 1, 0)],
+        )
+
+    def test_ingredient_omit_usage(self):
+        """test omitting usage skips the count subquery"""
+        res, queries = self._get(
+            INGREDIENT_URL, {'with_counts': 1, 'omit': 'usage'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(res.data[0]), {'id', 'name'})
+        self.assertFalse(any('COUNT(' in sql for sql in queries
+                             if 'ORDER BY' in sql))
+
+    def test_writes_ignore_fieldset(self):
+        """test updates validate and return every field"""
+        res = self.client.patch(
+            detail_url(self.recipes[0].id) + '?fields=title',
+            {'time_minute': 20},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['time_minute'], 20)
+        self.assertIn('tags', res.data)
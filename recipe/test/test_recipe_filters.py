@@ -0,0 +1,113 @@
+"""
+test tag and ingredient filters of recipe api
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, title):
+    """create and return a sample recipe"""
+    return Recipe.objects.create(
+        user=user,
+        title=title,
+        time_minute=10,
+        price=Decimal('5.00'),
+        link='https://example.com/recipe.pdf',
+    )
+
+
+class RecipeFilterTests(TestCase):
+    """test filtering recipes by tags and ingredients"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='vegan')
+        self.quick = Tag.objects.create(user=self.user, name='quick')
+        self.both = create_recipe(self.user, 'both')
+        self.both.tags.add(self.vegan, self.quick)
+        self.vegan_only = create_recipe(self.user, 'vegan only')
+        self.vegan_only.tags.add(self.vegan)
+        self.untagged = create_recipe(self.user, 'untagged')
+
+    def _ids(self, params):
+        """list recipes with params and return the result ids"""
+        res = self.client.get(RECIPE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['id'] for recipe in res.data['results']]
+
+    def test_match_any_returns_each_recipe_once(self):
+        """test a recipe with several requested tags appears once"""
+        ids = self._ids({'tags': f'{self.vegan.id},{self.quick.id}'})
+
+        self.assertEqual(ids, [self.vegan_only.id, self.both.id])
+
+    def test_match_all(self):
+        """test match=all keeps recipes carrying every tag"""
+        ids = self._ids({
+            'tags': f'{self.vegan.id},{self.quick.id}',
+            'match': 'all',
+        })
+
+        self.assertEqual(ids, [self.both.id])
+
+    def test_match_all_ignores_repeated_ids(self):
+        """test a repeated id does not make match=all impossible"""
+        ids = self._ids({
+            'tags': f'{self.vegan.id},{self.vegan.id}',
+            'match': 'all',
+        })
+
+        self.assertEqual(ids, [self.vegan_only.id, self.both.id])
+
+    def test_tags_and_ingredients_combine(self):
+        """test tag and ingredient filters must both hold"""
+        salt = Ingredient.objects.create(user=self.user, name='salt')
+        self.vegan_only.ingredients.add(salt)
+
+        ids = self._ids({
+            'tags': f'{self.vegan.id}',
+            'ingredients': f'{salt.id}',
+        })
+
+        self.assertEqual(ids, [self.vegan_only.id])
+
+    def test_filter_query_has_no_distinct(self):
+        """test the filtered list is a semi-join without DISTINCT"""
+        with CaptureQueriesContext(connection) as ctx:
+            self._ids({'tags': f'{self.vegan.id},{self.quick.id}'})
+
+        recipe_sql = next(
+            q['sql'] for q in ctx.captured_queries if 'LIMIT' in q['sql']
+        )
+        self.assertNotIn('DISTINCT', recipe_sql.upper())
+        self.assertIn('EXISTS', recipe_sql.upper())
+
+    def test_invalid_params(self):
+        """test malformed ids and match values are rejected"""
+        res = self.client.get(RECIPE_URL, {'tags': 'a,b'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(RECIPE_URL, {'tags': '1', 'match': 'some'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
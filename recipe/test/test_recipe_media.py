@@ -0,0 +1,183 @@
+"""
+test protected delivery of recipe images
+"""
+import os
+import tempfile
+from decimal import Decimal
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.storage import IMMUTABLE_CACHE_CONTROL
+from recipe.test.utils import TempMediaMixin
+
+def image_upload_url(recipe_id):
+    """create and return recipe image url"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def media_url(name):
+    """create and return the media url of a stored file"""
+    return reverse('media', args=[name])
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user):
+    """create and return a sample recipe"""
+    return Recipe.objects.create(
+        user=user,
+        title='sample recipe',
+        time_minute=10,
+        price=Decimal('5.00'),
+        link='https://example.com/recipe.pdf',
+    )
+
+
+def read_body(res):
+    """return the body of a regular or streaming response"""
+    return b''.join(res.streaming_content) if res.streaming else res.content
+
+
+@override_settings(
+    RECIPE_THUMBNAILS={'SIZES': [8], 'FORMATS': ['JPEG'], 'SYNC': True},
+)
+class RecipeMediaTests(TempMediaMixin, TestCase):
+    """test the protected media view"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(self.user)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': image_file},
+                format='multipart',
+            )
+        self.recipe.refresh_from_db()
+        self.name = self.recipe.image.name
+        with open(self.recipe.image.path, 'rb') as stored:
+            self.data = stored.read()
+
+    def test_owner_gets_image(self):
+        """test the owner receives the image with cache headers"""
+        res = self.client.get(media_url(self.name))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(read_body(res), self.data)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+
+    def test_variant_served_to_owner(self):
+        """test resized variants are served as well"""
+        variant = self.recipe.image_variants.get()
+
+        res = self.client.get(media_url(variant.image.name))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_other_user_gets_404(self):
+        """test images of other users are not served"""
+        other = create_user(email='other@example.com')
+        self.client.force_authenticate(other)
+
+        res = self.client.get(media_url(self.name))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_auth_required(self):
+        """test anonymous requests are rejected"""
+        res = APIClient().get(media_url(self.name))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_not_modified(self):
+        """test a matching etag answers 304"""
+        etag = self.client.get(media_url(self.name))['ETag']
+
+        res = self.client.get(media_url(self.name), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_range(self):
+        """test a byte range answers 206 with the slice"""
+        res = self.client.get(media_url(self.name), HTTP_RANGE='bytes=2-9')
+
+        self.assertEqual(res.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(read_body(res), self.data[2:10])
+        self.assertEqual(
+            res['Content-Range'], f'bytes 2-9/{len(self.data)}',
+        )
+
+    def test_suffix_range(self):
+        """test a suffix range returns the end of the file"""
+        res = self.client.get(media_url(self.name), HTTP_RANGE='bytes=-4')
+
+        self.assertEqual(res.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(read_body(res), self.data[-4:])
+
+    def test_unsatisfiable_range(self):
+        """test a range past the end answers 416"""
+        res = self.client.get(
+            media_url(self.name),
+            HTTP_RANGE=f'bytes={len(self.data)}-',
+        )
+
+        self.assertEqual(
+            res.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+        )
+
+    def test_stale_if_range_sends_whole_file(self):
+        """test a range with a stale If-Range is ignored"""
+        res = self.client.get(
+            media_url(self.name),
+            HTTP_RANGE='bytes=0-1',
+            HTTP_IF_RANGE='"stale"',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(read_body(res), self.data)
+
+    @override_settings(MEDIA_SENDFILE={'BACKEND': 'nginx'})
+    def test_x_accel_redirect(self):
+        """test nginx delivery leaves the body to the proxy"""
+        res = self.client.get(media_url(self.name))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res['X-Accel-Redirect'], f'/protected-media/{self.name}',
+        )
+        self.assertEqual(res.content, b'')
+
+    @override_settings(MEDIA_SENDFILE={'BACKEND': 'sendfile'})
+    def test_x_sendfile(self):
+        """test sendfile delivery points at the file on disk"""
+        res = self.client.get(media_url(self.name))
+
+        self.assertEqual(res['X-Sendfile'], self.recipe.image.path)
+        self.assertEqual(res.content, b'')
+
+    def test_missing_file_404(self):
+        """test a referenced file missing on disk answers 404"""
+        os.remove(self.recipe.image.path)
+
+        res = self.client.get(media_url(self.name))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,102 @@
+"""
+test cursor pagination of recipe api
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+)
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **params):
+    """create and return a sample recipe"""
+    defaults = {
+        'title': 'sample recipe title',
+        'time_minute': 22,
+        'price': Decimal('5.30'),
+        'link': 'https://example.com/recipe.pdf',
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipePaginationTests(TestCase):
+    """test paging through the recipe list"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def _collect_ids(self, url, params=None):
+        """follow next cursors and return every recipe id seen"""
+        ids = []
+        res = self.client.get(url, params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            ids.extend(recipe['id'] for recipe in res.data['results'])
+            if not res.data['next']:
+                return ids
+            res = self.client.get(res.data['next'])
+
+    def test_pages_follow_id_descending(self):
+        """test cursors walk all recipes newest first without repeats"""
+        recipes = [create_recipe(self.user) for _ in range(7)]
+
+        ids = self._collect_ids(RECIPE_URL, {'page_size': 3})
+
+        self.assertEqual(ids, sorted((r.id for r in recipes), reverse=True))
+
+    def test_previous_cursor(self):
+        """test the previous cursor returns the earlier page"""
+        for _ in range(4):
+            create_recipe(self.user)
+        first = self.client.get(RECIPE_URL, {'page_size': 2})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+
+        self.assertEqual(back.data['results'], first.data['results'])
+
+    def test_cursor_keeps_tag_filter(self):
+        """test the next cursor preserves the tags filter"""
+        tag = Tag.objects.create(user=self.user, name='dinner')
+        tagged = []
+        for i in range(5):
+            recipe = create_recipe(self.user)
+            if i % 2 == 0:
+                recipe.tags.add(tag)
+                tagged.append(recipe.id)
+
+        ids = self._collect_ids(RECIPE_URL, {'tags': tag.id, 'page_size': 1})
+
+        self.assertEqual(ids, sorted(tagged, reverse=True))
+
+    def test_page_query_uses_keyset_not_offset(self):
+        """test deep pages seek by id rather than scanning with OFFSET"""
+        for _ in range(5):
+            create_recipe(self.user)
+        first = self.client.get(RECIPE_URL, {'page_size': 2})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(first.data['next'])
+
+        recipe_sql = next(
+            q['sql'] for q in ctx.captured_queries if 'LIMIT' in q['sql']
+        )
+        self.assertNotIn('OFFSET', recipe_sql.upper())
+        self.assertIn('"core_recipe"."id" <', recipe_sql)
@@ -0,0 +1,107 @@
+"""
+test query plan of recipe api
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    """create and return recipe details url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, index):
+    """create and return a recipe with a tag and an ingredient"""
+    recipe = Recipe.objects.create(
+        user=user,
+        title=f'recipe {index}',
+        time_minute=10,
+        price=Decimal('5.50'),
+        description='sample recipe description',
+        link='https://example.com/recipe.pdf',
+    )
+    recipe.tags.add(Tag.objects.create(user=user, name=f'tag {index}'))
+    recipe.ingredients.add(
+        Ingredient.objects.create(user=user, name=f'ingredient {index}')
+    )
+    return recipe
+
+
+class RecipeQueryPlanTests(TestCase):
+    """test the recipe endpoints run a fixed number of queries"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def _count_queries(self, url):
+        """request the url and return the number of queries executed"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries), res
+
+    def test_list_query_count_independent_of_rows(self):
+        """test listing recipes does not query per recipe"""
+        for i in range(2):
+            create_recipe(self.user, i)
+        small, _ = self._count_queries(RECIPE_URL)
+
+        for i in range(2, 20):
+            create_recipe(self.user, i)
+        large, res = self._count_queries(RECIPE_URL)
+
+        self.assertEqual(small, large)
+        results = res.data['results']
+        self.assertEqual(len(results), 20)
+        self.assertEqual(len(results[0]['tags']), 1)
+        self.assertEqual(len(results[0]['ingredients']), 1)
+
+    def test_list_defers_detail_columns(self):
+        """test the list query does not load description and image"""
+        create_recipe(self.user, 0)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(RECIPE_URL)
+
+        # the etag aggregates run first, find the query loading the rows
+        recipe_sql = next(
+            query['sql'] for query in ctx.captured_queries
+            if '"core_recipe"."title"' in query['sql']
+        )
+        self.assertNotIn('description', recipe_sql)
+        self.assertNotIn('"image"', recipe_sql)
+
+    def test_detail_prefetches_relations(self):
+        """test the detail view loads tags and ingredients in bulk"""
+        small = create_recipe(self.user, 0)
+        large = create_recipe(self.user, 1)
+        for i in range(5):
+            large.tags.add(Tag.objects.create(user=self.user, name=f'x{i}'))
+
+        small_count, _ = self._count_queries(detail_url(small.id))
+        large_count, res = self._count_queries(detail_url(large.id))
+
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(res.data['tags']), 6)
+        self.assertIn('description', res.data)
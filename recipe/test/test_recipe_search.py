@@ -0,0 +1,168 @@
+"""
+test full text search of recipe api
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    RecipeSearchTerm,
+)
+from recipe.search import (
+    term_weights,
+    tokenize,
+)
+
+RECIPE_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk-create')
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, title, description=''):
+    """create and return a sample recipe"""
+    return Recipe.objects.create(
+        user=user,
+        title=title,
+        description=description,
+        time_minute=10,
+        price=Decimal('5.00'),
+        link='https://example.com/recipe.pdf',
+    )
+
+
+class TokenizeTests(TestCase):
+    """test splitting text into search terms"""
+    def test_tokenize(self):
+        """test text is lowercased and stop words dropped"""
+        self.assertEqual(tokenize('The Thai Curry, with RICE!'),
+                         ['thai', 'curry', 'rice'])
+
+    def test_title_weighs_more(self):
+        """test title terms outweigh description terms"""
+        weights = term_weights('Curry', 'rice and curry')
+        self.assertGreater(weights['curry'], weights['rice'])
+
+
+class RecipeSearchTests(TestCase):
+    """test the q parameter of the recipe list"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def _search(self, q, **params):
+        """search and return the ids of the results"""
+        res = self.client.get(RECIPE_URL, {'q': q, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['id'] for recipe in res.data['results']]
+
+    def test_results_ranked_by_relevance(self):
+        """test title matches rank above description matches"""
+        described = create_recipe(self.user, 'Green bowl', 'thai basil')
+        titled = create_recipe(self.user, 'Thai curry')
+        create_recipe(self.user, 'Pancakes', 'sweet')
+
+        self.assertEqual(self._search('thai'), [titled.id, described.id])
+
+    def test_more_terms_rank_higher(self):
+        """test recipes matching more query terms come first"""
+        one = create_recipe(self.user, 'Thai soup')
+        both = create_recipe(self.user, 'Thai curry')
+
+        self.assertEqual(self._search('thai curry'), [both.id, one.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        """test the index is maintained on save and delete"""
+        recipe = create_recipe(self.user, 'Thai curry')
+        recipe.title = 'Pasta'
+        recipe.save()
+
+        self.assertEqual(self._search('thai'), [])
+        self.assertEqual(self._search('pasta'), [recipe.id])
+        recipe.delete()
+        self.assertFalse(RecipeSearchTerm.objects.exists())
+
+    def test_search_limited_to_user(self):
+        """test other users' recipes are never returned"""
+        create_recipe(create_user(email='other@example.com'), 'Thai curry')
+
+        self.assertEqual(self._search('thai'), [])
+
+    def test_search_paginates(self):
+        """test cursors page through ranked results"""
+        ids = [create_recipe(self.user, f'Thai dish {i}').id for i in range(5)]
+        res = self.client.get(RECIPE_URL, {'q': 'thai', 'page_size': 2})
+        seen = [r['id'] for r in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            seen.extend(r['id'] for r in res.data['results'])
+
+        self.assertEqual(sorted(seen), sorted(ids))
+        self.assertEqual(len(seen), 5)
+
+    def test_page_boundary_inside_equal_ranks(self):
+        """test pages split a run of equal ranks by id, without OFFSET"""
+        top = create_recipe(self.user, 'Thai curry', 'thai')
+        tied = [create_recipe(self.user, f'Thai dish {i}') for i in range(5)]
+        expected = [top.id] + sorted((r.id for r in tied), reverse=True)
+
+        pages = []
+        res = self.client.get(RECIPE_URL, {'q': 'thai', 'page_size': 2})
+        while True:
+            pages.append([r['id'] for r in res.data['results']])
+            if not res.data['next']:
+                break
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.get(res.data['next'])
+            self.assertFalse(any(
+                'OFFSET' in query['sql'] for query in ctx.captured_queries
+            ))
+
+        self.assertEqual(sum(pages, []), expected)
+        back = self.client.get(res.data['previous'])
+        self.assertEqual([r['id'] for r in back.data['results']], pages[-2])
+
+    def test_bulk_created_recipes_are_indexed(self):
+        """test recipes from the bulk endpoint are searchable"""
+        payload = [{
+            'title': 'Mango lassi',
+            'time_minute': 5,
+            'price': '2.00',
+            'link': 'https://example.com',
+        }]
+        self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(len(self._search('lassi')), 1)
+
+    def test_query_uses_term_index(self):
+        """test the search reads postings instead of recipe text"""
+        create_recipe(self.user, 'Thai curry')
+        with CaptureQueriesContext(connection) as ctx:
+            self._search('curry')
+
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertIn('core_recipesearchterm', sql)
+        self.assertNotIn('LIKE', sql.upper())
+
+    def test_rebuild_command(self):
+        """test the rebuild command restores missing entries"""
+        recipe = create_recipe(self.user, 'Thai curry')
+        RecipeSearchTerm.objects.all().delete()
+
+        call_command('rebuild_search_index', stdout=StringIO())
+
+        self.assertEqual(self._search('curry'), [recipe.id])
@@ -0,0 +1,121 @@
+"""
+test recipe statistics api
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+)
+from recipe import stats
+
+STATS_URL = reverse('recipe:recipe-stats')
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, price, time_minute):
+    """create and return a sample recipe"""
+    return Recipe.objects.create(
+        user=user,
+        title='sample recipe',
+        time_minute=time_minute,
+        price=Decimal(price),
+        link='https://example.com/recipe.pdf',
+    )
+
+
+class RecipeStatsTests(TestCase):
+    """test the recipe stats endpoint"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        self.quick = Tag.objects.create(user=self.user, name='quick')
+        for price, minutes in (('2.00', 10), ('4.00', 20), ('6.00', 50),
+                               ('8.00', 130)):
+            recipe = create_recipe(self.user, price, minutes)
+            if minutes < 30:
+                recipe.tags.add(self.quick)
+        create_recipe(create_user(email='other@example.com'), '99.00', 5)
+
+    def _stats(self, params=None):
+        """get the stats and return the data"""
+        res = self.client.get(STATS_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_summary(self):
+        """test counts, extremes, means and percentiles"""
+        data = self._stats()
+
+        self.assertEqual(data['count'], 4)
+        self.assertEqual(data['price']['min'], 2.0)
+        self.assertEqual(data['price']['max'], 8.0)
+        self.assertEqual(data['price']['mean'], 5.0)
+        self.assertEqual(data['price']['percentiles']['p50'], 5.0)
+        self.assertEqual(data['time_minute']['percentiles']['p25'], 17.5)
+
+    def test_histograms(self):
+        """test the overall and per tag cooking time histograms"""
+        data = self._stats()
+
+        counts = [b['count'] for b in data['time_minute']['histogram']]
+        self.assertEqual(counts, [1, 1, 0, 1, 0, 0, 1])
+        tag = data['tags'][0]
+        self.assertEqual(tag['name'], 'quick')
+        self.assertEqual(tag['count'], 2)
+        self.assertEqual(tag['spend'], 6.0)
+        self.assertEqual(tag['time_histogram'], [1, 1, 0, 0, 0, 0, 0])
+
+    def test_filters_apply(self):
+        """test the tags filter narrows the statistics"""
+        data = self._stats({'tags': self.quick.id})
+
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['price']['max'], 4.0)
+
+    def test_cached_per_data_version(self):
+        """test stats are cached until the user's data changes"""
+        self._stats()
+        with CaptureQueriesContext(connection) as ctx:
+            self._stats()
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        create_recipe(self.user, '10.00', 5)
+        self.assertEqual(self._stats()['count'], 5)
+
+    def test_empty(self):
+        """test stats of a user without recipes"""
+        self.client.force_authenticate(create_user(email='new@example.com'))
+
+        data = self._stats()
+
+        self.assertEqual(data['count'], 0)
+        self.assertIsNone(data['price']['percentiles']['p50'])
+
+    def test_percentiles_without_numpy(self):
+        """test the pure python fallback matches numpy"""
+        values = [1.0, 7.0, 3.0, 10.0, 4.5]
+        expected = stats._percentiles(values)
+        numpy, stats.numpy = stats.numpy, None
+        try:
+            self.assertEqual(stats._percentiles(values), expected)
+            self.assertEqual(
+                [b['count'] for b in stats._time_histogram([5, 15, 200])],
+                [1, 1, 0, 0, 0, 0, 1],
+            )
+        finally:
+            stats.numpy = numpy
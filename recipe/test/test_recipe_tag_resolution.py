@@ -0,0 +1,130 @@
+"""
+test tag and ingredient resolution in recipe serializer
+"""
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import (
+    connection,
+    IntegrityError,
+)
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import sharding
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe import bulk
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def recipe_payload(tags, ingredients):
+    """return a recipe payload with the given tag and ingredient names"""
+    return {
+        'title': 'sample recipe',
+        'time_minute': 20,
+        'price': Decimal('3.20'),
+        'link': 'https://example.com/recipe.pdf',
+        'tags': [{'name': name} for name in tags],
+        'ingredients': [{'name': name} for name in ingredients],
+    }
+
+
+class TagResolutionTests(TestCase):
+    """test resolving tags and ingredients by name in bulk"""
+    def setUp(self):
+        # ids left in memory by other tests would skew the query counts
+        sharding.forget_id_blocks()
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def _create(self, payload):
+        """post the payload and return the number of queries executed"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(RECIPE_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return len(ctx.captured_queries)
+
+    def test_create_query_count_is_fixed(self):
+        """test many tags and ingredients cost no more queries than one"""
+        # the first recipe also sets up the id blocks
+        self._create(recipe_payload(['z'], ['z']))
+        few = self._create(recipe_payload(['t0'], ['i0']))
+        many = self._create(recipe_payload(
+            [f'tag {i}' for i in range(20)],
+            [f'ingredient {i}' for i in range(30)],
+        ))
+
+        self.assertEqual(few, many)
+        recipe = Recipe.objects.filter(user=self.user).latest('id')
+        self.assertEqual(recipe.tags.count(), 20)
+        self.assertEqual(recipe.ingredients.count(), 30)
+
+    def test_existing_names_are_reused(self):
+        """test names the user already has are not created again"""
+        tag = Tag.objects.create(user=self.user, name='Indian')
+        ingredient = Ingredient.objects.create(user=self.user, name='salt')
+
+        self._create(recipe_payload(['Indian', 'Lunch'], ['salt', 'salt']))
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertIn(tag, recipe.tags.all())
+        self.assertEqual(list(recipe.ingredients.all()), [ingredient])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_other_users_names_are_not_shared(self):
+        """test a tag with the same name for another user is not used"""
+        other = create_user(email='other@example.com')
+        other_tag = Tag.objects.create(user=other, name='Indian')
+
+        self._create(recipe_payload(['Indian'], []))
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertNotIn(other_tag, recipe.tags.all())
+
+    def test_name_unique_per_user(self):
+        """test the database rejects duplicate names for one user"""
+        Tag.objects.create(user=self.user, name='Dinner')
+        with self.assertRaises(IntegrityError):
+            Tag.objects.create(user=self.user, name='Dinner')
+
+    def test_rename_to_existing_name_rejected(self):
+        """test renaming onto another tag or ingredient name returns 400"""
+        for model, basename in ((Tag, 'tag'), (Ingredient, 'ingredient')):
+            model.objects.create(user=self.user, name='Dinner')
+            obj = model.objects.create(user=self.user, name='Lunch')
+            url = reverse(f'recipe:{basename}-detail', args=[obj.id])
+
+            res = self.client.patch(url, {'name': 'Dinner'}, format='json')
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('name', res.data)
+
+            res = self.client.patch(url, {'name': 'Lunch'}, format='json')
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_names_keyed_by_collation(self):
+        """test names a case insensitive database equates resolve to one"""
+        tag = Tag.objects.create(user=self.user, name='Crème')
+
+        with mock.patch.object(connection, 'vendor', 'mysql'):
+            found = bulk.resolve_names(
+                Tag, self.user, ['Crème', 'creme', 'CRÈME'],
+            )
+
+        self.assertEqual(found, {'creme': tag})
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
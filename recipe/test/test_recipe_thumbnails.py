@@ -0,0 +1,155 @@
+"""
+test background image variants of recipe api
+"""
+import os
+import tempfile
+import time
+from decimal import Decimal
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.test import (
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    RecipeImageVariant,
+)
+from recipe.test.utils import TempMediaMixin
+
+THUMBNAILS = {'SIZES': [16, 64], 'FORMATS': ['JPEG', 'WEBP'], 'WORKERS': 1}
+
+
+def image_upload_url(recipe_id):
+    """create and return recipe image url"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    """create and return recipe details url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user):
+    """create and return a sample recipe"""
+    return Recipe.objects.create(
+        user=user,
+        title='sample recipe',
+        time_minute=10,
+        price=Decimal('5.00'),
+        link='https://example.com/recipe.pdf',
+    )
+
+
+def rotated_jpeg():
+    """return a 100x50 jpeg tagged to be displayed rotated by 90 degrees"""
+    image_file = tempfile.NamedTemporaryFile(suffix='.jpg')
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    Image.new('RGB', (100, 50)).save(image_file, format='JPEG', exif=exif)
+    image_file.seek(0)
+    return image_file
+
+
+@override_settings(RECIPE_THUMBNAILS={**THUMBNAILS, 'SYNC': True})
+class ThumbnailTests(TempMediaMixin, TestCase):
+    """test variants generated for uploaded images"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(self.user)
+
+    def _upload(self):
+        """upload a rotated image to the recipe"""
+        with rotated_jpeg() as image_file:
+            res = self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': image_file},
+                format='multipart',
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+
+    def test_variants_created(self):
+        """test every configured size and format is rendered"""
+        self._upload()
+
+        variants = RecipeImageVariant.objects.filter(recipe=self.recipe)
+        self.assertEqual(
+            sorted((v.size, v.format) for v in variants),
+            [(16, 'JPEG'), (16, 'WEBP'), (64, 'JPEG'), (64, 'WEBP')],
+        )
+        for variant in variants:
+            self.assertTrue(os.path.exists(variant.image.path))
+
+    def test_orientation_applied_and_exif_stripped(self):
+        """test variants are upright and carry no exif data"""
+        self._upload()
+
+        variant = RecipeImageVariant.objects.get(
+            recipe=self.recipe, size=64, format='JPEG',
+        )
+        with Image.open(variant.image.path) as image:
+            self.assertEqual(image.size, (32, 64))
+            self.assertNotIn(0x0112, image.getexif())
+
+    def test_detail_lists_variant_urls(self):
+        """test the detail serializer exposes ready variants"""
+        self._upload()
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        variants = res.data['image_variants']
+        self.assertEqual(len(variants), 4)
+        self.assertTrue(variants[0]['url'].startswith('http://testserver/'))
+
+    def test_replaced_image_hides_old_variants(self):
+        """test variants of a previous image are not exposed"""
+        self._upload()
+        RecipeImageVariant.objects.update(source='old.jpg')
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.data['image_variants'], [])
+
+
+@override_settings(RECIPE_THUMBNAILS=THUMBNAILS)
+class BackgroundThumbnailTests(TempMediaMixin, TransactionTestCase):
+    """test variants are rendered off the request thread"""
+    def test_upload_returns_before_variants(self):
+        """test the variants appear after the upload response"""
+        client = APIClient()
+        user = create_user()
+        client.force_authenticate(user)
+        recipe = create_recipe(user)
+
+        with rotated_jpeg() as image_file:
+            res = client.post(
+                image_upload_url(recipe.id),
+                {'image': image_file},
+                format='multipart',
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if RecipeImageVariant.objects.filter(recipe=recipe).count() == 4:
+                break
+            time.sleep(0.1)
+        self.assertEqual(
+            RecipeImageVariant.objects.filter(recipe=recipe).count(), 4,
+        )
@@ -0,0 +1,97 @@
+"""
+test updating recipe tags and ingredients
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+
+def detail_url(recipe_id):
+    """create and return recipe details url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class RecipeM2MUpdateTests(TestCase):
+    """test recipe updates only touch changed relations"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='sample recipe',
+            time_minute=10,
+            price=Decimal('2.50'),
+            link='https://example.com/recipe.pdf',
+        )
+        self.dinner = Tag.objects.create(user=self.user, name='dinner')
+        self.thai = Tag.objects.create(user=self.user, name='thai')
+        self.recipe.tags.add(self.dinner, self.thai)
+
+    def _patch(self, payload):
+        """patch the recipe and return the captured sql"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(
+                detail_url(self.recipe.id), payload, format='json',
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [q['sql'] for q in ctx.captured_queries]
+
+    def test_unchanged_tags_do_not_rewrite_rows(self):
+        """test patching the same tags writes nothing to the through table"""
+        sql = self._patch({'tags': [{'name': 'thai'}, {'name': 'dinner'}]})
+
+        writes = [
+            q for q in sql
+            if 'core_recipe_tags' in q
+            and q.lstrip().upper().startswith(('INSERT', 'DELETE'))
+        ]
+        self.assertEqual(writes, [])
+        self.assertEqual(self.recipe.tags.count(), 2)
+
+    def test_only_delta_is_applied(self):
+        """test a removed tag is deleted and a new tag is linked"""
+        kept_row = Recipe.tags.through.objects.get(
+            recipe=self.recipe, tag=self.thai,
+        )
+
+        self._patch({'tags': [{'name': 'thai'}, {'name': 'lunch'}]})
+
+        tags = set(self.recipe.tags.values_list('name', flat=True))
+        self.assertEqual(tags, {'thai', 'lunch'})
+        self.assertTrue(
+            Recipe.tags.through.objects.filter(id=kept_row.id).exists()
+        )
+
+    def test_update_ingredients_creates_ingredients(self):
+        """test ingredients in an update are not created as tags"""
+        self._patch({'ingredients': [{'name': 'salt'}]})
+
+        salt = Ingredient.objects.get(user=self.user, name='salt')
+        self.assertEqual(list(self.recipe.ingredients.all()), [salt])
+        self.assertFalse(Tag.objects.filter(name='salt').exists())
+        self.assertEqual(self.recipe.tags.count(), 2)
+
+    def test_clear_tags(self):
+        """test an empty list removes every tag"""
+        self._patch({'tags': []})
+
+        self.assertEqual(self.recipe.tags.count(), 0)
@@ -0,0 +1,218 @@
+"""
+test the fast json and messagepack formats of the api
+"""
+import datetime
+import io
+import json
+import tempfile
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+import msgpack
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework.utils.serializer_helpers import ReturnDict
+
+from core import (
+    parsers,
+    renderers,
+)
+from core.models import Recipe
+from recipe.test.utils import TempMediaMixin
+
+RECIPE_URL = reverse('recipe:recipe-list')
+MSGPACK = 'application/msgpack'
+
+
+def detail_url(recipe_id):
+    """create and return recipe details url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def image_upload_url(recipe_id):
+    """create and return recipe image url"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def sample_data():
+    """return data exercising every value the encoders special case"""
+    return ReturnDict({
+        'id': 1,
+        'price': '5.50',
+        'raw_price': Decimal('5.50'),
+        'ratio': 0.1,
+        'title': 'crème brûlée   "quoted" \x1f',
+        'when': timezone.make_aware(datetime.datetime(2026, 1, 2, 3, 4, 5)),
+        'day': datetime.date(2026, 1, 2),
+        'uuid': uuid.UUID(int=1),
+        'lazy': gettext_lazy('hello'),
+        'nested': [{'a': None, 'b': True}, (1, 2)],
+        10: 'int key',
+    }, serializer=None)
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """test orjson output matches JSONRenderer"""
+    def test_matches_stdlib(self):
+        """test compact output is byte identical"""
+        data = sample_data()
+
+        self.assertEqual(
+            renderers.FastJSONRenderer().render(data),
+            JSONRenderer().render(data),
+        )
+
+    def test_floats_decode_alike(self):
+        """test floats may be spelled differently but decode the same"""
+        data = {'big': 1e16, 'small': 1e-7, 'plain': 0.1}
+
+        self.assertEqual(
+            json.loads(renderers.FastJSONRenderer().render(data)),
+            json.loads(JSONRenderer().render(data)),
+        )
+
+    def test_indent_matches_stdlib(self):
+        """test indented output falls back to the stdlib encoder"""
+        data = sample_data()
+        media_type = 'application/json; indent=4'
+
+        self.assertEqual(
+            renderers.FastJSONRenderer().render(data, media_type),
+            JSONRenderer().render(data, media_type),
+        )
+
+    def test_wide_integers(self):
+        """test integers orjson cannot encode still render"""
+        self.assertEqual(
+            renderers.FastJSONRenderer().render({'n': 2 ** 70}),
+            b'{"n":%d}' % 2 ** 70,
+        )
+
+    def test_without_orjson(self):
+        """test the renderer and parser work without orjson"""
+        data = sample_data()
+        with mock.patch.object(renderers, 'orjson', None), \
+                mock.patch.object(parsers, 'orjson', None):
+            body = renderers.FastJSONRenderer().render(data)
+            parsed = parsers.FastJSONParser().parse(io.BytesIO(body))
+
+        self.assertEqual(body, JSONRenderer().render(data))
+        self.assertEqual(parsed['price'], '5.50')
+
+    def test_parse_error(self):
+        """test invalid json raises the stdlib parse error"""
+        with self.assertRaisesMessage(ParseError, 'JSON parse error'):
+            parsers.FastJSONParser().parse(io.BytesIO(b'{"a": NaN}'))
+
+
+@override_settings(
+    RECIPE_THUMBNAILS={'SIZES': [8], 'FORMATS': ['JPEG'], 'SYNC': True},
+)
+class MessagePackApiTests(TempMediaMixin, TestCase):
+    """test clients can talk MessagePack to the api"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def _create(self):
+        """create a recipe through the api using a messagepack body"""
+        payload = {
+            'title': 'msgpack recipe',
+            'time_minute': 5,
+            'price': '5.5',
+            'link': 'https://example.com/recipe.pdf',
+            'tags': [{'name': 'quick'}],
+        }
+        return self.client.post(
+            RECIPE_URL,
+            msgpack.packb(payload),
+            content_type=MSGPACK,
+            HTTP_ACCEPT=MSGPACK,
+        )
+
+    def test_create_with_msgpack(self):
+        """test a messagepack body is parsed and answered in kind"""
+        res = self._create()
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res['Content-Type'], MSGPACK)
+        data = msgpack.unpackb(res.content)
+        self.assertEqual(data['price'], '5.50')
+        self.assertEqual(data['tags'][0]['name'], 'quick')
+
+    def test_detail_matches_json(self):
+        """test both formats carry the same values, image urls included"""
+        recipe = Recipe.objects.get(id=self._create().data['id'])
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            self.client.post(
+                image_upload_url(recipe.id),
+                {'image': image_file},
+                format='multipart',
+            )
+
+        as_json = self.client.get(detail_url(recipe.id))
+        as_msgpack = self.client.get(
+            detail_url(recipe.id), HTTP_ACCEPT=MSGPACK,
+        )
+
+        self.assertEqual(as_msgpack['Content-Type'], MSGPACK)
+        self.assertEqual(
+            msgpack.unpackb(as_msgpack.content), json.loads(as_json.content),
+        )
+        self.assertTrue(
+            json.loads(as_json.content)['image'].startswith('http://')
+        )
+
+    def test_etag_per_format(self):
+        """test each format has its own etag and responses vary on Accept"""
+        recipe_id = self._create().data['id']
+
+        as_json = self.client.get(detail_url(recipe_id))
+        as_msgpack = self.client.get(detail_url(recipe_id), HTTP_ACCEPT=MSGPACK)
+
+        self.assertNotEqual(as_json['ETag'], as_msgpack['ETag'])
+        self.assertIn('Accept', as_json['Vary'])
+        res = self.client.get(
+            detail_url(recipe_id),
+            HTTP_ACCEPT=MSGPACK,
+            HTTP_IF_NONE_MATCH=as_json['ETag'],
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.get(
+            detail_url(recipe_id),
+            HTTP_ACCEPT=MSGPACK,
+            HTTP_IF_NONE_MATCH=as_msgpack['ETag'],
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertIn('Accept', res['Vary'])
+
+    def test_invalid_msgpack(self):
+        """test a broken messagepack body is a bad request"""
+        res = self.client.post(
+            RECIPE_URL, b'\xc1', content_type=MSGPACK,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,273 @@
+"""
+test read replica routing with sqlite databases standing in for replicas
+"""
+import copy
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import token_cache
+from core.models import Recipe
+from core.routers import (
+    ReplicaRoutingMiddleware,
+    probe,
+    replica_health,
+    use_primary,
+)
+from recipe.test.utils import (
+    ExtraDatabasesMixin,
+    build_urls,
+)
+
+RECIPE_URL = reverse('recipe:recipe-list')
+REPLICAS = ['replica1', 'replica2']
+COOKIE_NAME = 'db_primary_until'
+
+
+def detail_url(recipe_id):
+    """create and return a recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def replicate(alias, obj, **changes):
+    """copy a row to a replica database, without sending signals"""
+    obj = copy.copy(obj)
+    for name, value in changes.items():
+        setattr(obj, name, value)
+    type(obj).objects.using(alias).bulk_create([obj])
+
+
+def routing(**options):
+    """override the replica routing settings"""
+    return override_settings(DATABASE_ROUTING={
+        'REPLICAS': REPLICAS[:1],
+        'STICKY_SECONDS': 10,
+        'STICKY_BACKEND': 'cookie',
+        'COOKIE_NAME': COOKIE_NAME,
+        'CHECK_INTERVAL': 5,
+        **options,
+    })
+
+
+class ReplicaTestCase(ExtraDatabasesMixin, TestCase):
+    """primary and replicas holding different titles for one recipe"""
+    extra_databases = REPLICAS
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        replica_health.reset()
+        self.user = create_user()
+        self.token = Token.objects.create(user=self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='primary',
+            time_minute=5,
+            price=Decimal('5.00'),
+        )
+        for alias in REPLICAS:
+            replicate(alias, self.user)
+            replicate(alias, self.recipe, title=alias)
+        self.client = self.client_for(self.token)
+
+    def client_for(self, token):
+        """return an api client sending token"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def titles(self, client=None):
+        """return the recipe titles a list request sees"""
+        res = (client or self.client).get(RECIPE_URL)
+        self.assertEqual(res.status_code, 200)
+        return sorted(recipe['title'] for recipe in res.json()['results'])
+
+
+@routing()
+class ReplicaReadTests(ReplicaTestCase):
+    """test reads go to replicas until the client writes"""
+
+    def test_reads_use_replica(self):
+        """test list and detail reads are served by the replica"""
+        self.assertEqual(self.titles(), ['replica1'])
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(res.json()['title'], 'replica1')
+
+    async def test_async_reads_use_replica(self):
+        """test the async read path routes to the replica too"""
+        build_urls(True)
+        self.addCleanup(build_urls, settings.ASYNC_VIEWS)
+        res = await self.async_client.get(
+            RECIPE_URL, AUTHORIZATION=f'Token {self.token.key}',
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            [recipe['title'] for recipe in res.json()['results']],
+            ['replica1'],
+        )
+
+    def test_token_missing_on_replica(self):
+        """test a token not yet replicated is found on the primary"""
+        self.assertFalse(
+            Token.objects.using('replica1').filter(key=self.token.key).exists()
+        )
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(res.status_code, 200)
+
+    def test_write_sticks_to_primary(self):
+        """test reads after a write see the primary"""
+        res = self.client.post(RECIPE_URL, {
+            'title': 'new',
+            'time_minute': 1,
+            'price': '1.00',
+            'link': 'https://example.com/new.pdf',
+        }, format='json')
+
+        self.assertEqual(res.status_code, 201)
+        self.assertIn(COOKIE_NAME, res.cookies)
+        self.assertEqual(self.titles(), ['new', 'primary'])
+
+    def test_sticky_cookie_expires(self):
+        """test an expired sticky cookie reads from the replica again"""
+        self.client.cookies[COOKIE_NAME] = f'{time.time() - 1:.3f}'
+        self.assertEqual(self.titles(), ['replica1'])
+        self.client.cookies[COOKIE_NAME] = f'{time.time() + 5:.3f}'
+        self.assertEqual(self.titles(), ['primary'])
+
+    def test_replica_reads_not_cached_after_change(self):
+        """test replica responses are not cached while it may lag"""
+        self.recipe.title = 'renamed'
+        self.recipe.save()
+        self.assertEqual(self.titles(), ['replica1'])
+
+        Recipe.objects.using('replica1').filter(id=self.recipe.id).update(
+            title='renamed',
+        )
+
+        self.assertEqual(self.titles(), ['renamed'])
+
+    @routing(MAX_LAG=0, CHECK_INTERVAL=0)
+    def test_replica_reads_cached_once_caught_up(self):
+        """test replica responses are cached again after the lag bound"""
+        self.recipe.save()
+        self.assertEqual(self.titles(), ['replica1'])
+
+        Recipe.objects.using('replica1').filter(id=self.recipe.id).update(
+            title='renamed',
+        )
+
+        self.assertEqual(self.titles(), ['replica1'])
+
+    def test_rejected_write_sticks(self):
+        """test a write rejected by validation still pins the client"""
+        res = self.client.post(RECIPE_URL, {}, format='json')
+        self.assertEqual(res.status_code, 400)
+        self.assertIn(COOKIE_NAME, res.cookies)
+
+    def test_reads_outside_requests_use_primary(self):
+        """test reads without a request, in atomic() or pinned use primary"""
+        self.assertEqual(Recipe.objects.get().title, 'primary')
+        seen = {}
+
+        def view(request):
+            seen['request'] = Recipe.objects.get().title
+            with transaction.atomic():
+                seen['atomic'] = Recipe.objects.get().title
+            with use_primary():
+                seen['pinned'] = Recipe.objects.get().title
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(RequestFactory().get('/'))
+
+        self.assertEqual(seen, {
+            'request': 'replica1',
+            'atomic': 'primary',
+            'pinned': 'primary',
+        })
+        self.assertEqual(Recipe.objects.get().title, 'primary')
+
+
+@routing(STICKY_BACKEND='cache')
+class CacheStickinessTests(ReplicaTestCase):
+    """test the sticky window kept in the cache"""
+
+    def test_marker_follows_credentials(self):
+        """test a write pins every client using the same token"""
+        res = self.client.patch(detail_url(self.recipe.id), {
+            'title': 'renamed',
+        }, format='json')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn(COOKIE_NAME, res.cookies)
+        self.assertEqual(self.titles(self.client_for(self.token)), ['renamed'])
+
+        other = create_user(email='other@example.com')
+        recipe = Recipe.objects.create(
+            user=other, title='primary', time_minute=5, price=Decimal('1'),
+        )
+        replicate('replica1', other)
+        replicate('replica1', recipe, title='replica1')
+        other_client = self.client_for(Token.objects.create(user=other))
+        self.assertEqual(self.titles(other_client), ['replica1'])
+
+    def test_marker_expires(self):
+        """test reads return to the replica once the marker is gone"""
+        self.client.patch(detail_url(self.recipe.id), {'title': 'renamed'})
+        self.assertEqual(self.titles(), ['renamed'])
+
+        cache.clear()
+
+        self.assertEqual(self.titles(), ['replica1'])
+
+
+@routing(REPLICAS=REPLICAS)
+class ReplicaHealthTests(ReplicaTestCase):
+    """test replica selection by health"""
+
+    def test_probe(self):
+        """test a reachable sqlite replica is healthy"""
+        self.assertTrue(probe('replica1'))
+
+    def test_unhealthy_replica_skipped(self):
+        """test reads avoid a replica that fails its probe"""
+        def probe(alias):
+            return alias != 'replica1'
+
+        with mock.patch('core.routers.probe', side_effect=probe):
+            for _ in range(5):
+                cache.clear()
+                self.assertEqual(self.titles(), ['replica2'])
+
+    def test_no_healthy_replica(self):
+        """test reads fall back to the primary when every probe fails"""
+        with mock.patch('core.routers.probe', return_value=False):
+            self.assertEqual(self.titles(), ['primary'])
+
+    def test_probe_interval(self):
+        """test replicas are probed at most once per interval"""
+        with mock.patch('core.routers.probe', return_value=True) as probe:
+            for _ in range(3):
+                cache.clear()
+                self.titles()
+
+        self.assertEqual(probe.call_count, len(REPLICAS))
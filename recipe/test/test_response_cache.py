@@ -0,0 +1,152 @@
+"""
+test per user response cache of recipe api
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+)
+from recipe.cache import (
+    get_data_version,
+    normalize_params,
+)
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **params):
+    """create and return a sample recipe"""
+    defaults = {
+        'title': 'sample recipe title',
+        'time_minute': 22,
+        'price': Decimal('5.30'),
+        'link': 'https://example.com/recipe.pdf',
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class NormalizeParamsTests(TestCase):
+    """test canonical query strings for cache keys"""
+    def test_id_lists_are_sorted_and_deduplicated(self):
+        """test the order of ids does not change the key"""
+        a = normalize_params(QueryDict('tags=3,1,10&ingredients=2'))
+        b = normalize_params(QueryDict('ingredients=2&tags=10,3,1,3'))
+        self.assertEqual(a, b)
+
+    def test_flags_are_normalized(self):
+        """test equivalent flag values share a key"""
+        self.assertEqual(
+            normalize_params(QueryDict('assigned_only=0')),
+            normalize_params(QueryDict('assigned_only=')),
+        )
+
+
+class ResponseCacheTests(TestCase):
+    """test list responses are cached and invalidated per user"""
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def _get(self, url, params=None):
+        """get the url and return the response and query count"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res, len(ctx.captured_queries)
+
+    def test_repeated_list_is_served_from_cache(self):
+        """test a second identical request runs no queries"""
+        create_recipe(self.user)
+        first, _ = self._get(RECIPE_URL)
+        second, queries = self._get(RECIPE_URL)
+
+        self.assertEqual(queries, 0)
+        self.assertEqual(first.data, second.data)
+
+    def test_save_invalidates_cache(self):
+        """test creating a recipe is visible on the next request"""
+        create_recipe(self.user)
+        self._get(RECIPE_URL)
+        create_recipe(self.user, title='new recipe')
+
+        res, queries = self._get(RECIPE_URL)
+
+        self.assertGreater(queries, 0)
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_list_cached_before_commit_is_invalidated(self):
+        """test a response cached while a write is uncommitted is dropped"""
+        with self.captureOnCommitCallbacks(execute=True):
+            create_recipe(self.user)
+            version = get_data_version(self.user.id)
+            self._get(RECIPE_URL)
+
+        _, queries = self._get(RECIPE_URL)
+
+        self.assertNotEqual(get_data_version(self.user.id), version)
+        self.assertGreater(queries, 0)
+
+    def test_tag_rename_invalidates_recipe_list(self):
+        """test renaming a tag refreshes recipe lists containing it"""
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='dinner')
+        recipe.tags.add(tag)
+        self._get(RECIPE_URL)
+        tag.name = 'supper'
+        tag.save()
+
+        res, _ = self._get(RECIPE_URL)
+
+        self.assertEqual(res.data['results'][0]['tags'][0]['name'], 'supper')
+
+    def test_delete_invalidates_cache(self):
+        """test deleting a tag refreshes the tag list"""
+        tag = Tag.objects.create(user=self.user, name='dinner')
+        self._get(TAGS_URL)
+        tag.delete()
+
+        res, _ = self._get(TAGS_URL)
+
+        self.assertEqual(res.data, [])
+
+    def test_cache_is_per_user(self):
+        """test another user does not get a cached response"""
+        create_recipe(self.user)
+        self._get(RECIPE_URL)
+        other = create_user(email='other@example.com')
+        self.client.force_authenticate(other)
+
+        res, _ = self._get(RECIPE_URL)
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_other_users_writes_keep_cache(self):
+        """test another user's change does not evict this user's entries"""
+        create_recipe(self.user)
+        self._get(RECIPE_URL)
+        create_recipe(create_user(email='other@example.com'))
+
+        _, queries = self._get(RECIPE_URL)
+
+        self.assertEqual(queries, 0)
@@ -0,0 +1,363 @@
+"""
+test sharding recipe data by user with sqlite databases standing in for shards
+"""
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import (
+    Client,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import sharding
+from core.models import (
+    Ingredient,
+    Recipe,
+    ShardAssignment,
+    Tag,
+)
+from recipe.test.utils import (
+    ExtraDatabasesMixin,
+    build_urls,
+)
+
+RECIPE_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk-create')
+TAG_URL = reverse('recipe:tag-list')
+SHARDS = ['shard1', 'shard2']
+
+
+def detail_url(recipe_id):
+    """create and return a recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_user(email='user@example.com'):
+    """create and return user"""
+    return get_user_model().objects.create_user(email=email, password=None)
+
+
+def recipe_payload(title, tags=(), ingredients=()):
+    """return a recipe payload"""
+    return {
+        'title': title,
+        'time_minute': 10,
+        'price': '4.50',
+        'link': 'https://example.com/recipe.pdf',
+        'tags': [{'name': name} for name in tags],
+        'ingredients': [{'name': name} for name in ingredients],
+    }
+
+
+def rows(model, alias, **filters):
+    """return the ids of model rows on alias"""
+    return sorted(
+        model.objects.using(alias).filter(**filters)
+        .values_list('id', flat=True)
+    )
+
+
+sharded = override_settings(DATABASE_SHARDING={
+    'SHARDS': SHARDS,
+    'VNODES': 64,
+    'ID_BLOCK_SIZE': 10,
+    'CACHE_TIMEOUT': 60,
+})
+
+
+class HashRingTests(SimpleTestCase):
+    """test placing keys with consistent hashing"""
+
+    def test_node_is_stable(self):
+        """test a key maps to the same node whatever the node order"""
+        first = sharding.HashRing(['a', 'b', 'c'])
+        second = sharding.HashRing(['c', 'a', 'b'])
+
+        for key in range(200):
+            self.assertEqual(first.node(key), second.node(key))
+
+    def test_keys_spread(self):
+        """test every node gets a fair share of the keys"""
+        ring = sharding.HashRing(['a', 'b', 'c'])
+        counts = {'a': 0, 'b': 0, 'c': 0}
+        for key in range(3000):
+            counts[ring.node(key)] += 1
+
+        for count in counts.values():
+            self.assertGreater(count, 700)
+            self.assertLess(count, 1300)
+
+    def test_adding_node_moves_few_keys(self):
+        """test a new node only takes keys, about its share of them"""
+        before = sharding.HashRing(['a', 'b', 'c'])
+        after = sharding.HashRing(['a', 'b', 'c', 'd'])
+
+        moved = [
+            key for key in range(3000) if before.node(key) != after.node(key)
+        ]
+
+        self.assertLess(len(moved), 1200)
+        for key in moved:
+            self.assertEqual(after.node(key), 'd')
+
+
+@sharded
+class ShardTestCase(ExtraDatabasesMixin, TestCase):
+    """a user on shard1 with an api client"""
+    extra_databases = SHARDS
+
+    def setUp(self):
+        cache.clear()
+        # reservations made by earlier tests were rolled back with them
+        sharding.forget_id_blocks()
+        self.user = create_user()
+        ShardAssignment.objects.create(user=self.user, shard='shard1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def other_client(self, shard):
+        """return a user placed on shard and an api client for them"""
+        user = create_user(email=f'{shard}@example.com')
+        ShardAssignment.objects.create(user=user, shard=shard)
+        client = APIClient()
+        client.force_authenticate(user)
+        return user, client
+
+    def create_recipe(self, client=None, title='soup', **relations):
+        """create a recipe through the api and return its id"""
+        res = (client or self.client).post(
+            RECIPE_URL, recipe_payload(title, **relations), format='json',
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data['id']
+
+
+class ShardedApiTests(ShardTestCase):
+    """test the api keeps a user's data on their shard"""
+
+    def test_rows_on_user_shard(self):
+        """test recipes, tags, ingredients and links land on the shard"""
+        recipe_id = self.create_recipe(tags=['thai'], ingredients=['rice'])
+
+        self.assertEqual(rows(Recipe, 'shard1'), [recipe_id])
+        self.assertEqual(len(rows(Tag, 'shard1')), 1)
+        self.assertEqual(len(rows(Ingredient, 'shard1')), 1)
+        self.assertEqual(
+            Recipe.tags.through.objects.using('shard1').count(), 1,
+        )
+        for alias in ('default', 'shard2'):
+            self.assertEqual(rows(Recipe, alias), [])
+            self.assertEqual(rows(Tag, alias), [])
+
+        res = self.client.get(detail_url(recipe_id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([tag['name'] for tag in res.data['tags']], ['thai'])
+        res = self.client.get(TAG_URL)
+        self.assertEqual([tag['name'] for tag in res.data], ['thai'])
+
+    def test_new_user_placed_by_ring(self):
+        """test a user's first request pins them to their ring shard"""
+        user = create_user(email='new@example.com')
+        self.client.force_authenticate(user)
+
+        self.create_recipe()
+
+        shard = sharding.ring().node(user.id)
+        self.assertEqual(ShardAssignment.objects.get(user=user).shard, shard)
+        self.assertEqual(len(rows(Recipe, shard, user=user)), 1)
+
+    def test_ids_unique_across_shards(self):
+        """test ids handed out on different shards never collide"""
+        _, client = self.other_client('shard2')
+        ids = [self.create_recipe(), self.create_recipe(client)]
+        res = client.post(BULK_URL, [
+            recipe_payload(f'bulk {i}', tags=['a']) for i in range(15)
+        ], format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        ids.extend(recipe['id'] for recipe in res.data)
+        ids.append(self.create_recipe())
+
+        self.assertEqual(len(set(ids)), 18)
+        self.assertEqual(rows(Recipe, 'shard2'), sorted(ids[1:17]))
+
+    def test_other_users_recipe_not_found(self):
+        """test a recipe id from another shard is not visible"""
+        _, client = self.other_client('shard2')
+        recipe_id = self.create_recipe(client)
+
+        res = self.client.get(detail_url(recipe_id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_async_reads_use_shard(self):
+        """test the async read path routes to the user's shard"""
+        build_urls(True)
+        self.addCleanup(build_urls, settings.ASYNC_VIEWS)
+        token = await Token.objects.acreate(user=self.user)
+        recipe_id = await sync_to_async(self.create_recipe)()
+
+        res = await self.async_client.get(
+            RECIPE_URL, AUTHORIZATION=f'Token {token.key}',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['id'] for recipe in res.json()['results']], [recipe_id],
+        )
+
+    def test_query_without_user_raises(self):
+        """test sharded data is not queried without knowing the user"""
+        with self.assertRaises(sharding.ShardUnknown):
+            Recipe.objects.count()
+        with sharding.use_shard('shard1'):
+            self.assertEqual(Recipe.objects.count(), 0)
+
+    def test_delete_user_cleans_shard(self):
+        """test deleting a user deletes their rows on the shard"""
+        self.create_recipe(tags=['thai'])
+
+        self.user.delete()
+
+        self.assertEqual(rows(Recipe, 'shard1'), [])
+        self.assertEqual(rows(Tag, 'shard1'), [])
+        self.assertEqual(
+            Recipe.tags.through.objects.using('shard1').count(), 0,
+        )
+
+
+class MoveUserTests(ShardTestCase):
+    """test moving a user's data between shards"""
+
+    def move(self, shard='shard2'):
+        """run the move command and return its output"""
+        out = StringIO()
+        call_command(
+            'move_user_shard', self.user.email, shard, grace=0, stdout=out,
+        )
+        return out.getvalue()
+
+    def test_move_keeps_ids_and_links(self):
+        """test the rows move with their ids and relations"""
+        first = self.create_recipe(
+            tags=['thai', 'quick'], ingredients=['rice'],
+        )
+        second = self.create_recipe(title='curry', tags=['thai'])
+        tags = rows(Tag, 'shard1')
+
+        out = self.move()
+
+        self.assertIn('from shard1 to shard2', out)
+        self.assertEqual(rows(Recipe, 'shard2'), [first, second])
+        self.assertEqual(rows(Tag, 'shard2'), tags)
+        for model in (Recipe, Tag, Ingredient):
+            self.assertEqual(rows(model, 'shard1'), [])
+        self.assertEqual(
+            Recipe.tags.through.objects.using('shard1').count(), 0,
+        )
+        self.assertEqual(ShardAssignment.objects.get().shard, 'shard2')
+
+        res = self.client.get(detail_url(first))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(tag['name'] for tag in res.data['tags']), ['quick', 'thai'],
+        )
+        res = self.client.get(RECIPE_URL, {'q': 'curry'})
+        self.assertEqual([r['id'] for r in res.data['results']], [second])
+
+    def test_writes_rejected_while_moving(self):
+        """test writes answer 503 and reads go on during the move"""
+        recipe_id = self.create_recipe()
+        seen = {}
+
+        def during_move(seconds):
+            if seen:
+                return
+            seen['read'] = self.client.get(detail_url(recipe_id)).status_code
+            seen['write'] = self.client.post(
+                RECIPE_URL, recipe_payload('new'), format='json',
+            ).status_code
+
+        with mock.patch('core.sharding.time.sleep', side_effect=during_move):
+            self.move()
+
+        self.assertEqual(seen, {
+            'read': status.HTTP_200_OK,
+            'write': status.HTTP_503_SERVICE_UNAVAILABLE,
+        })
+        self.assertEqual(rows(Recipe, 'shard2'), [recipe_id])
+        self.create_recipe(title='after')
+        self.assertEqual(len(rows(Recipe, 'shard2')), 2)
+
+    def test_failed_move_restores_writes(self):
+        """test a move failing half way leaves the user where they were"""
+        recipe_id = self.create_recipe()
+
+        with mock.patch(
+            'core.sharding._copy_rows', side_effect=RuntimeError,
+        ), self.assertRaises(RuntimeError):
+            self.move()
+
+        assignment = ShardAssignment.objects.get()
+        self.assertEqual((assignment.shard, assignment.moving_to),
+                         ('shard1', ''))
+        self.assertEqual(rows(Recipe, 'shard1'), [recipe_id])
+        self.create_recipe(title='after')
+
+
+class ShardedAdminTests(ShardTestCase):
+    """test the admin pages of sharded models"""
+
+    def setUp(self):
+        super().setUp()
+        staff = create_user(email='admin@example.com')
+        staff.is_staff = staff.is_superuser = True
+        staff.save()
+        self.admin = Client()
+        self.admin.force_login(staff)
+        self.recipe_id = self.create_recipe(title='shard one soup')
+
+    def test_changelist_shows_one_shard(self):
+        """test changelists list the rows of the chosen shard"""
+        url = reverse('admin:core_recipe_changelist')
+        _, client = self.other_client('shard2')
+        self.create_recipe(client, title='shard two soup')
+
+        res = self.admin.get(url)
+        self.assertContains(res, 'shard one soup')
+        self.assertNotContains(res, 'shard two soup')
+
+        res = self.admin.get(url, {'shard': 'shard2'})
+        self.assertContains(res, 'shard two soup')
+        self.assertNotContains(res, 'shard one soup')
+
+        res = self.admin.get(reverse('admin:core_tag_changelist'))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_object_pages_find_shard(self):
+        """test change and delete pages read the object's shard"""
+        self.move()
+
+        for name in ('change', 'delete', 'history'):
+            res = self.admin.get(
+                reverse(f'admin:core_recipe_{name}', args=[self.recipe_id]),
+            )
+            self.assertContains(res, 'shard one soup')
+
+    def move(self):
+        """move the user's data to shard2"""
+        call_command(
+            'move_user_shard', self.user.email, 'shard2', grace=0,
+            stdout=StringIO(),
+        )
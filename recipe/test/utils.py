@@ -0,0 +1,76 @@
+"""
+helpers shared by the recipe tests
+"""
+import importlib
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import connections
+from django.test import override_settings
+from django.urls import clear_url_caches
+
+import app.urls
+import recipe.urls
+import user.urls
+
+
+def build_urls(async_views):
+    """rebuild the url patterns with ASYNC_VIEWS set to async_views"""
+    with override_settings(ASYNC_VIEWS=async_views):
+        for module in (recipe.urls, user.urls, app.urls):
+            importlib.reload(module)
+    clear_url_caches()
+
+
+class TempMediaMixin:
+    """keep uploads in a media root of the test class, removed after it"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media_root))
+
+
+class ExtraDatabasesMixin:
+    """give a test class in-memory sqlite databases for extra_databases
+
+    The aliases are registered and their test databases created before the
+    class starts, and dropped again after it, so other tests run against
+    the configured DATABASES only. They are added to databases then too,
+    the test runner checks the aliases it names before any test runs.
+    """
+    extra_databases = ()
+
+    @classmethod
+    def setUpClass(cls):
+        for alias in cls.extra_databases:
+            cls._add_database(alias)
+        cls.databases = {*cls.databases, *cls.extra_databases}
+        super().setUpClass()
+
+    @classmethod
+    def _add_database(cls, alias):
+        """register alias, create its test database and undo both later"""
+        if alias in connections.settings:
+            return
+        databases = connections.configure_settings({
+            **connections.settings,
+            alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+        })
+        settings.DATABASES[alias] = databases[alias]
+        connections.settings[alias] = databases[alias]
+        cls.addClassCleanup(cls._remove_database, alias)
+        connections[alias].creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False,
+        )
+
+    @classmethod
+    def _remove_database(cls, alias):
+        connections[alias].creation.destroy_test_db(':memory:', verbosity=0)
+        del connections[alias]
+        # usually one dict, connections reads DATABASES as it is
+        connections.settings.pop(alias, None)
+        settings.DATABASES.pop(alias, None)
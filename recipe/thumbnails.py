@@ -0,0 +1,141 @@
+"""
+background generation of recipe image variants
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import (
+    connections,
+    router,
+    transaction,
+)
+from django.utils import timezone
+
+from core import sharding
+from core.models import (
+    Recipe,
+    RecipeImageVariant,
+    recipe_image_variant_path,
+)
+from recipe.cache import bump_data_version
+from recipe.imaging import render_variants
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _options():
+    """return the thumbnail settings with defaults filled in"""
+    options = {
+        'SIZES': [128, 512, 1024],
+        'FORMATS': ['JPEG', 'WEBP'],
+        'QUALITY': 85,
+        'WORKERS': 2,
+        'SYNC': False,
+    }
+    options.update(getattr(settings, 'RECIPE_THUMBNAILS', {}))
+    return options
+
+
+def _get_executor():
+    """return the shared process pool, creating it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=_options()['WORKERS'],
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def _record(recipe_id, source, variants):
+    """replace the variant rows of a recipe if its image is unchanged"""
+    recipe = Recipe.objects.filter(id=recipe_id).only(
+        'id', 'user_id', 'image',
+    ).first()
+    if recipe is None or recipe.image.name != source:
+        return
+    with transaction.atomic(using=router.db_for_write(RecipeImageVariant)):
+        # files no variant uses any more go with core.signals
+        RecipeImageVariant.objects.filter(recipe_id=recipe_id).delete()
+        RecipeImageVariant.objects.bulk_create([
+            RecipeImageVariant(
+                recipe_id=recipe_id,
+                source=source,
+                size=variant['size'],
+                format=variant['format'],
+                image=recipe_image_variant_path(None, variant['filename']),
+            )
+            for variant in variants
+        ])
+        Recipe.objects.filter(id=recipe_id).update(updated_at=timezone.now())
+    bump_data_version(recipe.user_id)
+
+
+def _on_done(recipe_id, user_id, source, future):
+    """record finished variants from the pool's callback thread"""
+    try:
+        with sharding.for_user(user_id):
+            _record(recipe_id, source, future.result())
+    except Exception:
+        logger.exception('image variants failed for recipe %s', recipe_id)
+    finally:
+        connections.close_all()
+
+
+def enqueue(recipe):
+    """generate the configured variants of a recipe image
+
+    The work runs on a process pool and returns immediately; the variant
+    rows are written once the pool finishes. With SYNC the variants are
+    rendered inline, which is what tests use.
+    """
+    if not recipe.image:
+        return None
+    existing = list(
+        RecipeImageVariant.objects.filter(source=recipe.image.name)
+        .exclude(recipe_id=recipe.id)
+        .values('recipe_id', 'size', 'format', 'image')
+    )
+    if existing:
+        # the same bytes were rendered for another recipe already
+        first = existing[0]['recipe_id']
+        _record(recipe.id, recipe.image.name, [
+            {
+                'size': row['size'],
+                'format': row['format'],
+                'filename': os.path.basename(row['image']),
+            }
+            for row in existing if row['recipe_id'] == first
+        ])
+        return None
+    options = _options()
+    stem = os.path.splitext(os.path.basename(recipe.image.name))[0]
+    output_dir = os.path.dirname(
+        recipe.image.storage.path(recipe_image_variant_path(None, 'x'))
+    )
+    job = partial(
+        render_variants,
+        recipe.image.path,
+        output_dir,
+        stem,
+        options['SIZES'],
+        options['FORMATS'],
+        options['QUALITY'],
+    )
+    if options['SYNC']:
+        _record(recipe.id, recipe.image.name, job())
+        return None
+    future = _get_executor().submit(job)
+    future.add_done_callback(partial(
+        _on_done, recipe.id, recipe.user_id, recipe.image.name,
+    ))
+    return future
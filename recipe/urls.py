@@ -5,10 +5,10 @@ from django.urls import(
     path,
     include
 )
+from core.asyncviews import AsyncReadRouter
 from recipe import views
 
-from rest_framework.routers import DefaultRouter
-router = DefaultRouter()
+router = AsyncReadRouter()
 router.register('recipes',views.RecipeViewSet)
 router.register('tags',views.TagViewSet)
 router.register('ingredient',views.IngredientViewSet)
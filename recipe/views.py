@@ -12,17 +12,61 @@ from rest_framework import(
     mixins,
     status,
 )
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from django.http import StreamingHttpResponse
+from django.db.models import (
+    Count,
+    Exists,
+    Max,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Sum,
+)
+from django.db.models.functions import Coalesce
 
+from core.asyncviews import AsyncReadMixin
+from core.authentication import CachedTokenAuthentication
 from core.models import(
     Recipe,
     Tag,
     Ingredient,
 )
-from recipe import serializers
+from core.sharding import ShardRoutingMixin
+from recipe import (
+    bulk,
+    export,
+    filters,
+    search,
+    serializers,
+    stats,
+    thumbnails,
+)
+from recipe.cache import (
+    CachedListMixin,
+    remember,
+    response_key,
+)
+from recipe.etags import ConditionalGetMixin
+from recipe.fastpath import FastListMixin
+from recipe.fieldsets import SparseFieldsetMixin
+from recipe.pagination import RecipeCursorPagination
+
+FIELDSET_PARAMETERS = [
+    OpenApiParameter(
+        'fields',
+        OpenApiTypes.STR,
+        description='comma separated list of fields to return',
+    ),
+    OpenApiParameter(
+        'omit',
+        OpenApiTypes.STR,
+        description='comma separated list of fields to leave out',
+    ),
+]
 
 @extend_schema_view(
     list = extend_schema(
@@ -37,35 +81,164 @@ from recipe import serializers
                 OpenApiTypes.STR,
                 description='comma separated list of ingredients Ids to filter',
             ),
+            OpenApiParameter(
+                'match',
+                OpenApiTypes.STR,
+                enum=[filters.MATCH_ANY, filters.MATCH_ALL],
+                description='return recipes with any (default) or all of '
+                            'the requested tags and ingredients',
+            ),
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                description='search title and description, best match first',
+            ),
+            *FIELDSET_PARAMETERS,
         ]
-    )
+    ),
+    retrieve=extend_schema(parameters=FIELDSET_PARAMETERS),
 )
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ShardRoutingMixin,
+                    ConditionalGetMixin,
+                    CachedListMixin,
+                    SparseFieldsetMixin,
+                    FastListMixin,
+                    AsyncReadMixin,
+                    viewsets.ModelViewSet):
     """view for manage recipe api"""
+    async_actions = ('list', 'retrieve')
     serializer_class =serializers.RecipeDetailSerializer
     queryset =Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeCursorPagination
+    bulk_max_items = 1000
+
+    def _get_query_plan(self, queryset):
+        """shape the queryset for the fields the current action serializes"""
+        if self.action in ('upload_image', 'stats'):
+            return queryset
+        # related rows are ordered by id, as FastListSerializer orders them
+        if self.wants('tags'):
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'tags',
+                    queryset=Tag.objects.only('id', 'name').order_by('id'),
+                ),
+            )
+        if self.wants('ingredients'):
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'ingredients',
+                    queryset=Ingredient.objects.only(
+                        'id', 'name',
+                    ).order_by('id'),
+                ),
+            )
+        if self.action == 'list':
+            queryset = queryset.defer('description', 'image')
+        elif self.wants('image_variants'):
+            queryset = queryset.prefetch_related('image_variants')
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            columns = {'id'} | {
+                field.name for field in Recipe._meta.concrete_fields
+                if field.name in fieldset
+            }
+            if 'image_variants' in fieldset:
+                columns.add('image')
+            queryset = queryset.only(*columns)
+        return queryset
 
     def _params_to_ints(self, qs):
         """convert a list of string into integre"""
-        return [int(str_id) for str_id in qs.splite(',')]
+        try:
+            return [int(str_id) for str_id in qs.split(',') if str_id.strip()]
+        except ValueError:
+            raise ValidationError('Ids must be a comma separated list of integers.')
 
     def get_queryset(self):
         """retrive recipe for authenticated user"""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        query = self.request.query_params.get('q', '').strip()
+        match = self.request.query_params.get('match', filters.MATCH_ANY)
+        if match not in (filters.MATCH_ANY, filters.MATCH_ALL):
+            raise ValidationError({'match': 'Must be "any" or "all".'})
         queryset = self.queryset
 
         if tags:
             tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = filters.filter_by_related(queryset, 'tags', tag_ids, match)
         if ingredients:
             ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            queryset = filters.filter_by_related(
+                queryset, 'ingredients', ingredient_ids, match,
+            )
 
-        return queryset.filter(user=self.request.user).order_by('-id').distinct()
+        queryset = queryset.filter(user=self.request.user).order_by('-id')
+        if query and self.action == 'list':
+            queryset = search.search(
+                queryset, self.request.user, query,
+            ).order_by('-search_rank', '-id')
+        return self._get_query_plan(queryset)
+
+    def get_pagination_ordering(self):
+        """order searches by relevance, everything else by newest first"""
+        if self.request.query_params.get('q', '').strip():
+            return ('-search_rank', '-id')
+        return None
+
+    def get_etag_queries(self):
+        """return row state queries identifying the current list or detail"""
+        user = self.request.user
+        if self.action == 'retrieve':
+            aggregates = {'updated': Max('updated_at')}
+            for relation in ('tags', 'ingredients'):
+                if self.wants(relation):
+                    aggregates[f'{relation}_updated'] = Max(
+                        f'{relation}__updated_at'
+                    )
+                    aggregates[f'{relation}_count'] = Count(
+                        relation, distinct=True,
+                    )
+            return [(
+                Recipe.objects.filter(pk=self.kwargs['pk'], user=user),
+                aggregates,
+            )]
+        rows = self.filter_queryset(self.get_queryset()).order_by()
+        return [
+            (rows.values('id', 'updated_at'), {
+                'count': Count('id'),
+                'ids': Sum('id'),
+                'updated': Max('updated_at'),
+            }),
+            (Tag.objects.filter(user=user), {
+                'count': Count('id'),
+                'updated': Max('updated_at'),
+            }),
+            (Ingredient.objects.filter(user=user), {
+                'count': Count('id'),
+                'updated': Max('updated_at'),
+            }),
+        ]
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request,
+            lambda: super(RecipeViewSet, self).retrieve(
+                request, *args, **kwargs
+            ),
+        )
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.aconditional_response(
+            request,
+            lambda: super(RecipeViewSet, self).aretrieve(
+                request, *args, **kwargs
+            ),
+        )
 
     def get_serializer_class(self):
         """return the serializer class for request"""
@@ -79,6 +252,50 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """creating a new recipe"""
         serializer.save(user=self.request.user)
 
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk_create(self, request):
+        """create a list of recipes in one transaction"""
+        serializer = self.get_serializer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            max_length=self.bulk_max_items,
+        )
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        recipes = bulk.create_recipes(
+            self.request.user,
+            serializer.validated_data,
+        )
+        queryset = self._get_query_plan(
+            Recipe.objects.filter(id__in=[r.id for r in recipes]).order_by('id')
+        )
+        data = self.get_serializer(queryset, many=True).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    @action(methods=['GET'], detail=False, url_path='stats')
+    def stats(self, request):
+        """return price and cooking time statistics of the recipes"""
+        data = remember(
+            response_key(request, self.basename, 'stats'),
+            lambda: stats.recipe_stats(self.get_queryset()),
+        )
+        return Response(data)
+
+    @action(methods=['GET'], detail=False, url_path='export',
+            url_name='export')
+    def export_recipes(self, request):
+        """stream every recipe of the user as newline delimited json"""
+        response = StreamingHttpResponse(
+            export.iter_ndjson(self.request.user),
+            content_type='application/x-ndjson',
+        )
+        response['Content-Disposition'] = 'attachment; filename="recipes.ndjson"'
+        return response
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request ,pk=None):
         """upload a image in recipe"""
@@ -86,6 +303,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(recipe, data=request.data)
         if serializer.is_valid():
             serializer.save()
+            thumbnails.enqueue(recipe)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -97,36 +315,128 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 OpenApiTypes.INT, enum=[0, 1],
                 description='Filter by items assigned to recipes.',
             ),
+            OpenApiParameter(
+                'with_counts',
+                OpenApiTypes.INT, enum=[0, 1],
+                description='Include the number of recipes using each item.',
+            ),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR,
+                enum=['name', '-name', 'usage', '-usage'],
+                description='Sort by name (default -name) or recipe count.',
+            ),
+            *FIELDSET_PARAMETERS,
         ]
     )
 )
 
-class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
+class BaseRecipeAttrViewSet(ShardRoutingMixin,
+                            ConditionalGetMixin,
+                            CachedListMixin,
+                            SparseFieldsetMixin,
+                            AsyncReadMixin,
+                            mixins.DestroyModelMixin,
                             mixins.UpdateModelMixin,
                             mixins.ListModelMixin,
                             viewsets.GenericViewSet):
     """Base viewset for recipe attributes."""
-    authentication_classes = [TokenAuthentication]
+    async_actions = ('list',)
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
+    orderings = {
+        'name': ('name',),
+        '-name': ('-name',),
+        'usage': ('usage', 'name'),
+        '-usage': ('-usage', '-name'),
+    }
+
+    def _flag(self, name):
+        """return a 0/1 query param as a bool"""
+        try:
+            return bool(int(self.request.query_params.get(name, 0)))
+        except ValueError:
+            raise ValidationError({name: 'Must be 0 or 1.'})
+
+    def _links(self):
+        """return the recipe links of the outer row"""
+        field = Recipe._meta.get_field(self.recipe_relation)
+        through = field.remote_field.through
+        target = field.m2m_reverse_name()
+        return through, target, through.objects.filter(
+            **{target: OuterRef('pk')}
+        )
+
+    def _ordering(self):
+        """return the validated ordering of the list"""
+        ordering = self.request.query_params.get('ordering', '-name')
+        if ordering not in self.orderings:
+            raise ValidationError(
+                {'ordering': f'Must be one of {", ".join(self.orderings)}.'}
+            )
+        return ordering
+
+    def _with_usage(self):
+        """return True if the list needs the usage annotation"""
+        return (
+            self._flag('with_counts') and self.wants('usage')
+        ) or 'usage' in self._ordering()
+
     def get_queryset(self):
         """filter queryset for authenticated user"""
-        assigned_only = bool(
-            int(self.request.query_params.get('assigned_only', 0))
-        )
-        queryset = self.queryset
+        assigned_only = self._flag('assigned_only')
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.action != 'list':
+            return queryset.order_by('-name')
+
+        through, target, links = self._links()
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull = False)
-        return queryset.filter(user=self.request.user).order_by('-name').distinct()
+            queryset = queryset.filter(Exists(links))
+        if self._with_usage():
+            usage = links.order_by().values(target).annotate(
+                count=Count('pk'),
+            ).values('count')
+            queryset = queryset.annotate(usage=Coalesce(Subquery(usage), 0))
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            queryset = queryset.only('id', *(fieldset & {'name'}))
+        return queryset.order_by(*self.orderings[self._ordering()])
+
+    def get_serializer_class(self):
+        """return the serializer with usage counts when asked for"""
+        if self.action == 'list' and self._flag('with_counts'):
+            return self.usage_serializer_class
+        return self.serializer_class
+
+    def get_etag_queries(self):
+        """return row state queries identifying the current list"""
+        rows = self.get_queryset().order_by().values('id', 'updated_at')
+        queries = [(rows, {
+            'count': Count('id'),
+            'ids': Sum('id'),
+            'updated': Max('updated_at'),
+        })]
+        if self._flag('assigned_only') or self._with_usage():
+            through = self._links()[0]
+            queries.append((
+                through.objects.filter(recipe__user=self.request.user),
+                {'count': Count('id'), 'ids': Sum('id')},
+            ))
+        return queries
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """managing tag in database"""
     serializer_class = serializers.TagSerializer
+    usage_serializer_class = serializers.TagUsageSerializer
     queryset = Tag.objects.all()
+    recipe_relation = 'tags'
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """managing ingredient in database"""
     serializer_class = serializers.IngredientSerilizer
+    usage_serializer_class = serializers.IngredientUsageSerializer
     queryset = Ingredient.objects.all()
+    recipe_relation = 'ingredients'
 
 
@@ -0,0 +1,184 @@
+"""
+Tests for password hashing on the worker pool.
+"""
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import (
+    get_hasher,
+    make_password,
+)
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import passwords
+
+
+CREATE_USER_URL = reverse('user:create')
+TOKEN_URL = reverse('user:token')
+MD5_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+UPGRADE_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    *MD5_HASHERS,
+]
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+class PasswordPoolTestCase(TestCase):
+    """Start every test with a fresh hashing pool."""
+
+    def setUp(self):
+        passwords.shutdown()
+        self.addCleanup(passwords.shutdown)
+        self.client = APIClient()
+
+
+class PasswordPoolTests(PasswordPoolTestCase):
+    """Test hashing runs on the pool."""
+
+    def test_hashing_runs_on_pool(self):
+        """Test set_password and check_password hash off the caller thread."""
+        threads = []
+
+        def record(func):
+            def wrapper(*args, **kwargs):
+                threads.append(threading.current_thread().name)
+                return func(*args, **kwargs)
+            return wrapper
+
+        with mock.patch.object(
+            passwords, 'make_password', record(make_password),
+        ), mock.patch.object(
+            passwords, '_verify', record(passwords._verify),
+        ):
+            user = create_user(email='test@example.com', password='pass123')
+            self.assertTrue(user.check_password('pass123'))
+
+        self.assertEqual(len(threads), 2)
+        for name in threads:
+            self.assertTrue(name.startswith('password-hashing'))
+
+    def test_unusable_password_skips_pool(self):
+        """Test users without a password are created without hashing."""
+        with mock.patch.object(passwords, 'run') as run:
+            user = create_user(email='test@example.com')
+
+        run.assert_not_called()
+        self.assertFalse(user.has_usable_password())
+
+
+@override_settings(PASSWORD_HASHING={
+    'WORKERS': 1,
+    'BACKLOG': 0,
+    'RETRY_AFTER': 3,
+})
+class PasswordBackpressureTests(PasswordPoolTestCase):
+    """Test a full pool turns sign-ins away."""
+
+    def setUp(self):
+        super().setUp()
+        self.release = threading.Event()
+        started = threading.Event()
+
+        def block():
+            started.set()
+            self.release.wait(10)
+
+        self.blocker = threading.Thread(target=passwords.run, args=(block,))
+        self.blocker.start()
+        self.addCleanup(self.blocker.join)
+        self.addCleanup(self.release.set)
+        started.wait(10)
+
+    def test_run_raises_when_full(self):
+        """Test work beyond workers and backlog is rejected."""
+        with self.assertRaises(passwords.PasswordHashingBusy):
+            passwords.hash_password('pass123')
+
+        self.release.set()
+        self.blocker.join()
+        self.assertTrue(passwords.hash_password('pass123'))
+
+    def test_signup_returns_503(self):
+        """Test signup answers 503 with Retry-After while the pool is full."""
+        payload = {
+            'email': 'test@example.com',
+            'password': 'pass123',
+            'name': 'Test Name',
+        }
+        res = self.client.post(CREATE_USER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '3')
+        self.assertFalse(
+            get_user_model().objects.filter(email=payload['email']).exists()
+        )
+
+    def test_token_returns_503(self):
+        """Test token creation answers 503 while the pool is full."""
+        payload = {'email': 'test@example.com', 'password': 'pass123'}
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertNotIn('token', res.data)
+
+
+class PasswordRehashTests(PasswordPoolTestCase):
+    """Test outdated hashes are upgraded on login."""
+
+    def _login(self, password='pass123'):
+        return self.client.post(TOKEN_URL, {
+            'email': 'test@example.com',
+            'password': password,
+        })
+
+    def test_rehash_other_hasher(self):
+        """Test a hash from a retired hasher is replaced on login."""
+        with override_settings(PASSWORD_HASHERS=MD5_HASHERS):
+            user = create_user(email='test@example.com', password='pass123')
+        self.assertTrue(user.password.startswith('md5$'))
+
+        with override_settings(PASSWORD_HASHERS=UPGRADE_HASHERS):
+            res = self._login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(user.check_password('pass123'))
+
+    def test_rehash_changed_iterations(self):
+        """Test a hash with old work factor parameters is replaced."""
+        hasher = get_hasher('default')
+        user = create_user(email='test@example.com')
+        user.password = hasher.encode('pass123', hasher.salt(), iterations=1)
+        user.save()
+
+        res = self._login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertFalse(hasher.must_update(user.password))
+
+    def test_wrong_password_keeps_hash(self):
+        """Test a failed login leaves an outdated hash alone."""
+        with override_settings(PASSWORD_HASHERS=MD5_HASHERS):
+            user = create_user(email='test@example.com', password='pass123')
+        old_password = user.password
+
+        with override_settings(PASSWORD_HASHERS=UPGRADE_HASHERS):
+            res = self._login(password='wrong')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        user.refresh_from_db()
+        self.assertEqual(user.password, old_password)
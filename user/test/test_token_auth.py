@@ -0,0 +1,135 @@
+"""
+Tests for the cached token authentication.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import (
+    TokenCache,
+    token_cache,
+)
+
+
+ME_URL = reverse('user:me')
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+class TokenCacheTests(TestCase):
+    """Test the token cache data structure."""
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted first."""
+        cache = TokenCache(max_size=2, ttl=60, backend='')
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats(), {'hits': 2, 'misses': 1, 'size': 2})
+
+    def test_ttl_expiry(self):
+        """Test expired entries are treated as misses."""
+        cache = TokenCache(max_size=2, ttl=0, backend='')
+        cache.set('a', 1)
+
+        self.assertIsNone(cache.get('a'))
+
+    def test_shared_backend(self):
+        """Test a miss falls through to the django cache backend."""
+        writer = TokenCache(max_size=2, ttl=60, backend='default')
+        reader = TokenCache(max_size=2, ttl=60, backend='default')
+        writer.set('shared-key', 'value')
+
+        self.assertEqual(reader.get('shared-key'), 'value')
+        writer.invalidate('shared-key')
+        reader.clear()
+        self.assertIsNone(reader.get('shared-key'))
+
+    def test_invalidation_reaches_other_workers(self):
+        """Test a key revoked in one worker misses in another's local lru."""
+        for backend in ('', 'default'):
+            worker = TokenCache(max_size=2, ttl=60, backend=backend)
+            other = TokenCache(max_size=2, ttl=60, backend=backend)
+            worker.set('revoked', 'value')
+            other.set('revoked', 'value')
+
+            worker.invalidate('revoked')
+
+            self.assertIsNone(other.get('revoked'))
+            other.set('revoked', 'value', other.version('revoked'))
+            self.assertEqual(other.get('revoked'), 'value')
+
+    def test_lookup_before_invalidation_not_kept(self):
+        """Test a token read before it was revoked is not cached as current."""
+        cache = TokenCache(max_size=2, ttl=60, backend='default')
+        version = cache.version('raced')
+        cache.invalidate('raced')
+        cache.set('raced', 'stale', version)
+
+        self.assertIsNone(cache.get('raced'))
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating requests with a cached token."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_second_request_skips_token_query(self):
+        """Test the token lookup only runs on the first request."""
+        self.client.get(ME_URL)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(token_cache.stats()['hits'], 1)
+
+    def test_deleted_token_is_rejected(self):
+        """Test deleting the token invalidates the cache."""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        """Test deactivating the user invalidates the cache."""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates_cache(self):
+        """Test updating the password drops the cached user."""
+        self.client.get(ME_URL)
+        res = self.client.patch(ME_URL, {'password': 'newpass123'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(token_cache.stats()['size'], 0)
@@ -3,6 +3,7 @@ URL mappings for the user API.
 """
 from django.urls import path
 
+from core.asyncviews import async_view
 from user import views
 
 
@@ -11,5 +12,5 @@ app_name = 'user'
 urlpatterns = [
     path('create/', views.CreateUserView.as_view(), name='create'),
     path('token/', views.CreateTokenView.as_view(), name='token'),
-    path('me/', views.ManageUserView.as_view(), name='me'),
+    path('me/', async_view(views.ManageUserView.as_view()), name='me'),
 ]
\ No newline at end of file
@@ -1,6 +1,9 @@
-from rest_framework import generics,authentication,permissions
+from rest_framework import generics,permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from core.asyncviews import AsyncReadMixin
+from core.authentication import CachedTokenAuthentication
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
@@ -15,12 +18,17 @@ class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(AsyncReadMixin, generics.RetrieveUpdateAPIView):
     """Manage the authenticated user."""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    async_actions = ('get',)
 
     def get_object(self):
         """Retrieve and return the authenticated user."""
-        return self.request.user
\ No newline at end of file
+        return self.request.user
+
+    async def aget(self, request, *args, **kwargs):
+        """Return the authenticated user without a database query."""
+        return Response(self.get_serializer(request.user).data)